@@ -7,6 +7,14 @@ import pandas as pd
 import numpy as np
 import random
 import os
+import shutil
+import sys
+import argparse
+import functools
+import itertools
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 # Set random seed
@@ -84,42 +92,90 @@ ROOMS = {
 # Single sensor type: DHT22
 SENSOR_TYPE = 'DHT22'
 
-def generate_sensor_id(room_id):
+# Fleet topology for scale tests (see build_topology)
+# (room type, room id prefix, share of rooms, min capacity, max capacity)
+TOPOLOGY_ROOM_MIX = [
+    ('Lab Praktik', 'LAB', 0.65, 20, 30),
+    ('Lab Praktik', 'LAB_BBL', 0.15, 20, 25),  # Baby care labs run warmer
+    ('Lab Konseling', 'LAB_KONSELING', 0.10, 20, 30),
+    ('Storage', 'DEPO', 0.10, 5, 5),
+]
+
+def generate_sensor_id(room_id, sensor_index=None):
     """Generate sensor ID with consistent naming"""
-    return f"SENS_{room_id}_{SENSOR_TYPE}"
+    if sensor_index is None:
+        return f"SENS_{room_id}_{SENSOR_TYPE}"
+    return f"SENS_{room_id}_{SENSOR_TYPE}_{sensor_index:02d}"
 
-def generate_environmental_data(timestamp, room_id, room_info):
+def build_topology(buildings=1, floors=1, rooms_per_floor=10, sensors_per_room=1,
+                   room_mix=TOPOLOGY_ROOM_MIX, seed=42):
     """
-    Generate realistic environmental sensor readings for midwifery labs
+    Build a ROOMS-style dict for a fleet of buildings x floors x rooms,
+    each room carrying `sensors_per_room` DHT22 sensors.
+    Room types are drawn from room_mix; capacities within each type's range.
     """
-    hour = timestamp.hour
-    day_of_week = timestamp.strftime('%A')
-    is_weekend = day_of_week in ['Saturday', 'Sunday']
+    rng = np.random.default_rng(seed)
+    n_rooms = buildings * floors * rooms_per_floor
+    shares = np.array([mix[2] for mix in room_mix])
+    type_idx = rng.choice(len(room_mix), size=n_rooms, p=shares / shares.sum())
+    capacity = np.array([rng.integers(room_mix[t][3], room_mix[t][4] + 1) for t in type_idx])
 
-    # Base environmental parameters (clinical environment)
-    base_temp = 23.0  # Clinical labs need cooler temp
-    base_humidity = 55.0  # Lower humidity for equipment preservation
-    base_co2 = 420
+    rooms = {}
+    i = 0
+    for b in range(1, buildings + 1):
+        for f in range(1, floors + 1):
+            for r in range(1, rooms_per_floor + 1):
+                room_type, prefix = room_mix[type_idx[i]][:2]
+                room_id = f"{prefix}_B{b:02d}F{f:02d}R{r:03d}"
+                rooms[room_id] = {
+                    'name': f"{room_type} {b:02d}-{f:02d}-{r:03d}",
+                    'building': f"Gedung {b:02d}",
+                    'floor': f,
+                    'capacity': int(capacity[i]),
+                    'type': room_type,
+                    'sensors': sensors_per_room
+                }
+                i += 1
+    return rooms
 
-    # Time-based variations
+def time_profile(hour):
+    """Return (temp_adj, occupancy_factor) for an hour of the day"""
     if 6 <= hour < 9:  # Early morning
-        temp_adj = -1.0
-        occupancy_factor = 0.1
+        return -1.0, 0.1
     elif 9 <= hour < 12:  # Morning practicum
-        temp_adj = 1.5
-        occupancy_factor = 0.7
+        return 1.5, 0.7
     elif 12 <= hour < 14:  # Lunch break
-        temp_adj = 2.0
-        occupancy_factor = 0.2
+        return 2.0, 0.2
     elif 14 <= hour < 17:  # Afternoon practicum
-        temp_adj = 2.5
-        occupancy_factor = 0.8
+        return 2.5, 0.8
     elif 17 <= hour < 20:  # Evening
-        temp_adj = 1.0
-        occupancy_factor = 0.3
+        return 1.0, 0.3
     else:  # Night
-        temp_adj = -0.5
-        occupancy_factor = 0.0
+        return -0.5, 0.0
+
+def room_profile(room_id, room_info):
+    """Return (base_temp, base_humidity, base_co2) for a room"""
+    # Base environmental parameters (clinical environment)
+    if room_info['type'] == 'Storage':  # Depo Alat
+        return 20.0, 45.0, 410  # Cooler and drier to prevent rust/damage
+    elif room_info['type'] == 'Lab Konseling':
+        return 24.0, 60.0, 420  # Slightly warmer for comfort
+    elif 'BBL' in room_id or 'ANAK' in room_id:
+        return 24.5, 58.0, 420  # Warmer for baby care
+    return 23.0, 55.0, 420  # Clinical labs need cooler temp
+
+def generate_environmental_data(timestamp, room_id, room_info):
+    """
+    Generate realistic environmental sensor readings for midwifery labs
+    """
+    hour = timestamp.hour
+    day_of_week = timestamp.strftime('%A')
+    is_weekend = day_of_week in ['Saturday', 'Sunday']
+
+    base_temp, base_humidity, base_co2 = room_profile(room_id, room_info)
+
+    # Time-based variations
+    temp_adj, occupancy_factor = time_profile(hour)
 
     # Weekend adjustment
     if is_weekend:
@@ -127,16 +183,7 @@ def generate_environmental_data(timestamp, room_id, room_info):
 
     # Room type specific adjustments
     if room_info['type'] == 'Storage':  # Depo Alat
-        base_temp = 20.0  # Cooler for equipment storage
-        base_humidity = 45.0  # Drier to prevent rust/damage
         occupancy_factor = 0.05  # Minimal human activity
-        base_co2 = 410
-    elif room_info['type'] == 'Lab Konseling':
-        base_temp = 24.0  # Slightly warmer for comfort
-        base_humidity = 60.0
-    elif 'BBL' in room_id or 'ANAK' in room_id:
-        base_temp = 24.5  # Warmer for baby care
-        base_humidity = 58.0
 
     # Calculate occupancy
     max_occupancy = room_info['capacity']
@@ -263,20 +310,493 @@ def generate_environmental_data(timestamp, room_id, room_info):
         'hour': hour
     }
 
-def generate_dataset():
+# ==================== VECTORIZED ENGINE ====================
+# Columnar version of generate_environmental_data(): a whole (time x room)
+# block is resolved with NumPy array operations instead of one dict per record.
+
+# Rows per generated block (rounded down to whole minutes of all rooms)
+BLOCK_ROWS = 1_000_000
+
+# Hour-of-day lookup table built from the same rules as the row engine
+HOUR_PROFILE = np.array([time_profile(hour) for hour in range(24)])
+
+def build_room_table(rooms=ROOMS, compact=False):
+    """
+    Flatten a ROOMS-style dict into per-sensor NumPy arrays (one entry per
+    sensor; rooms with a 'sensors' count > 1 are repeated).
+    compact=True makes generate_block() emit the room metadata as
+    categorical columns (integer codes + one dictionary) instead of strings.
+    """
+    room_ids, infos, sensor_ids = [], [], []
+    for room_id, info in rooms.items():
+        n_sensors = info.get('sensors', 1)
+        for k in range(n_sensors):
+            room_ids.append(room_id)
+            infos.append(info)
+            sensor_ids.append(generate_sensor_id(room_id, k + 1 if n_sensors > 1 else None))
+    profiles = np.array([room_profile(room_id, info) for room_id, info in zip(room_ids, infos)])
+    return {
+        'compact': compact,
+        'room_id': np.array(room_ids, dtype=object),
+        'sensor_id': np.array(sensor_ids, dtype=object),
+        'room_name': np.array([info['name'] for info in infos], dtype=object),
+        'building': np.array([info.get('building', 'Lab Kebidanan Mega') for info in infos], dtype=object),
+        'floor': np.array([info['floor'] for info in infos], dtype=np.int64),
+        'room_type': np.array([info['type'] for info in infos], dtype=object),
+        'capacity': np.array([info['capacity'] for info in infos], dtype=np.int64),
+        'is_storage': np.array([info['type'] == 'Storage' for info in infos]),
+        'base_temp': profiles[:, 0],
+        'base_humidity': profiles[:, 1],
+        'base_co2': profiles[:, 2].astype(np.int64),
+    }
+
+def _python_random_block(size):
     """
-    Generate complete IoT sensor dataset for midwifery labs
+    Draw `size` values from the global `random` stream in one call.
+    Python's random() and NumPy's MT19937 share the same generator and the
+    same 53-bit double conversion, so the state is handed to NumPy, used,
+    and handed back - the sequence is identical to calling random.random().
+    """
+    version, internal_state, gauss_next = random.getstate()
+    bit_generator = np.random.MT19937()
+    bit_generator.state = {
+        'bit_generator': 'MT19937',
+        'state': {'key': np.array(internal_state[:-1], dtype=np.uint32), 'pos': internal_state[-1]}
+    }
+    values = np.random.Generator(bit_generator).random(size)
+    state = bit_generator.state['state']
+    random.setstate((version, tuple(int(k) for k in state['key']) + (int(state['pos']),), gauss_next))
+    return values
+
+def draw_block_randoms(n, rng=None):
+    """
+    Draw the random variates for n records:
+    normals[:, 0:3] = temperature/humidity/CO2 noise, uniforms[:, 0:2] = occupancy/light.
+    rng=None replays the global np.random / random streams in exactly the
+    order the row engine consumes them (exact reproduction mode).
+    """
+    if rng is None:
+        normals = np.random.standard_normal((n, 3))
+        uniforms = _python_random_block(2 * n).reshape(n, 2)
+    else:
+        normals = rng.standard_normal((n, 3))
+        uniforms = rng.random((n, 2))
+    return normals, uniforms
+
+def _uniform(low, high, u):
+    """Vectorized random.uniform(low, high) from pre-drawn u in [0, 1)"""
+    return low + (high - low) * u
+
+def _format_alert_details(warn_idx, checks):
+    """Build the '; '-joined alert_details strings for the rows in warn_idx"""
+    details = np.full(len(warn_idx), '', dtype=object)
+    for mask, labels, values, unit in checks:
+        hit = mask[warn_idx]
+        if not hit.any():
+            continue
+        text = labels[warn_idx][hit] + values[warn_idx][hit].astype(str).astype(object) + unit
+        sep = np.where(details[hit] == '', '', '; ')
+        details[hit] = details[hit] + sep + text
+    return details
+
+def generate_block(times, room_table, normals, uniforms):
+    """
+    Generate all readings for len(times) minutes x all sensors as one DataFrame.
+    Rows are time-major (every room for minute 0, then minute 1, ...),
+    matching the record order of generate_dataset().
+    """
+    n_times = len(times)
+    n_rooms = len(room_table['sensor_id'])
+    n = n_times * n_rooms
+
+    # Per-minute attributes (computed once per minute, then broadcast)
+    hour_t = np.asarray(times.hour)
+    weekend_t = np.asarray(times.dayofweek >= 5)
+    day_codes, days = pd.factorize(times.normalize())
+    day_name_t = np.asarray(days.day_name(), dtype=object)[day_codes]
+    date_t = np.asarray(days.strftime('%Y-%m-%d'), dtype=object)[day_codes]
+
+    temp_adj_t = HOUR_PROFILE[hour_t, 0]
+    occupancy_factor_t = np.where(weekend_t, HOUR_PROFILE[hour_t, 1] * 0.1, HOUR_PROFILE[hour_t, 1])
+
+    def per_time(values):
+        return np.repeat(values, n_rooms)
+
+    def per_room(values):
+        return np.tile(values, n_times)
+
+    hour = per_time(hour_t)
+    is_storage = per_room(room_table['is_storage'])
+    capacity = per_room(room_table['capacity'])
+
+    # Occupancy
+    occupancy_factor = np.where(is_storage, 0.05, per_time(occupancy_factor_t))
+    occupancy = (capacity * occupancy_factor * _uniform(0.6, 1.2, uniforms[:, 0])).astype(np.int64)
+    occupancy = np.clip(occupancy, 0, capacity)
+
+    # Temperature (20-30°C), humidity (40-75%), CO2 (400-1800 ppm)
+    temperature = per_room(room_table['base_temp']) + per_time(temp_adj_t) + normals[:, 0] * 1.0 + occupancy * 0.04
+    temperature = np.round(np.clip(temperature, 20, 30), 2)
+
+    humidity = per_room(room_table['base_humidity']) + normals[:, 1] * 2.5 + occupancy * 0.06
+    humidity = np.round(np.clip(humidity, 40, 75), 2)
+
+    co2 = (per_room(room_table['base_co2']) + occupancy * 25 + normals[:, 2] * 40).astype(np.int64)
+    co2 = np.clip(co2, 400, 1800)
+
+    # Light (0-700 lux)
+    daytime = (hour >= 6) & (hour < 18)
+    light_low = np.where(is_storage, np.where(daytime, 100, 0), np.where(daytime, 250, 0))
+    light_high = np.where(is_storage, np.where(daytime, 300, 50), np.where(daytime, 700, 100))
+    light = _uniform(light_low, light_high, uniforms[:, 1]).astype(np.int64)
+
+    # Occupancy percentage (rounded with Python's round() on the few distinct ratios)
+    ratio, inverse = np.unique(occupancy / capacity * 100, return_inverse=True)
+    occupancy_pct = np.array([round(float(value), 1) for value in ratio])[inverse.ravel()]
+    occupancy_pct = np.where(capacity > 0, occupancy_pct, 0)
+
+    # AC Status
+    ac_on = np.where(is_storage, temperature > 22, (temperature > 25) & (occupancy > capacity * 0.2))
+
+    # Alert status (storage thresholds vs lab praktik thresholds)
+    temp_high = np.where(is_storage, temperature > 23, temperature > 27)
+    humidity_high = np.where(is_storage, humidity > 50, humidity > 70)
+    co2_high = np.where(is_storage, co2 > 600, co2 > 1200)
+    warning = temp_high | humidity_high | co2_high
+    critical = (temperature > 29) | (temperature < 18) | (co2 > 1500)
+    alert_status = np.select([critical, warning], ['CRITICAL', 'WARNING'], 'NORMAL').astype(object)
+
+    alert_details = np.full(n, None, dtype=object)
+    warn_idx = np.flatnonzero(warning)
+    alert_details[warn_idx] = _format_alert_details(warn_idx, [
+        (temp_high, np.where(is_storage, 'Storage temp high: ', 'Temperature comfort: ').astype(object), temperature, '°C'),
+        (humidity_high, np.where(is_storage, 'Humidity risk: ', 'High humidity: ').astype(object), humidity, '%'),
+        (co2_high, np.where(is_storage, 'Ventilation needed: ', 'CO2 elevated: ').astype(object), co2, 'ppm'),
+    ])
+
+    # Thermal comfort (clinical PMV)
+    optimal_storage = (temperature >= 18) & (temperature <= 22) & (humidity < 50)
+    comfortable = (temperature >= 22) & (temperature <= 25) & (humidity >= 45) & (humidity <= 65)
+    acceptable = (temperature >= 20) & (temperature <= 27) & (humidity >= 40) & (humidity <= 70)
+    thermal_comfort = np.where(
+        is_storage,
+        np.where(optimal_storage, 'Optimal Storage', 'Suboptimal'),
+        np.select([comfortable, acceptable], ['Comfortable', 'Acceptable'], 'Uncomfortable')
+    ).astype(object)
+
+    # Energy efficiency score (0-100)
+    temp_efficiency = 100 - np.abs(temperature - 23) * 10
+    humidity_efficiency = 100 - np.abs(humidity - 55) * 2
+    co2_efficiency = np.where(co2 < 800, 100, 100 - (co2 - 800) / 10)
+    energy_efficiency = np.round((temp_efficiency + humidity_efficiency + co2_efficiency) / 3, 1)
+    energy_efficiency = np.clip(energy_efficiency, 0, 100)
+
+    def room_attribute(name):
+        if not room_table['compact']:
+            return per_room(room_table[name])
+        # Integer codes repeated per row, strings stored once in the categories
+        codes, categories = pd.factorize(room_table[name])
+        return pd.Categorical.from_codes(per_room(codes), categories=categories)
+
+    block = pd.DataFrame({
+        'sensor_id': room_attribute('sensor_id'),
+        'timestamp': np.repeat(times.values, n_rooms),
+        'room_id': room_attribute('room_id'),
+        'room_name': room_attribute('room_name'),
+        'building': room_attribute('building'),
+        'floor': per_room(room_table['floor']),
+        'room_type': room_attribute('room_type'),
+        'temperature': temperature,
+        'humidity': humidity,
+        'co2_ppm': co2,
+        'light_lux': light,
+        'occupancy_count': occupancy,
+        'room_capacity': capacity,
+        'occupancy_pct': occupancy_pct,
+        'ac_status': np.where(ac_on, 'ON', 'OFF').astype(object),
+        'alert_status': alert_status,
+        'alert_details': alert_details,
+        'thermal_comfort': thermal_comfort,
+        'energy_efficiency': energy_efficiency,
+        'day_of_week': per_time(day_name_t),
+        'is_weekend': per_time(np.where(weekend_t, 'Yes', 'No').astype(object)),
+        'date': per_time(date_t),
+        'hour': hour.astype(np.int64)
+    })
+    # Keep the dtype stable for blocks without any alert text so blocks concat cleanly
+    block['alert_details'] = block['alert_details'].astype(block['ac_status'].dtype)
+    return block
+
+def plan_blocks(num_records, n_rooms, block_rows=BLOCK_ROWS):
+    """Split the time range into (block_index, start_minute, n_minutes) blocks"""
+    total_minutes = num_records // n_rooms
+    block_minutes = max(1, block_rows // n_rooms)
+    return [(block_index, start, min(block_minutes, total_minutes - start))
+            for block_index, start in enumerate(range(0, total_minutes, block_minutes))]
+
+def block_rng(seed, block_index):
+    """Independent, reproducible numpy.random.Generator stream for one block"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+
+def block_times(start_minute, n_minutes):
+    """Minute timestamps covered by a block"""
+    return pd.date_range(START_DATE + timedelta(minutes=start_minute), periods=n_minutes, freq='min', unit='us')
+
+def iter_vectorized_blocks(num_records=NUM_RECORDS, rooms=ROOMS, exact=False, seed=42, block_rows=BLOCK_ROWS,
+                           compact=False):
+    """
+    Yield the dataset as consecutive (time x room) DataFrame blocks.
+    exact=True reseeds the global generators and reproduces generate_dataset()
+    record for record; otherwise every block draws from its own block_rng()
+    stream, so any block can be regenerated on its own (see generate_parallel).
+    """
+    room_table = build_room_table(rooms, compact)
+    n_sensors = len(room_table['sensor_id'])
+
+    if exact:
+        np.random.seed(seed)
+        random.seed(seed)
+
+    for block_index, start, n_minutes in plan_blocks(num_records, n_sensors, block_rows):
+        rng = None if exact else block_rng(seed, block_index)
+        normals, uniforms = draw_block_randoms(n_minutes * n_sensors, rng)
+        yield generate_block(block_times(start, n_minutes), room_table, normals, uniforms)
+
+# ==================== BRONZE SCHEMA ====================
+# Compact bronze layout (--bronze-schema compact): dictionary-encoded strings,
+# narrow numeric types, a real boolean for is_weekend and no date columns
+# that can be derived from `timestamp` (date_str survives as partition key).
+COMPACT_BRONZE_DTYPES = {
+    'sensor_id': 'category',
+    'room_id': 'category',
+    'room_name': 'category',
+    'building': 'category',
+    'floor': 'int8',
+    'room_type': 'category',
+    'temperature': 'float32',
+    'humidity': 'float32',
+    'co2_ppm': 'int16',
+    'light_lux': 'int16',
+    'occupancy_count': 'int16',
+    'room_capacity': 'int16',
+    'occupancy_pct': 'float32',
+    'ac_status': pd.CategoricalDtype(['OFF', 'ON']),
+    'alert_status': pd.CategoricalDtype(['NORMAL', 'WARNING', 'CRITICAL']),
+    'thermal_comfort': pd.CategoricalDtype(['Comfortable', 'Acceptable', 'Uncomfortable',
+                                            'Optimal Storage', 'Suboptimal']),
+    'energy_efficiency': 'float32',
+    'is_weekend': 'bool'
+}
+COMPACT_BRONZE_DROP = ['day_of_week', 'date', 'hour', 'date_str']
+
+def to_compact_bronze(df):
+    """Convert a generated frame to the compact bronze layout"""
+    compact = df.drop(columns=[col for col in COMPACT_BRONZE_DROP if col in df.columns])
+    if compact['is_weekend'].dtype != bool:
+        compact['is_weekend'] = compact['is_weekend'] == 'Yes'
+    return compact.astype(COMPACT_BRONZE_DTYPES)
+
+def to_bronze(df, bronze_schema='full'):
+    """Return the frame in the requested bronze layout ('full' or 'compact')"""
+    return to_compact_bronze(df) if bronze_schema == 'compact' else df
+
+def report_bronze_schema(df):
     """
+    Write `df` in the full and the compact bronze layout and compare
+    bytes per row (on disk and in memory) and read time
+    """
+    print("📐 BRONZE SCHEMA COMPARISON (full vs compact):")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, frame in (('full', df), ('compact', to_compact_bronze(df))):
+            path = os.path.join(tmp_dir, f'{name}.parquet')
+            frame.to_parquet(path, engine='pyarrow', compression='snappy', index=False)
+            start = time.perf_counter()
+            loaded = pd.read_parquet(path)
+            read_ms = (time.perf_counter() - start) * 1000
+            results[name] = {
+                'columns': len(frame.columns),
+                'disk_bytes_per_row': os.path.getsize(path) / len(frame),
+                'memory_bytes_per_row': loaded.memory_usage(deep=True).sum() / len(frame),
+                'read_ms': read_ms
+            }
+
+    full, compact = results['full'], results['compact']
+    print(f"  {'':10s} {'Columns':>8s} {'Disk B/row':>12s} {'Memory B/row':>14s} {'Read (ms)':>10s}")
+    for name, r in results.items():
+        print(f"  {name:10s} {r['columns']:8d} {r['disk_bytes_per_row']:12.2f} "
+              f"{r['memory_bytes_per_row']:14.1f} {r['read_ms']:10.2f}")
+    print(f"  Savings:   disk {(1 - compact['disk_bytes_per_row'] / full['disk_bytes_per_row']) * 100:.1f}%, "
+          f"memory {(1 - compact['memory_bytes_per_row'] / full['memory_bytes_per_row']) * 100:.1f}%, "
+          f"read time {(1 - compact['read_ms'] / full['read_ms']) * 100:.1f}%")
+    print()
+    return results
+
+def to_arrow_table(block, schema=None):
+    """Convert a block to a pyarrow Table, typing all-null columns as string"""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(block, schema=schema, preserve_index=False)
+    if schema is None and any(pa.types.is_null(f.type) for f in table.schema):
+        # A quiet block can have an all-null alert_details column
+        table = table.cast(pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                      for f in table.schema], metadata=table.schema.metadata))
+    return table
+
+def staging_path(path):
+    """Sibling staging directory for a dataset that is rewritten as a whole"""
+    head, tail = os.path.split(path)
+    return os.path.join(head, f"_staging-{tail}")
+
+def publish_directory(staged_path, path):
+    """
+    Swap a completely written staging directory in place of `path`, so a
+    re-run replaces the dataset instead of adding part files to it
+    """
+    head, tail = os.path.split(path)
+    retired_path = os.path.join(head, f"_retired-{tail}")
+    shutil.rmtree(retired_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, retired_path)
+    os.rename(staged_path, path)
+    shutil.rmtree(retired_path, ignore_errors=True)
+
+def commit_manifests(paths, operation='generate'):
+    """Record rewritten bronze tables in their manifests (03_pipeline/table_manifest.py)"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '03_pipeline'))
+    try:
+        from table_manifest import commit
+    except ImportError:
+        print("  ⚠️ table_manifest not available - bronze manifests not updated")
+        return
+    for path in paths:
+        if os.path.exists(path):
+            commit(path, operation)
+
+def write_partition_shard(shard, seed=42, rooms=ROOMS, compact=False, bronze_schema='full',
+                          partition_path='02_data/bronze/sensor_data_partitioned'):
+    """
+    Generate one time shard and write its own part file into every date
+    partition it touches. File names depend only on the block index, so
+    the output does not depend on which worker ran the shard.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    block_index, start, n_minutes = shard
+    room_table = build_room_table(rooms, compact)
+    normals, uniforms = draw_block_randoms(n_minutes * len(room_table['sensor_id']), block_rng(seed, block_index))
+    block = generate_block(block_times(start, n_minutes), room_table, normals, uniforms)
+    table = to_arrow_table(to_bronze(block, bronze_schema))
+
+    days = block['timestamp'].dt.normalize()
+    for day in days.unique():
+        partition_dir = f"{partition_path}/date_str={day.strftime('%Y-%m-%d')}"
+        os.makedirs(partition_dir, exist_ok=True)
+        pq.write_table(table.filter(pa.array(days == day)),
+                       f"{partition_dir}/part-{block_index:05d}.parquet", compression='snappy')
+    return len(block)
+
+def merge_partitions(partition_path, parquet_path, bronze_schema='full'):
+    """
+    Rewrite the single-file bronze from the partitioned dataset, one part file
+    at a time in date order, so both layouts hold the same records. The full
+    schema keeps date_str as a column, like save_multiple_formats / save_chunked.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp_path = parquet_path + '.tmp'
+    writer = None
+    try:
+        for entry in sorted(os.listdir(partition_path)):
+            if not entry.startswith('date_str='):
+                continue
+            date_str = entry[len('date_str='):]
+            for name in sorted(os.listdir(os.path.join(partition_path, entry))):
+                table = pq.ParquetFile(os.path.join(partition_path, entry, name)).read()
+                if bronze_schema == 'full':
+                    table = table.append_column('date_str', pa.array([date_str] * table.num_rows, pa.string()))
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression='snappy')
+                writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, parquet_path)
+
+def generate_parallel(num_records, workers, seed=42, block_rows=BLOCK_ROWS, rooms=ROOMS, compact=False,
+                      bronze_schema='full'):
+    """
+    Generate the partitioned bronze dataset with a pool of worker processes.
+    The time range is split into fixed blocks (independent of `workers`),
+    so the written part files are identical for any worker count.
+    The single-file bronze is rebuilt from the partitions; raw CSV / JSON
+    files of an earlier run would describe another dataset and are removed.
+    """
+    partition_path = '02_data/bronze/sensor_data_partitioned'
+    parquet_path = '02_data/bronze/sensor_data.parquet'
+    shards = plan_blocks(num_records, len(build_room_table(rooms)['sensor_id']), block_rows)
+
+    print(f"🔄 Generating {num_records:,} records in {len(shards)} shards with {workers} worker(s)...")
+
+    # The whole dataset is rewritten: shards go to a staging directory that replaces it at the end
+    staged_path = staging_path(partition_path)
+    shutil.rmtree(staged_path, ignore_errors=True)
+    task = functools.partial(write_partition_shard, seed=seed, rooms=rooms, compact=compact,
+                             bronze_schema=bronze_schema, partition_path=staged_path)
+
+    written = 0
+    if workers == 1:
+        for rows in map(task, shards):
+            written += rows
+            print(f"  ✓ Written {written:,}/{num_records:,} records...")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows in pool.map(task, shards):
+                written += rows
+                print(f"  ✓ Written {written:,}/{num_records:,} records...")
+    publish_directory(staged_path, partition_path)
+    merge_partitions(partition_path, parquet_path, bronze_schema)
+    commit_manifests([parquet_path, partition_path])
+
+    print(f"✅ Partitioned Parquet saved: {partition_path}/")
+    print(f"✅ Single-file Parquet rebuilt: {parquet_path}")
+    for raw_path in ('02_data/raw/csv/sensor_data.csv', '02_data/raw/json/sensor_data.json',
+                     '02_data/raw/json/sensor_data.jsonl'):
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+            print(f"  🗑️ Removed stale raw file: {raw_path}")
+    print()
+    return written
+
+def print_configuration(num_records, engine, rooms=None):
+    """Print building, sensor and room configuration banner"""
     print("=" * 60)
     print("  IoT ENVIRONMENTAL MONITORING - LAB KEBIDANAN MEGA")
     print("=" * 60)
     print()
+
+    if rooms is not None:
+        # Fleet topology: summary only, the room list can run into thousands
+        room_types = pd.Series([info['type'] for info in rooms.values()]).value_counts()
+        print(f"🏥 Buildings: {len({info['building'] for info in rooms.values()})}")
+        print(f"🚪 Total Rooms: {len(rooms):,}")
+        for room_type, count in room_types.items():
+            print(f"   - {room_type}: {count:,} ruangan")
+        print(f"📡 Sensors: {sum(info.get('sensors', 1) for info in rooms.values()):,} x {SENSOR_TYPE}")
+        print(f"📊 Target Records: {num_records:,}")
+        print(f"⚙️  Engine: {engine}")
+        print()
+        return
+
     print(f"🏥 Building: Lab Kebidanan Mega")
     print(f"🚪 Total Rooms: {len(ROOMS)}")
     print(f"   - Lab Praktik Kebidanan: 9 ruangan")
     print(f"   - Depo Alat: 1 ruangan")
     print(f"📡 Sensor Type: {SENSOR_TYPE}")
-    print(f"📊 Target Records: {NUM_RECORDS:,}")
+    print(f"📊 Target Records: {num_records:,}")
+    print(f"⚙️  Engine: {engine}")
     print()
 
     # Print room details
@@ -285,14 +805,41 @@ def generate_dataset():
         print(f"  {i:2d}. {room_id:15s} - {room_info['name'][:40]:40s} (Lantai {room_info['floor']}, Kapasitas: {room_info['capacity']})")
     print()
 
+def generate_dataset(num_records=NUM_RECORDS, engine='row', exact=False, seed=42, rooms=None):
+    """
+    Generate complete IoT sensor dataset for midwifery labs
+    engine='row' builds one record at a time, engine='vectorized' builds
+    whole (time x room) blocks with NumPy (see iter_vectorized_blocks).
+    rooms: optional fleet from build_topology() (vectorized engine only,
+    room metadata is returned as categorical columns).
+    """
+    if rooms is not None:
+        engine = 'vectorized'
+    print_configuration(num_records, engine + (' (exact)' if engine == 'vectorized' and exact else ''), rooms)
+
+    if engine == 'vectorized':
+        print(f"🔄 Generating {num_records} sensor records (vectorized)...")
+        blocks = []
+        records_so_far = 0
+        for block in iter_vectorized_blocks(num_records, rooms=rooms or ROOMS, exact=exact, seed=seed,
+                                            compact=rooms is not None):
+            blocks.append(block)
+            records_so_far += len(block)
+            print(f"  ✓ Generated {records_so_far:,}/{num_records:,} records...")
+        df = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+
+        print(f"✅ Successfully generated {len(df):,} records!")
+        print()
+        return df
+
     data = []
     current_time = START_DATE
 
     # Calculate time interval
-    total_minutes = NUM_RECORDS // len(ROOMS)
+    total_minutes = num_records // len(ROOMS)
     time_increment = timedelta(minutes=1)
 
-    print(f"🔄 Generating {NUM_RECORDS} sensor records...")
+    print(f"🔄 Generating {num_records} sensor records...")
 
     for i in range(total_minutes):
         for room_id, room_info in ROOMS.items():
@@ -304,19 +851,20 @@ def generate_dataset():
         # Progress indicator
         if (i + 1) % 50 == 0:
             records_so_far = (i + 1) * len(ROOMS)
-            print(f"  ✓ Generated {records_so_far}/{NUM_RECORDS} records...")
+            print(f"  ✓ Generated {records_so_far}/{num_records} records...")
 
     df = pd.DataFrame(data)
-    df = df.head(NUM_RECORDS)  # Trim to exact count
+    df = df.head(num_records)  # Trim to exact count
 
     print(f"✅ Successfully generated {len(df):,} records!")
     print()
 
     return df
 
-def save_multiple_formats(df):
+def save_multiple_formats(df, bronze_schema='full'):
     """
     Save data in multiple formats for comparison
+    bronze_schema='compact' writes the bronze Parquet files with to_compact_bronze()
     """
     print("💾 Saving data in multiple formats...")
     print()
@@ -349,16 +897,22 @@ def save_multiple_formats(df):
         parquet_path = '02_data/bronze/sensor_data.parquet'
         # Add 'date_str' column here BEFORE saving any parquet file
         df['date_str'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d')
-        df.to_parquet(parquet_path, engine='pyarrow', compression='snappy', index=False)
+        bronze = to_bronze(df, bronze_schema)
+        bronze.to_parquet(parquet_path, engine='pyarrow', compression='snappy', index=False)
         parquet_size = os.path.getsize(parquet_path) / (1024 * 1024)
-        print(f"     ✓ Parquet saved: {parquet_size:.2f} MB")
+        print(f"     ✓ Parquet saved ({bronze_schema} schema): {parquet_size:.2f} MB")
 
         # Partitioned Parquet
         print("  📦 Saving as Partitioned Parquet (by date)...")
         partition_path = '02_data/bronze/sensor_data_partitioned'
-        # 'date_str' already exists
-        df.to_parquet(partition_path, engine='pyarrow', compression='snappy',
-                      partition_cols=['date_str'], index=False)
+        # 'date_str' already exists (kept as partition key only in the compact schema).
+        # to_parquet adds files to existing partitions, so write a fresh copy and swap it in
+        staged_path = staging_path(partition_path)
+        shutil.rmtree(staged_path, ignore_errors=True)
+        bronze.assign(date_str=df['date_str']).to_parquet(staged_path, engine='pyarrow', compression='snappy',
+                                                          partition_cols=['date_str'], index=False)
+        publish_directory(staged_path, partition_path)
+        commit_manifests([parquet_path, partition_path])
         print(f"     ✓ Partitioned Parquet saved")
 
         print()
@@ -378,6 +932,104 @@ def save_multiple_formats(df):
         print(f"     ✓ Bronze CSV saved (fallback)")
         return {'csv_mb': csv_size, 'json_mb': json_size}
 
+def save_chunked(blocks, num_records, bronze_schema='full'):
+    """
+    Stream generated blocks into CSV, JSON Lines and Parquet outputs.
+    Each block is appended through long-lived writers and then dropped,
+    so peak memory is one block no matter how many records are written.
+    """
+    print("💾 Saving data in chunks (bounded memory)...")
+    print()
+
+    os.makedirs('02_data/raw/csv', exist_ok=True)
+    os.makedirs('02_data/raw/json', exist_ok=True)
+    os.makedirs('02_data/bronze', exist_ok=True)
+
+    csv_path = '02_data/raw/csv/sensor_data.csv'
+    jsonl_path = '02_data/raw/json/sensor_data.jsonl'
+    parquet_path = '02_data/bronze/sensor_data.parquet'
+    partition_path = '02_data/bronze/sensor_data_partitioned'
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        pa = pq = None
+        print("  ⚠️ pyarrow not available - Parquet outputs skipped")
+
+    # The whole dataset is rewritten: partitions go to a staging directory that replaces it at the end
+    staged_path = staging_path(partition_path)
+    if pa is not None:
+        shutil.rmtree(staged_path, ignore_errors=True)
+
+    schema = None
+    parquet_writer = None
+    partition_writers = {}
+    written = 0
+
+    try:
+        with open(csv_path, 'w', newline='') as csv_file, open(jsonl_path, 'w') as jsonl_file:
+            for block in blocks:
+                # 1. CSV (header only once)
+                block.to_csv(csv_file, header=(written == 0), index=False)
+
+                # 2. JSON Lines
+                json_block = block.assign(timestamp=block['timestamp'].astype(str))
+                jsonl_file.write(json_block.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n')
+
+                # 3. Parquet (single file + partitioned by date)
+                if pa is not None:
+                    # Same layout as save_multiple_formats: date_str is a column of the
+                    # single file (full schema) and only the partition key of the partitions
+                    date_strs = block['timestamp'].dt.strftime('%Y-%m-%d')
+                    table = to_arrow_table(to_bronze(block.assign(date_str=date_strs), bronze_schema), schema)
+                    if schema is None:
+                        schema = table.schema
+                        parquet_writer = pq.ParquetWriter(parquet_path, schema, compression='snappy')
+                    parquet_writer.write_table(table)
+                    partition_table = table.drop_columns([c for c in ['date_str'] if c in table.column_names])
+
+                    block_days = date_strs.unique()
+                    for date_str in block_days:
+                        if date_str not in partition_writers:
+                            partition_dir = f"{staged_path}/date_str={date_str}"
+                            os.makedirs(partition_dir, exist_ok=True)
+                            partition_writers[date_str] = pq.ParquetWriter(
+                                f"{partition_dir}/part-0.parquet", partition_table.schema, compression='snappy')
+                        partition_writers[date_str].write_table(partition_table.filter(pa.array(date_strs == date_str)))
+
+                    # Blocks arrive in time order: earlier days are complete
+                    last_day = max(block_days)
+                    for date_str in [d for d in partition_writers if d < last_day]:
+                        partition_writers.pop(date_str).close()
+
+                written += len(block)
+                print(f"  ✓ Written {written:,}/{num_records:,} records...")
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+        for writer in partition_writers.values():
+            writer.close()
+    if pa is not None:
+        publish_directory(staged_path, partition_path)
+        commit_manifests([parquet_path, partition_path])
+
+    csv_size = os.path.getsize(csv_path) / (1024 * 1024)
+    jsonl_size = os.path.getsize(jsonl_path) / (1024 * 1024)
+    sizes = {'csv_mb': csv_size, 'jsonl_mb': jsonl_size}
+
+    print()
+    print(f"📊 SIZE COMPARISON:")
+    print(f"  CSV:      {csv_size:.2f} MB (baseline)")
+    print(f"  JSONL:    {jsonl_size:.2f} MB ({jsonl_size/csv_size*100:.1f}% of CSV)")
+    if pa is not None:
+        parquet_size = os.path.getsize(parquet_path) / (1024 * 1024)
+        sizes['parquet_mb'] = parquet_size
+        print(f"  Parquet:  {parquet_size:.2f} MB ({parquet_size/csv_size*100:.1f}% of CSV)")
+    print()
+
+    return sizes
+
 def create_data_dictionary(df):
     """
     Create data dictionary documentation
@@ -463,42 +1115,110 @@ def create_data_dictionary(df):
 
 # Main execution
 if __name__ == "__main__":
-    df = generate_dataset()
+    parser = argparse.ArgumentParser(description="IoT sensor data generator - Lab Kebidanan Mega")
+    parser.add_argument('--records', type=int, default=NUM_RECORDS,
+                        help=f"number of records to generate (default: {NUM_RECORDS})")
+    parser.add_argument('--engine', choices=['row', 'vectorized'], default=None,
+                        help="row = one record at a time (default), vectorized = NumPy (time x room) blocks; "
+                             "--chunk-rows / --workers are vectorized only")
+    parser.add_argument('--exact', action='store_true',
+                        help="vectorized engine: reproduce the seeded row-engine output exactly")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="stream vectorized chunks of N rows straight to disk (bounded memory)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="write the partitioned bronze dataset with N processes (same output for any N)")
+    parser.add_argument('--bronze-schema', choices=['full', 'compact'], default='full',
+                        help="compact = categorical/narrow dtypes, no derived date columns in bronze Parquet")
+    topology = parser.add_argument_group('fleet topology (replaces the 10 Lab Kebidanan rooms)')
+    topology.add_argument('--buildings', type=int, default=None)
+    topology.add_argument('--floors', type=int, default=None, help="floors per building")
+    topology.add_argument('--rooms-per-floor', type=int, default=None)
+    topology.add_argument('--sensors-per-room', type=int, default=None)
+    args = parser.parse_args()
 
-    print("📋 DATA PREVIEW:")
-    print(df.head(10).to_string())
-    print()
+    rooms = None
+    if any(v is not None for v in (args.buildings, args.floors, args.rooms_per_floor, args.sensors_per_room)):
+        rooms = build_topology(buildings=args.buildings or 1, floors=args.floors or 1,
+                               rooms_per_floor=args.rooms_per_floor or 10,
+                               sensors_per_room=args.sensors_per_room or 1)
 
-    print("📊 ENVIRONMENTAL STATISTICS:")
-    print(df[['temperature', 'humidity', 'co2_ppm', 'light_lux', 'occupancy_count']].describe())
-    print()
+    if args.engine == 'row' and (args.chunk_rows or args.workers):
+        parser.error("--chunk-rows and --workers always use the vectorized engine (omit --engine or pass vectorized)")
 
-    print("🏥 ROOM STATISTICS:")
-    room_stats = df.groupby('room_id').agg({
-        'temperature': 'mean',
-        'humidity': 'mean',
-        'occupancy_count': 'mean'
-    }).round(2)
-    print(room_stats)
-    print()
+    if args.workers:
+        if args.exact:
+            parser.error("--exact replays one sequential random stream and cannot be combined with --workers")
+        print_configuration(args.records, f"vectorized, parallel ({args.workers} workers)", rooms)
+        generate_parallel(args.records, args.workers, block_rows=args.chunk_rows or BLOCK_ROWS,
+                          rooms=rooms or ROOMS, compact=rooms is not None, bronze_schema=args.bronze_schema)
 
-    sizes = save_multiple_formats(df)
-    # Ensure df passed to create_data_dictionary includes 'date_str'
-    create_data_dictionary(df)
+        print("=" * 60)
+        print("✅ ALL DONE! Lab Kebidanan Mega Dataset Ready")
+        print("=" * 60)
+        print()
+        print("📁 Generated files:")
+        print("  - 02_data/bronze/sensor_data.parquet")
+        print("  - 02_data/bronze/sensor_data_partitioned/")
+    elif args.chunk_rows:
+        print_configuration(args.records, f"vectorized, chunked ({args.chunk_rows:,} rows/chunk)", rooms)
+        blocks = iter_vectorized_blocks(args.records, rooms=rooms or ROOMS, exact=args.exact,
+                                        block_rows=args.chunk_rows, compact=rooms is not None)
+        if args.bronze_schema == 'compact':
+            # Measure on the first chunk, then put it back in front of the stream
+            first_block = next(blocks)
+            report_bronze_schema(first_block)
+            blocks = itertools.chain([first_block], blocks)
+        save_chunked(blocks, args.records, args.bronze_schema)
 
-    print("=" * 60)
-    print("✅ ALL DONE! Lab Kebidanan Mega Dataset Ready")
-    print("=" * 60)
-    print()
-    print("📁 Generated files:")
-    print("  - 02_data/raw/csv/sensor_data.csv")
-    print("  - 02_data/raw/json/sensor_data.json")
-    print("  - 02_data/bronze/sensor_data.parquet")
-    print("  - 02_data/bronze/sensor_data_partitioned/") # Added partitioned folder
-    print("  - 06_docs/data_dictionary.csv")
-    print("  - 06_docs/data_dictionary.md")
-    print()
-    print("🚀 Next steps:")
-    print("  1. python 03_pipeline/batch_pipeline.py")
-    print("  2. python 04_queries/sample_queries.py")
-    print("  3. python 05_evaluation/benchmark_formats.py")
\ No newline at end of file
+        print("=" * 60)
+        print("✅ ALL DONE! Lab Kebidanan Mega Dataset Ready")
+        print("=" * 60)
+        print()
+        print("📁 Generated files:")
+        print("  - 02_data/raw/csv/sensor_data.csv")
+        print("  - 02_data/raw/json/sensor_data.jsonl")
+        print("  - 02_data/bronze/sensor_data.parquet")
+        print("  - 02_data/bronze/sensor_data_partitioned/")
+    else:
+        df = generate_dataset(num_records=args.records, engine=args.engine or 'row', exact=args.exact, rooms=rooms)
+
+        print("📋 DATA PREVIEW:")
+        print(df.head(10).to_string())
+        print()
+
+        print("📊 ENVIRONMENTAL STATISTICS:")
+        print(df[['temperature', 'humidity', 'co2_ppm', 'light_lux', 'occupancy_count']].describe())
+        print()
+
+        print("🏥 ROOM STATISTICS:")
+        room_stats = df.groupby('room_id').agg({
+            'temperature': 'mean',
+            'humidity': 'mean',
+            'occupancy_count': 'mean'
+        }).round(2)
+        print(room_stats)
+        print()
+
+        if args.bronze_schema == 'compact':
+            report_bronze_schema(df)
+
+        sizes = save_multiple_formats(df, args.bronze_schema)
+        # Ensure df passed to create_data_dictionary includes 'date_str'
+        create_data_dictionary(df)
+
+        print("=" * 60)
+        print("✅ ALL DONE! Lab Kebidanan Mega Dataset Ready")
+        print("=" * 60)
+        print()
+        print("📁 Generated files:")
+        print("  - 02_data/raw/csv/sensor_data.csv")
+        print("  - 02_data/raw/json/sensor_data.json")
+        print("  - 02_data/bronze/sensor_data.parquet")
+        print("  - 02_data/bronze/sensor_data_partitioned/") # Added partitioned folder
+        print("  - 06_docs/data_dictionary.csv")
+        print("  - 06_docs/data_dictionary.md")
+        print()
+        print("🚀 Next steps:")
+        print("  1. python 03_pipeline/batch_pipeline.py")
+        print("  2. python 04_queries/sample_queries.py")
+        print("  3. python 05_evaluation/benchmark_formats.py")
\ No newline at end of file
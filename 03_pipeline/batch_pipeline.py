@@ -1,221 +1,1249 @@
 """
 Batch Pipeline - Extract, Transform, Load
 Bronze → Silver → Gold layers
+
+Modes:
+  full         rebuild silver and every gold table from the bronze layer (default)
+  incremental  only process bronze date partitions that are new or changed since
+               the last run, tracked in a small state file (high-water mark)
+  streaming    full rebuild out of core: bronze is scanned in record batches and
+               silver/gold are written batch by batch (bounded memory)
+
+Every mode writes silver and the quarantine as date-partitioned datasets
+(partition_date=YYYY-MM-DD; rejected rows without a timestamp go to
+partition_date=unknown), so an incremental run after a full one updates the
+same silver that every reader sees.
+
+With --workers N a full rebuild runs partition-parallel: every bronze date
+partition goes through silver and the fact build in a process pool, and the
+small per-partition results (dim_room, dim_time, summary_hourly) are merged
+in a final reduce step.
 """
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.json as pa_json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import argparse
+import functools
+import json
 import os
+import shutil
+import time
+
+from dimension_store import DimensionStore, room_observations, ROOM_COLUMNS
+from gold_layout import write_fact_file, compact_table
+from table_manifest import TableLock, begin_write, commit, load_snapshot, read_table, write_parquet
+from partition_writer import (replace_partitions, commit_table, drop_partition, live_partitions, partition_name,
+                              recover, STAGING_PREFIX)
+from rollup_cube import partial_aggregates, merge_partials, hourly_cells, update_rollups, aggregate_columns, CELL_KEYS, \
+    ROLLUP_DIR, HOURLY_PATH
+
+# Layer locations
+BRONZE_PARTITIONED_PATH = '02_data/bronze/sensor_data_partitioned'
+SILVER_PARTITIONED_PATH = '02_data/silver/sensor_data_partitioned'
+QUARANTINE_PARTITIONED_PATH = '02_data/silver/quarantine/sensor_data_rejected_partitioned'
+# Single-file silver of earlier versions: removed by every run so it cannot go stale
+LEGACY_SILVER_PATHS = ['02_data/silver/sensor_data_cleaned.parquet',
+                       '02_data/silver/quarantine/sensor_data_rejected.parquet']
+# Silver timestamps have one unit whatever the bronze source stored (see silver_frame)
+SILVER_TIME_DTYPE = 'datetime64[us]'
+GOLD_DIR = '02_data/gold'
+FACT_PATH = '02_data/gold/fact_sensor_readings.parquet'
+SUMMARY_PATH = '02_data/gold/summary_hourly.parquet'
+STATE_PATH = '02_data/gold/_pipeline_state.json'
+KEYS_PATH = '02_data/gold/_key_dictionaries.json'
 
-print("=" * 60)
-print("  BATCH PIPELINE - IoT Data Processing")
-print("=" * 60)
-print()
+ALERT_KEYS = {'NORMAL': 1, 'WARNING': 2, 'CRITICAL': 3}
+ALERT_DESCRIPTIONS = {
+    'NORMAL': 'All parameters within normal range',
+    'WARNING': 'One or more parameters exceed threshold',
+    'CRITICAL': 'Critical condition requiring immediate action'
+}
+
+FACT_COLUMNS = [
+    'sensor_id', 'timestamp', 'time_key', 'room_key', 'alert_key',
+    'temperature', 'humidity', 'co2_ppm', 'light_lux',
+    'occupancy_count', 'occupancy_pct', 'ac_status',
+    'thermal_comfort', 'air_quality', 'energy_efficiency'
+]
 
 # ==================== EXTRACT ====================
-print("📥 STEP 1: EXTRACT (Bronze Layer)")
-print("-" * 60)
+# Pluggable bronze sources. Every reader takes the same arguments:
+#   columns     column projection (None = all columns)
+#   date_range  (start_date, end_date) inclusive, 'YYYY-MM-DD'
+#   rooms       list of room_id values to keep
+# and pushes them down into the scan as far as the format allows.
+
+BRONZE_SOURCES = {
+    'parquet': '02_data/bronze/sensor_data.parquet',
+    'partitioned': BRONZE_PARTITIONED_PATH,
+    'csv': '02_data/raw/csv/sensor_data.csv',
+    'json': '02_data/raw/json/sensor_data.json',
+    'jsonl': '02_data/raw/json/sensor_data.jsonl',  # generator --chunk-rows
+}
+
+# JSON Lines types are inferred per block: a block without alerts would make alert_details null
+JSONL_FORMAT = ds.JsonFileFormat(parse_options=pa_json.ParseOptions(
+    explicit_schema=pa.schema([('alert_details', pa.string())]), unexpected_field_behavior='infer'))
+
+# Columns silver and gold actually use ('date' is derived when missing)
+PIPELINE_COLUMNS = [
+    'sensor_id', 'timestamp', 'date', 'room_id', 'building', 'floor', 'room_type',
+    'room_capacity', 'temperature', 'humidity', 'co2_ppm', 'light_lux',
+    'occupancy_count', 'occupancy_pct', 'ac_status', 'alert_status'
+]
+
+def _date_filter(field, field_type, start_date, end_date):
+    """[start_date, end_date] predicate for a timestamp or ISO-string field"""
+    end_exclusive = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+        # ISO strings ('YYYY-MM-DD[ HH:MM:SS]') sort like the dates they hold
+        return (ds.field(field) >= start_date) & (ds.field(field) < end_exclusive.strftime('%Y-%m-%d'))
+    return (ds.field(field) >= pa.scalar(pd.Timestamp(start_date))) & (ds.field(field) < pa.scalar(end_exclusive))
+
+def scan_options(dataset, columns=None, date_range=None, rooms=None, extra_filter=None, date_field='timestamp'):
+    """
+    Column projection and pushdown filter for scanning a pyarrow dataset.
+    date_field is the column the date range is applied to (a partition key prunes whole directories).
+    """
+    names = dataset.schema.names
+    if columns is not None:
+        columns = [col for col in columns if col in names]
+
+    predicates = [] if extra_filter is None else [extra_filter]
+    if date_range is not None:
+        predicates.append(_date_filter(date_field, dataset.schema.field(date_field).type, *date_range))
+    if rooms:
+        predicates.append(ds.field('room_id').isin(list(rooms)))
+
+    filter_expr = None
+    for predicate in predicates:
+        filter_expr = predicate if filter_expr is None else filter_expr & predicate
+    return {'columns': columns, 'filter': filter_expr}
 
-# Read from multiple formats
-print("  Loading CSV data...")
-df_csv = pd.read_csv('02_data/raw/csv/sensor_data.csv')
-print(f"  ✓ Loaded {len(df_csv)} records from CSV")
+def scan_dataset(dataset, columns=None, date_range=None, rooms=None, extra_filter=None, date_field='timestamp'):
+    """Scan a pyarrow dataset with column projection and predicate pushdown"""
+    options = scan_options(dataset, columns, date_range, rooms, extra_filter, date_field)
+    return dataset.to_table(**options).to_pandas()
 
-print("  Loading JSON data...")
-df_json = pd.read_json('02_data/raw/json/sensor_data.json')
-print(f"  ✓ Loaded {len(df_json)} records from JSON")
+def read_parquet_source(path, columns=None, date_range=None, rooms=None):
+    """Single Parquet file: row groups are skipped using their statistics"""
+    return scan_dataset(ds.dataset(path, format='parquet'), columns, date_range, rooms)
 
-print("  Loading Parquet data...")
-df_parquet = pd.read_parquet('02_data/bronze/sensor_data.parquet')
-print(f"  ✓ Loaded {len(df_parquet)} records from Parquet")
+def read_partitioned_source(path, columns=None, date_range=None, rooms=None, dates=None):
+    """Hive-partitioned Parquet (date_str=...): whole partitions are pruned"""
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    extra_filter = ds.field('date_str').isin(list(dates)) if dates is not None else None
+    return scan_dataset(dataset, columns, date_range, rooms, extra_filter, date_field='date_str')
 
-# Use Parquet as source (most efficient)
-df_bronze = df_parquet.copy()
-print(f"\n  ✅ Bronze layer: {len(df_bronze)} records loaded\n")
+def read_csv_source(path, columns=None, date_range=None, rooms=None):
+    """CSV: streamed through pyarrow, unused columns and rows dropped while scanning"""
+    return scan_dataset(ds.dataset(path, format='csv'), columns, date_range, rooms)
+
+def read_jsonl_source(path, columns=None, date_range=None, rooms=None):
+    """JSON Lines: streamed through pyarrow like CSV (timestamps are ISO strings or inferred timestamps)"""
+    return scan_dataset(ds.dataset(path, format=JSONL_FORMAT), columns, date_range, rooms)
+
+def read_json_source(path, columns=None, date_range=None, rooms=None):
+    """JSON array: has to be parsed whole, filters are applied afterwards"""
+    df = pd.read_json(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    if date_range is not None:
+        start_date, end_date = date_range
+        df = df[(df['timestamp'] >= pd.Timestamp(start_date))
+                & (df['timestamp'] < pd.Timestamp(end_date) + pd.Timedelta(days=1))]
+    if rooms:
+        df = df[df['room_id'].isin(rooms)]
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+SOURCE_READERS = {
+    'parquet': read_parquet_source,
+    'partitioned': read_partitioned_source,
+    'csv': read_csv_source,
+    'json': read_json_source,
+    'jsonl': read_jsonl_source,
+}
+
+def normalize_bronze(df):
+    """Bring both bronze layouts (full / compact) to the columns silver expects"""
+    # Compact bronze (generator --bronze-schema compact) stores no derived date columns
+    if 'date' not in df.columns:
+        df['date'] = df['timestamp'].dt.normalize()
+    return df
+
+def extract(source='parquet', columns=None, date_range=None, rooms=None):
+    """Load the bronze layer from one source, projected and filtered at scan time"""
+    print("📥 STEP 1: EXTRACT (Bronze Layer)")
+    print("-" * 60)
+
+    path = BRONZE_SOURCES[source]
+    print(f"  Loading {source} data from {path}...")
+    if columns is not None:
+        print(f"     - Columns: {len(columns)} projected")
+    if date_range is not None:
+        print(f"     - Date range: {date_range[0]} .. {date_range[1]}")
+    if rooms:
+        print(f"     - Rooms: {', '.join(rooms)}")
+
+    df_bronze = SOURCE_READERS[source](path, columns=columns, date_range=date_range, rooms=rooms)
+    df_bronze['timestamp'] = pd.to_datetime(df_bronze['timestamp'], format='ISO8601')
+    df_bronze = normalize_bronze(df_bronze)
+    print(f"\n  ✅ Bronze layer: {len(df_bronze)} records loaded\n")
+    return df_bronze
+
+def open_bronze_dataset(source):
+    """(pyarrow dataset, date field) for a bronze source that can be scanned in batches"""
+    path = BRONZE_SOURCES[source]
+    if source == 'partitioned':
+        return ds.dataset(path, format='parquet', partitioning='hive'), 'date_str'
+    if source == 'json':
+        raise ValueError("the json bronze source is one JSON array and cannot be read in batches")
+    if source == 'jsonl':
+        return ds.dataset(path, format=JSONL_FORMAT), 'timestamp'
+    return ds.dataset(path, format=source), 'timestamp'
+
+def iter_bronze_batches(source='parquet', columns=None, date_range=None, rooms=None, batch_rows=1_000_000):
+    """Yield bronze record batches of about batch_rows rows as pandas frames"""
+    dataset, date_field = open_bronze_dataset(source)
+    options = scan_options(dataset, columns, date_range, rooms, date_field=date_field)
+
+    # Fragments yield batches of at most batch_rows, small files much less: regroup them
+    pending, pending_rows = [], 0
+    # Keep read-ahead small: each queued batch is decoded and held in memory
+    for batch in dataset.to_batches(batch_size=batch_rows, batch_readahead=1, fragment_readahead=1, **options):
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= batch_rows:
+            yield pa.Table.from_batches(pending).to_pandas()
+            pending, pending_rows = [], 0
+    if pending_rows:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+def scan_key_observations(dates, rooms=None):
+    """
+    Room attribute sets and alert statuses of bronze partitions, with the first
+    timestamp each was seen - aggregated batch by batch from a projected scan
+    """
+    dataset = ds.dataset(BRONZE_PARTITIONED_PATH, format='parquet', partitioning='hive')
+    group_columns = ROOM_COLUMNS + ['alert_status']
+    options = scan_options(dataset, group_columns + ['timestamp'], rooms=rooms,
+                           extra_filter=ds.field('date_str').isin(list(dates)))
+    parts = []
+    for batch in dataset.to_batches(**options):
+        df = batch.to_pandas()
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        parts.append(df.groupby(group_columns, observed=True, sort=False)['timestamp'].min().reset_index())
+    if not parts:
+        return pd.DataFrame(columns=group_columns + ['timestamp'])
+    return pd.concat(parts).groupby(group_columns, observed=True, sort=False)['timestamp'].min().reset_index()
+
+def list_bronze_partitions():
+    """
+    Return {date_str: [[file name, size, mtime_ns], ...]} for the partitioned
+    bronze dataset - a partition counts as changed when any entry differs
+    """
+    partitions = {}
+    if not os.path.isdir(BRONZE_PARTITIONED_PATH):
+        return partitions
+    for entry in sorted(os.listdir(BRONZE_PARTITIONED_PATH)):
+        if entry.startswith('date_str='):
+            partition_dir = os.path.join(BRONZE_PARTITIONED_PATH, entry)
+            files = []
+            for name in sorted(os.listdir(partition_dir)):
+                if name.endswith('.parquet'):
+                    stat = os.stat(os.path.join(partition_dir, name))
+                    files.append([name, stat.st_size, stat.st_mtime_ns])
+            partitions[entry.split('=', 1)[1]] = files
+    return partitions
 
 # ==================== TRANSFORM ====================
-print("🔧 STEP 2: TRANSFORM (Silver Layer)")
-print("-" * 60)
+# Derived silver features as declarative rules, evaluated on whole columns:
+# column -> (list of (mask, value) checked in order, default value)
 
-df_silver = df_bronze.copy()
+def silver_feature_rules(df):
+    """Rule set for the derived silver features of `df`"""
+    temperature = df['temperature'].to_numpy()
+    humidity = df['humidity'].to_numpy()
+    ac_off = (df['ac_status'] == 'OFF').to_numpy()
+    low_occupancy = (df['occupancy_pct'] < 30).to_numpy()
 
-# 1. Data Type Conversion
-print("  1. Converting data types...")
-df_silver['timestamp'] = pd.to_datetime(df_silver['timestamp'])
-df_silver['date'] = pd.to_datetime(df_silver['date'])
+    return {
+        # Thermal comfort index (simplified)
+        'thermal_comfort': ([
+            ((temperature >= 22) & (temperature <= 26) & (humidity >= 40) & (humidity <= 60), 'Comfortable'),
+            (temperature > 26, 'Too Hot'),
+            (temperature < 22, 'Too Cold'),
+            (humidity > 60, 'Too Humid'),
+        ], 'Too Dry'),
+        # Energy efficiency score (0-100)
+        # Lower when AC is ON but occupancy is low
+        'energy_efficiency': ([
+            (ac_off, 100),
+            (low_occupancy, 70),
+        ], 100),
+    }
 
-# 2. Data Quality Checks
-print("  2. Applying data quality rules...")
-initial_count = len(df_silver)
+def derive_silver_features(df):
+    """Add the derived silver feature columns to `df` in place"""
+    for column, (rules, default) in silver_feature_rules(df).items():
+        df[column] = np.select([mask for mask, _ in rules], [value for _, value in rules], default)
 
-# Remove duplicates
-df_silver = df_silver.drop_duplicates(subset=['sensor_id', 'timestamp'])
-print(f"     - Removed {initial_count - len(df_silver)} duplicate records")
+    # Air quality category based on CO2
+    df['air_quality'] = pd.cut(
+        df['co2_ppm'],
+        bins=[0, 800, 1200, 2000, 5000],
+        labels=['Excellent', 'Good', 'Moderate', 'Poor']
+    )
+    return df
 
-# Remove invalid values
-df_silver = df_silver[
-    (df_silver['temperature'] >= 15) & (df_silver['temperature'] <= 40)
-]
-print(f"     - Filtered temperature range: 15-40°C")
+def legacy_silver_features(df):
+    """Original row-by-row feature lambdas, kept as the reference for --check-parity"""
+    return pd.DataFrame({
+        'thermal_comfort': df.apply(
+            lambda row: 'Comfortable' if (22 <= row['temperature'] <= 26 and 40 <= row['humidity'] <= 60)
+            else 'Too Hot' if row['temperature'] > 26
+            else 'Too Cold' if row['temperature'] < 22
+            else 'Too Humid' if row['humidity'] > 60
+            else 'Too Dry',
+            axis=1
+        ),
+        'energy_efficiency': df.apply(
+            lambda row: 100 if row['ac_status'] == 'OFF'
+            else max(0, 100 - (30 if row['occupancy_pct'] < 30 else 0)),
+            axis=1
+        )
+    }, index=df.index)
+
+def check_feature_parity(df):
+    """Compare derive_silver_features() with the legacy lambdas; True when identical"""
+    print("🧪 PARITY CHECK: vectorized vs row-wise silver features")
+    print("-" * 60)
+
+    start = datetime.now()
+    expected = legacy_silver_features(df)
+    legacy_s = (datetime.now() - start).total_seconds()
+
+    start = datetime.now()
+    actual = derive_silver_features(df[['temperature', 'humidity', 'ac_status', 'occupancy_pct', 'co2_ppm']].copy())
+    vectorized_s = (datetime.now() - start).total_seconds()
+
+    identical = True
+    for column in expected.columns:
+        mismatches = int((actual[column].astype(object) != expected[column].astype(object)).sum())
+        identical &= mismatches == 0
+        print(f"  {'✓' if mismatches == 0 else '✗'} {column}: {mismatches} mismatching rows of {len(df):,}")
+    print(f"  ⏱️  Row-wise: {legacy_s*1000:.1f} ms | Vectorized: {vectorized_s*1000:.1f} ms")
+    print()
+    return identical
 
-df_silver = df_silver[
-    (df_silver['humidity'] >= 30) & (df_silver['humidity'] <= 90)
-]
-print(f"     - Filtered humidity range: 30-90%")
 
-df_silver = df_silver[
-    (df_silver['co2_ppm'] >= 350) & (df_silver['co2_ppm'] <= 3000)
+
+# ==================== DATA QUALITY ====================
+# Declarative silver quality rules: (name, check, columns, params, action).
+# Every rule is one vectorized mask over the whole frame and owns one bit of
+# the per-row `dq_flags` column. 'reject' rules send the row to quarantine,
+# 'flag' rules only mark it. With a `state` dict, duplicate and ordering
+# checks also see the batches evaluated before (streaming mode). A 'unique'
+# rule whose params name a timestamp column keeps its state per date of that
+# column and forgets a date once the scan (in date order) has moved past it.
+
+DQ_RULES = [
+    ('missing_key', 'not_null', ['sensor_id', 'room_id', 'timestamp'], None, 'reject'),
+    ('duplicate_reading', 'unique', ['sensor_id', 'timestamp'], 'timestamp', 'reject'),
+    ('temperature_range', 'range', ['temperature'], (15, 40), 'reject'),
+    ('humidity_range', 'range', ['humidity'], (30, 90), 'reject'),
+    ('co2_range', 'range', ['co2_ppm'], (350, 3000), 'reject'),
+    ('timestamp_order', 'monotonic', ['sensor_id', 'timestamp'], None, 'flag'),
 ]
-print(f"     - Filtered CO2 range: 350-3000 ppm")
-
-# 3. Feature Engineering
-print("  3. Creating derived features...")
-
-# Thermal comfort index (simplified)
-df_silver['thermal_comfort'] = df_silver.apply(
-    lambda row: 'Comfortable' if (22 <= row['temperature'] <= 26 and 40 <= row['humidity'] <= 60)
-    else 'Too Hot' if row['temperature'] > 26
-    else 'Too Cold' if row['temperature'] < 22
-    else 'Too Humid' if row['humidity'] > 60
-    else 'Too Dry',
-    axis=1
-)
-
-# Air quality category based on CO2
-df_silver['air_quality'] = pd.cut(
-    df_silver['co2_ppm'],
-    bins=[0, 800, 1200, 2000, 5000],
-    labels=['Excellent', 'Good', 'Moderate', 'Poor']
-)
-
-# Energy efficiency score (0-100)
-# Lower when AC is ON but occupancy is low
-df_silver['energy_efficiency'] = df_silver.apply(
-    lambda row: 100 if row['ac_status'] == 'OFF'
-    else max(0, 100 - (30 if row['occupancy_pct'] < 30 else 0)),
-    axis=1
-)
-
-# 4. Add processing metadata
-df_silver['processed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-df_silver['data_quality_score'] = 95.0  # Simplified score
-
-print(f"\n  ✅ Silver layer: {len(df_silver)} records cleaned and enriched\n")
-
-# Save Silver layer
-os.makedirs('02_data/silver', exist_ok=True)
-df_silver.to_parquet('02_data/silver/sensor_data_cleaned.parquet', 
-                     compression='snappy', index=False)
-print("  💾 Saved to: 02_data/silver/sensor_data_cleaned.parquet\n")
+
+DQ_REJECT_BITS = sum(1 << i for i, rule in enumerate(DQ_RULES) if rule[4] == 'reject')
+
+def _seen_before(runs, keys):
+    """True where a key is in one of the sorted runs"""
+    found = np.zeros(len(keys), dtype=bool)
+    for run in runs:
+        found |= run[np.minimum(np.searchsorted(run, keys), len(run) - 1)] == keys
+    return found
+
+def _add_run(runs, keys):
+    """
+    Add keys as a new sorted run; the newest runs are merged while the one
+    below is not more than twice as large, so there are O(log n) runs and
+    every key is re-sorted O(log n) times
+    """
+    runs.append(np.sort(keys))
+    while len(runs) > 1 and len(runs[-2]) <= 2 * len(runs[-1]):
+        newest = runs.pop()
+        runs[-1] = np.sort(np.concatenate([runs[-1], newest]))
+
+def _rule_failures(df, rule, state=None):
+    """Boolean array, True where a row fails the rule"""
+    name, check, columns, params, action = rule
+    if check == 'not_null':
+        return df[columns].isna().to_numpy().any(axis=1)
+    if check == 'range':
+        low, high = params
+        values = df[columns[0]].to_numpy()
+        return ~((values >= low) & (values <= high))  # NaN fails as well
+    if check == 'unique':
+        if state is None:
+            return df.duplicated(subset=columns).to_numpy()  # first occurrence is kept
+        # Earlier batches are remembered as sorted runs of 64-bit key hashes per
+        # date (day number; one bucket without a timestamp column in params)
+        keys = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+        failed = pd.Series(keys).duplicated().to_numpy(copy=True)
+        seen = state.setdefault(name, {})
+        if params is None:
+            days = np.zeros(len(df), dtype=np.int64)
+        else:
+            dates = df[params].to_numpy().astype('datetime64[D]')
+            days = dates.astype(np.int64)
+            # Duplicates share their date: dates before this batch's first date are complete
+            # (a caller expecting late rows keeps dates from state['keep_from_day'] on)
+            if not np.isnat(dates).all():
+                first_day = min(days[~np.isnat(dates)].min(), state.get('keep_from_day', np.iinfo(np.int64).max))
+                for day in [day for day in seen if day < first_day]:
+                    del seen[day]
+        for day in np.unique(days):
+            in_day = days == day
+            runs = seen.setdefault(day, [])
+            day_keys = keys[in_day]
+            day_failed = failed[in_day] | _seen_before(runs, day_keys)
+            failed[in_day] = day_failed
+            if not day_failed.all():
+                _add_run(runs, day_keys[~day_failed])
+        return failed
+    if check == 'monotonic':
+        # Out of order: an earlier reading of the same sensor has a later timestamp
+        key, ts = columns
+        failed = (df[ts] < df.groupby(key, sort=False, observed=True)[ts].cummax()).to_numpy()
+        if state is None:
+            return failed
+        latest = state.get(name, pd.Series(dtype=df[ts].dtype))
+        failed = failed | (df[ts].to_numpy() < latest.reindex(df[key].to_numpy()).to_numpy())
+        batch_latest = df.groupby(key, observed=True)[ts].max()
+        batch_latest.index = batch_latest.index.astype(object)
+        state[name] = pd.concat([latest, batch_latest]).groupby(level=0).max()
+        return failed
+    raise ValueError(f"Unknown data-quality check: {check}")
+
+def evaluate_quality(df, rules=DQ_RULES, state=None, verbose=True):
+    """Evaluate every rule in one pass; returns the per-row dq_flags bitmask"""
+    flags = np.zeros(len(df), dtype=np.uint16)
+    for bit, rule in enumerate(rules):
+        failed = _rule_failures(df, rule, state)
+        flags |= failed.astype(np.uint16) << bit
+        if verbose:
+            print(f"     - {rule[0]}: {int(failed.sum())} rows {'rejected' if rule[4] == 'reject' else 'flagged'}")
+    return flags
+
+def quality_score(flags, rules=DQ_RULES):
+    """Per-row data_quality_score: percentage of rules the row passes"""
+    failed = np.zeros(len(flags), dtype=np.int8)
+    for bit in range(len(rules)):
+        failed += (flags >> bit) & 1
+    return np.round(100.0 * (len(rules) - failed) / len(rules), 1)
+
+def describe_flags(flags, rules=DQ_RULES):
+    """Comma-separated names of the failed rules, per row"""
+    flags = pd.Series(flags)
+    names = {value: ', '.join(rule[0] for bit, rule in enumerate(rules) if value >> bit & 1)
+             for value in flags.unique()}
+    return flags.map(names).to_numpy()
+
+def transform_silver(df_bronze, dq_state=None, verbose=True):
+    """
+    Clean and enrich bronze records into the silver layer.
+    Takes ownership of df_bronze (no defensive copy is made).
+    Returns (df_silver, df_rejected); rejected rows carry their dq_flags.
+    dq_state carries duplicate/ordering checks across batches (streaming mode);
+    batches must arrive in date order, as every bronze source is scanned.
+    """
+    log = print if verbose else (lambda *args: None)
+    log("🔧 STEP 2: TRANSFORM (Silver Layer)")
+    log("-" * 60)
+
+    df_silver = df_bronze
+
+    # 1. Data Type Conversion
+    log("  1. Converting data types...")
+    df_silver['timestamp'] = pd.to_datetime(df_silver['timestamp'], format='ISO8601')
+    df_silver['date'] = pd.to_datetime(df_silver['date'])
+
+    # 2. Data Quality Checks
+    log("  2. Applying data quality rules...")
+    df_silver['dq_flags'] = evaluate_quality(df_silver, state=dq_state, verbose=verbose)
+    df_silver['data_quality_score'] = quality_score(df_silver['dq_flags'].to_numpy())
+    rejected = (df_silver['dq_flags'].to_numpy() & DQ_REJECT_BITS) != 0
+    log(f"     - Average data quality score: {df_silver['data_quality_score'].mean():.1f}")
+
+    df_rejected = df_silver.loc[rejected].copy()
+    df_rejected['dq_failed_rules'] = describe_flags(df_rejected['dq_flags'].to_numpy())
+    df_silver = df_silver.loc[~rejected].copy()
+    log(f"     - Quarantined {len(df_rejected)} rejected records")
+
+    # 3. Feature Engineering
+    log("  3. Creating derived features...")
+    derive_silver_features(df_silver)
+
+    # 4. Add processing metadata
+    df_silver['processed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    log(f"\n  ✅ Silver layer: {len(df_silver)} records cleaned and enriched\n")
+    return df_silver, df_rejected
 
 # ==================== LOAD (Gold Layer - Warehouse) ====================
-print("🏆 STEP 3: LOAD (Gold Layer - Data Warehouse)")
-print("-" * 60)
-
-# Create dimension tables
-print("  Creating dimension tables...")
-
-# DIM_ROOM
-dim_room = df_silver[['room_id', 'building', 'floor', 'room_type', 'room_capacity']].drop_duplicates()
-dim_room['room_key'] = range(1, len(dim_room) + 1)
-dim_room.to_parquet('02_data/gold/dim_room.parquet', index=False)
-print(f"  ✓ dim_room: {len(dim_room)} rooms")
-
-# DIM_TIME
-df_silver['time_key'] = df_silver['timestamp'].dt.strftime('%Y%m%d%H')
-dim_time = pd.DataFrame({
-    'time_key': df_silver['time_key'].unique()
-})
-dim_time['time_key'] = dim_time['time_key'].astype(int)
-dim_time = dim_time.sort_values('time_key')
-dim_time['date'] = pd.to_datetime(dim_time['time_key'].astype(str).str[:8], format='%Y%m%d')
-dim_time['hour'] = dim_time['time_key'].astype(str).str[8:10].astype(int)
-dim_time['day_of_week'] = dim_time['date'].dt.day_name()
-dim_time['is_weekend'] = dim_time['date'].dt.dayofweek.isin([5, 6])
-dim_time.to_parquet('02_data/gold/dim_time.parquet', index=False)
-print(f"  ✓ dim_time: {len(dim_time)} time periods")
-
-# DIM_ALERT
-dim_alert = pd.DataFrame({
-    'alert_key': [1, 2, 3],
-    'alert_status': ['NORMAL', 'WARNING', 'CRITICAL'],
-    'alert_description': [
-        'All parameters within normal range',
-        'One or more parameters exceed threshold',
-        'Critical condition requiring immediate action'
-    ]
-})
-dim_alert.to_parquet('02_data/gold/dim_alert.parquet', index=False)
-print(f"  ✓ dim_alert: {len(dim_alert)} alert types")
-
-# FACT_SENSOR_READINGS (Fact table)
-print("\n  Creating fact table...")
-
-# Merge with dimension keys
-fact_table = df_silver.copy()
-fact_table['time_key'] = fact_table['timestamp'].dt.strftime('%Y%m%d%H').astype(int)
-fact_table = fact_table.merge(dim_room[['room_id', 'room_key']], on='room_id', how='left')
-fact_table['alert_key'] = fact_table['alert_status'].map({
-    'NORMAL': 1, 'WARNING': 2, 'CRITICAL': 3
-})
-
-# Select only necessary columns for fact table
-fact_columns = [
-    'sensor_id', 'timestamp', 'time_key', 'room_key', 'alert_key',
-    'temperature', 'humidity', 'co2_ppm', 'light_lux',
-    'occupancy_count', 'occupancy_pct', 'ac_status',
-    'thermal_comfort', 'air_quality', 'energy_efficiency'
-]
-fact_sensor_readings = fact_table[fact_columns]
-
-# Save fact table (partitioned by date for better query performance)
-fact_sensor_readings['partition_date'] = fact_sensor_readings['timestamp'].dt.strftime('%Y-%m-%d')
-fact_sensor_readings.to_parquet(
-    '02_data/gold/fact_sensor_readings.parquet',
-    partition_cols=['partition_date'],
-    compression='snappy',
-    index=False
-)
-print(f"  ✓ fact_sensor_readings: {len(fact_sensor_readings)} readings")
-
-# Create aggregated summary table
-print("\n  Creating aggregated summary...")
-summary_hourly = fact_table.groupby(['room_id', 'time_key']).agg({
+
+# Surrogate keys: room_key comes from the persistent SCD2 dimension store
+# (dimension_store.py), alert_key from a persistent dictionary ({value: key},
+# stored in KEYS_PATH). A value keeps its key across runs and modes; new
+# values get the next free key and key 0 stands for a missing value.
+
+def load_key_dictionaries():
+    """Load the persistent surrogate-key dictionary for alert_status"""
+    keys = {'alert_status': dict(ALERT_KEYS)}
+    if os.path.exists(KEYS_PATH):
+        with open(KEYS_PATH) as f:
+            keys['alert_status'].update(json.load(f).get('alert_status', {}))
+    return keys
+
+def save_key_dictionaries(keys):
+    """Persist the key dictionaries (write to temp file, then rename)"""
+    tmp_path = KEYS_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(keys, f, indent=2)
+    os.replace(tmp_path, KEYS_PATH)
+
+def lookup_keys(values, dictionary):
+    """
+    Surrogate keys for a column: the column is factorized once and only its
+    distinct values are looked up (and added to `dictionary` when new)
+    """
+    codes, uniques = pd.factorize(values)
+    next_key = max(dictionary.values(), default=0) + 1
+    for value in uniques:
+        if value not in dictionary:
+            dictionary[value] = next_key
+            next_key += 1
+    lookup = np.array([dictionary[value] for value in uniques] + [0], dtype=np.int64)
+    return lookup[codes]  # code -1 (missing) picks the trailing 0
+
+def time_keys(timestamps):
+    """Integer YYYYMMDDHH hour keys, computed arithmetically"""
+    ts = timestamps.dt
+    return (((ts.year * 100 + ts.month) * 100 + ts.day) * 100 + ts.hour).astype('int64')
+
+def assign_keys(df_silver, keys, store, upsert=True):
+    """
+    Key assignment stage: add time_key, room_key and alert_key to df_silver in place.
+    With upsert=False the store must already know every room (parallel workers).
+    """
+    df_silver['time_key'] = time_keys(df_silver['timestamp'])
+    if upsert:
+        store.upsert_rooms(room_observations(df_silver))
+    df_silver['room_key'] = store.room_keys(df_silver['room_id'], df_silver['timestamp'])
+    df_silver['alert_key'] = lookup_keys(df_silver['alert_status'], keys['alert_status'])
+    return df_silver
+
+def build_dim_time(df_keyed):
+    """DIM_TIME - one row per hour present in the data (df_keyed needs time_key)"""
+    time_key = np.sort(df_keyed['time_key'].unique())
+    dim_time = pd.DataFrame({'time_key': time_key})
+    dim_time['date'] = pd.to_datetime(pd.DataFrame({
+        'year': time_key // 1_000_000, 'month': time_key // 10_000 % 100, 'day': time_key // 100 % 100
+    }))
+    dim_time['hour'] = time_key % 100
+    dim_time['day_of_week'] = dim_time['date'].dt.day_name()
+    dim_time['is_weekend'] = dim_time['date'].dt.dayofweek.isin([5, 6])
+    return dim_time
+
+def build_dim_alert(keys=None):
+    """DIM_ALERT - alert levels from the alert_status key dictionary"""
+    alert_keys = ALERT_KEYS if keys is None else keys['alert_status']
+    return pd.DataFrame({
+        'alert_key': list(alert_keys.values()),
+        'alert_status': list(alert_keys),
+        'alert_description': [ALERT_DESCRIPTIONS.get(status, 'Unrecognised alert status') for status in alert_keys]
+    })
+
+def build_fact(df_keyed):
+    """
+    FACT_SENSOR_READINGS - returns (fact_table, fact_sensor_readings):
+    the keyed working frame (also used for the summary) and the fact columns
+    """
+    fact_table = df_keyed
+
+    # Select only necessary columns for fact table
+    fact_sensor_readings = fact_table[FACT_COLUMNS]
+
+    # Partition by date for better query performance (formatted once per distinct day)
+    codes, days = pd.factorize(fact_table['time_key'].to_numpy() // 100)
+    labels = pd.to_datetime(days.astype(str), format='%Y%m%d').strftime('%Y-%m-%d')
+    fact_sensor_readings['partition_date'] = np.asarray(labels, dtype=object)[codes]
+    return fact_table, fact_sensor_readings
+
+def round_summary(summary_hourly):
+    """
+    Round the statistics to 2 decimals. Float noise is cut off first (9
+    decimals), so a mean computed in one pass and one merged from partial
+    sums land on the same side of a .xx5 tie
+    """
+    return summary_hourly.round(9).round(2)
+
+def build_summary_hourly(fact_table):
+    """SUMMARY_HOURLY - per room and hour aggregates"""
+    summary_hourly = round_summary(fact_table.groupby(['room_id', 'time_key']).agg({
+        'temperature': ['mean', 'min', 'max', 'std'],
+        'humidity': ['mean', 'min', 'max'],
+        'co2_ppm': ['mean', 'max'],
+        'occupancy_count': ['mean', 'max'],
+        'energy_efficiency': 'mean'
+    }))
+
+    summary_hourly.columns = ['_'.join(col).strip() for col in summary_hourly.columns.values]
+    return summary_hourly.reset_index()
+
+# summary_hourly from mergeable partials (rollup_cube.py): per (room_id,
+# time_key) group the count, sum, sum of squares, min and max of each metric.
+# Partials of any split of the rows merge into the same totals, so mean and
+# std stay exact.
+SUMMARY_METRICS = {
     'temperature': ['mean', 'min', 'max', 'std'],
     'humidity': ['mean', 'min', 'max'],
     'co2_ppm': ['mean', 'max'],
     'occupancy_count': ['mean', 'max'],
-    'energy_efficiency': 'mean'
-}).round(2)
+    'energy_efficiency': ['mean']
+}
 
-summary_hourly.columns = ['_'.join(col).strip() for col in summary_hourly.columns.values]
-summary_hourly = summary_hourly.reset_index()
-summary_hourly.to_parquet('02_data/gold/summary_hourly.parquet', index=False)
-print(f"  ✓ summary_hourly: {len(summary_hourly)} aggregated records")
+def summary_partials(fact_table):
+    """Partial aggregates of one batch of fact rows"""
+    return partial_aggregates(fact_table, ['room_id', 'time_key'], list(SUMMARY_METRICS))
 
-print(f"\n  ✅ Gold layer: Star schema created successfully!\n")
+def write_summary(summary_hourly, dates=None):
+    """
+    Replace date partitions of summary_hourly (partition_date from time_key):
+    the dates in `dates`, or every live partition when None (full rebuild).
+    A writer only replaces the dates it recomputed, so writers of other dates
+    never overwrite each other. Writers of the same date (a batch run and the
+    stream bridge on today's date) hold TableLock(SUMMARY_PATH) around their
+    summary and rollup writes, so the last one wins with a complete merge.
+    """
+    if os.path.isfile(SUMMARY_PATH):
+        # Single-file summary of earlier versions
+        begin_write(SUMMARY_PATH)
+        os.remove(SUMMARY_PATH)
+    summary_hourly = summary_hourly.sort_values(['room_id', 'time_key'], ignore_index=True)
+    codes, days = pd.factorize(summary_hourly['time_key'].to_numpy() // 100)
+    labels = pd.to_datetime(days.astype(str), format='%Y%m%d').strftime('%Y-%m-%d')
+    replace_partitions(summary_hourly.assign(partition_date=np.asarray(labels, dtype=object)[codes]),
+                       SUMMARY_PATH, 'partition_date',
+                       partitions=live_partitions(SUMMARY_PATH, 'partition_date') if dates is None else dates)
+
+def merge_summary_partials(partials):
+    """Merge a list of partial frames into one (sums add up, min/max combine)"""
+    return merge_partials(partials, ['room_id', 'time_key'])
+
+def finalize_summary(partials, dtypes=None):
+    """
+    SUMMARY_HOURLY from merged partials - same columns as build_summary_hourly().
+    dtypes (metric → dtype, e.g. fact_table.dtypes): min/max are cast back to
+    the source dtype like a groupby min/max keeps it (partials hold float64)
+    """
+    summary_hourly = partials[['room_id', 'time_key']].copy()
+    for metric, stats in SUMMARY_METRICS.items():
+        n = partials[metric + '_count']
+        total, total_sq = partials[metric + '_sum'], partials[metric + '_sumsq']
+        for stat in stats:
+            if stat == 'mean':
+                summary_hourly[f'{metric}_mean'] = total / n
+            elif stat == 'std':
+                # Sample std (ddof=1) like pandas; clip tiny negative rounding residue
+                variance = ((total_sq - total ** 2 / n) / (n - 1)).clip(lower=0)
+                summary_hourly[f'{metric}_std'] = np.sqrt(variance.where(n > 1))
+            else:
+                values = partials[f'{metric}_{stat}']
+                if dtypes is not None and metric in dtypes and not values.isna().any():
+                    values = values.astype(dtypes[metric])
+                summary_hourly[f'{metric}_{stat}'] = values
+    summary_hourly = summary_hourly.sort_values(['room_id', 'time_key']).reset_index(drop=True)
+    return round_summary(summary_hourly)
+
+def write_partition_files(df, base_path, partition_col, file_name):
+    """Add one part file per partition value of `df` (existing files are kept)"""
+    for value, part in df.groupby(partition_col, observed=True):
+        partition_dir = os.path.join(base_path, f"{partition_col}={value}")
+        os.makedirs(partition_dir, exist_ok=True)
+        part.drop(columns=[partition_col]).to_parquet(
+            os.path.join(partition_dir, file_name), compression='snappy', index=False)
+
+def silver_frame(df):
+    """
+    Silver / quarantine rows as every mode stores them: the bronze partition
+    key (date_str) dropped, timestamp and date in SILVER_TIME_DTYPE and the
+    partition_date column ('unknown' for rows without a timestamp)
+    """
+    df = df.drop(columns=['date_str'], errors='ignore')
+    df = df.assign(timestamp=df['timestamp'].astype(SILVER_TIME_DTYPE), date=df['date'].astype(SILVER_TIME_DTYPE))
+    return df.assign(partition_date=df['timestamp'].dt.strftime('%Y-%m-%d').fillna('unknown'))
+
+def retire_legacy_silver():
+    """Remove the single-file silver / quarantine an earlier version may have left behind"""
+    for path in LEGACY_SILVER_PATHS:
+        if os.path.exists(path):
+            begin_write(path)
+            os.remove(path)
+            commit(path, 'retire')
+            print(f"  🗑️ Removed legacy single-file silver: {path}")
+
+# ==================== STATE (incremental mode) ====================
+
+def load_state():
+    """Load the incremental state (processed partitions + high-water mark)"""
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return {'high_water_mark': None, 'partitions': {}}
+
+def save_state(state):
+    """Persist the incremental state (write to temp file, then rename)"""
+    state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+# ==================== RUN MODES ====================
+
+def run_full(source='parquet', columns=None, date_range=None, rooms=None):
+    """Rebuild silver and every gold table from scratch"""
+    df_bronze = extract(source, columns, date_range, rooms)
+    bronze_count = len(df_bronze)
+    df_silver, df_rejected = transform_silver(df_bronze)
+
+    # Save Silver layer (a rebuild replaces every live partition, stale ones are dropped)
+    for df, path in ((df_silver, SILVER_PARTITIONED_PATH), (df_rejected, QUARANTINE_PARTITIONED_PATH)):
+        replace_partitions(silver_frame(df), path, 'partition_date',
+                           partitions=live_partitions(path, 'partition_date'))
+    retire_legacy_silver()
+    print(f"  💾 Saved to: {SILVER_PARTITIONED_PATH}/")
+    print(f"  💾 Quarantine: {QUARANTINE_PARTITIONED_PATH}/\n")
+
+    print("🏆 STEP 3: LOAD (Gold Layer - Data Warehouse)")
+    print("-" * 60)
+    os.makedirs(GOLD_DIR, exist_ok=True)
+
+    # Surrogate keys (time/room/alert) for the dimensions and the fact table
+    keys = load_key_dictionaries()
+    store = DimensionStore()
+    assign_keys(df_silver, keys, store)
+    save_key_dictionaries(keys)
+
+    # Create dimension tables
+    print("  Creating dimension tables...")
+
+    store.upsert_time(build_dim_time(df_silver))
+    store.save()
+    dim_room, dim_time = store.dim_room(), store.dim_time
+    print_dimension_changes(store, dim_room, dim_time)
+
+    dim_alert = build_dim_alert(keys)
+    write_parquet(dim_alert, '02_data/gold/dim_alert.parquet')
+    print(f"  ✓ dim_alert: {len(dim_alert)} alert types")
+
+    # FACT_SENSOR_READINGS (Fact table)
+    print("\n  Creating fact table...")
+    fact_table, fact_sensor_readings = build_fact(df_silver)
+    # Dynamic partition overwrite: re-runs replace partitions, stale ones are dropped
+    replace_partitions(fact_sensor_readings, FACT_PATH, 'partition_date',
+                       partitions=live_partitions(FACT_PATH, 'partition_date'), write_file=write_fact_file)
+    print(f"  ✓ fact_sensor_readings: {len(fact_sensor_readings)} readings in "
+          f"{fact_sensor_readings['partition_date'].nunique()} partition(s), sorted by room_key, timestamp")
+
+    # Create aggregated summary table
+    print("\n  Creating aggregated summary...")
+    summary_hourly = build_summary_hourly(fact_table)
+    with TableLock(SUMMARY_PATH):
+        write_summary(summary_hourly)
+        cube_cells = update_rollups(hourly_cells(fact_table), dim_room, dim_alert)
+    print(f"  ✓ summary_hourly: {len(summary_hourly)} aggregated records")
+
+    print("\n  Creating rollup cube...")
+    print_rollup_cells(cube_cells)
+
+    print(f"\n  ✅ Gold layer: Star schema created successfully!\n")
+
+    # A full rebuild invalidates the incremental bookkeeping
+    if os.path.exists(STATE_PATH):
+        os.remove(STATE_PATH)
+
+    print_summary({
+        'Bronze (Raw)': bronze_count,
+        'Silver (Cleaned)': len(df_silver),
+        'Quarantine (Rejected)': len(df_rejected),
+        'dim_room': len(dim_room),
+        'dim_time': len(dim_time),
+        'dim_alert': len(dim_alert),
+        'fact_sensor_readings': len(fact_sensor_readings),
+        'summary_hourly': len(summary_hourly)
+    })
+
+def run_streaming(source='parquet', columns=None, date_range=None, rooms=None, batch_rows=1_000_000):
+    """
+    Full rebuild in bounded memory: bronze is scanned in record batches, each
+    batch is cleaned and appended to silver, the quarantine and the fact
+    partitions. Only the dimensions and the summary partials stay in memory.
+    """
+    print("🌊 STREAMING: Bronze → Silver → Gold in record batches")
+    print("-" * 60)
+    print(f"  Source: {source} ({BRONZE_SOURCES[source]}), batches of {batch_rows:,} rows\n")
+
+    # Silver, quarantine and fact partitions are staged under their table and published only once complete
+    staged_roots = {path: os.path.join(path, f"{STAGING_PREFIX}table-{os.getpid()}")
+                    for path in (SILVER_PARTITIONED_PATH, QUARANTINE_PARTITIONED_PATH, FACT_PATH)}
+    for staged_root in staged_roots.values():
+        shutil.rmtree(staged_root, ignore_errors=True)
+    os.makedirs(GOLD_DIR, exist_ok=True)
+
+    dq_state = {}
+    keys = load_key_dictionaries()
+    store = DimensionStore()
+    partials, cube, fact_dtypes = None, None, None
+    counts = {'bronze': 0, 'silver': 0, 'rejected': 0}
+    for batch_no, df_bronze in enumerate(iter_bronze_batches(source, columns, date_range, rooms, batch_rows)):
+        counts['bronze'] += len(df_bronze)
+        # One timestamp unit for every batch keeps key hashes and file schemas stable
+        df_bronze['timestamp'] = pd.to_datetime(df_bronze['timestamp'], format='ISO8601').astype(SILVER_TIME_DTYPE)
+        df_silver, df_rejected = transform_silver(normalize_bronze(df_bronze), dq_state=dq_state, verbose=False)
+        counts['silver'] += len(df_silver)
+        counts['rejected'] += len(df_rejected)
+
+        file_name = f'part-{batch_no:05d}.parquet'
+        write_partition_files(silver_frame(df_silver), staged_roots[SILVER_PARTITIONED_PATH],
+                              'partition_date', file_name)
+        write_partition_files(silver_frame(df_rejected), staged_roots[QUARANTINE_PARTITIONED_PATH],
+                              'partition_date', file_name)
+
+        assign_keys(df_silver, keys, store)
+        store.upsert_time(build_dim_time(df_silver))
+        fact_table, fact_sensor_readings = build_fact(df_silver)
+        write_partition_files(fact_sensor_readings, staged_roots[FACT_PATH], 'partition_date', file_name)
+
+        batch_partials = summary_partials(fact_table)
+        fact_dtypes = fact_table.dtypes
+        partials = batch_partials if partials is None else merge_summary_partials([partials, batch_partials])
+        batch_cells = hourly_cells(fact_table)
+        cube = batch_cells if cube is None else merge_partials([cube, batch_cells], ['time_key'] + CELL_KEYS)
+        print(f"  ✓ Batch {batch_no + 1}: {len(df_bronze):,} bronze → {len(df_silver):,} silver, "
+              f"{len(df_rejected):,} quarantined")
+
+    if counts['silver'] == 0:
+        print("\n  ⚠️ No bronze records matched - nothing written\n")
+        for staged_root in staged_roots.values():
+            shutil.rmtree(staged_root, ignore_errors=True)
+        return
+    compact_table(staged_roots[FACT_PATH], verbose=False)
+    published = {path: commit_table(staged_root, path, 'partition_date') for path, staged_root in staged_roots.items()}
+    retire_legacy_silver()
+    print(f"\n  💾 Silver: {SILVER_PARTITIONED_PATH}/")
+    print(f"  💾 Quarantine: {QUARANTINE_PARTITIONED_PATH}/")
+    print(f"  💾 Fact: {published[FACT_PATH]} partition(s) published, one sorted file each\n")
+
+    save_key_dictionaries(keys)
+    store.save()
+    dim_room, dim_time = store.dim_room(), store.dim_time
+    print_dimension_changes(store, dim_room, dim_time)
+    dim_alert = build_dim_alert(keys)
+    write_parquet(dim_alert, '02_data/gold/dim_alert.parquet')
+    summary_hourly = finalize_summary(partials, fact_dtypes)
+    with TableLock(SUMMARY_PATH):
+        write_summary(summary_hourly)
+        cube_cells = update_rollups(cube, dim_room, dim_alert)
+    print_rollup_cells(cube_cells)
+    print(f"  ✅ Gold layer: written from {counts['silver']:,} silver records\n")
+
+    # A full rebuild invalidates the incremental bookkeeping
+    if os.path.exists(STATE_PATH):
+        os.remove(STATE_PATH)
+
+    print_summary({
+        'Bronze (Raw)': counts['bronze'],
+        'Silver (Cleaned)': counts['silver'],
+        'Quarantine (Rejected)': counts['rejected'],
+        'dim_room': len(dim_room),
+        'dim_time': len(dim_time),
+        'dim_alert': len(dim_alert),
+        'fact_sensor_readings': counts['silver'],
+        'summary_hourly': len(summary_hourly)
+    })
+
+def process_partition(date_str, keys, store, columns=None, rooms=None):
+    """
+    Map step of the parallel mode (runs in a worker process): one bronze date
+    partition through silver and the fact build. Silver, quarantine and fact
+    partitions are written here; the small results are returned for the reduce.
+    """
+    timings = {}
+    start = time.process_time()
+    df_bronze = read_partitioned_source(BRONZE_PARTITIONED_PATH, columns=columns, rooms=rooms, dates=[date_str])
+    df_bronze['timestamp'] = pd.to_datetime(df_bronze['timestamp'], format='ISO8601')
+    # Rows outside their partition's date belong to another partition (see run_incremental)
+    df_bronze = df_bronze[df_bronze['timestamp'].dt.normalize() == pd.Timestamp(date_str)]
+    df_bronze = normalize_bronze(df_bronze.drop(columns=['date_str'], errors='ignore'))
+    timings['extract'] = time.process_time() - start
+
+    start = time.process_time()
+    df_silver, df_rejected = transform_silver(df_bronze, verbose=False)
+    timings['transform'] = time.process_time() - start
+
+    start = time.process_time()
+    replace_partitions(silver_frame(df_silver), SILVER_PARTITIONED_PATH, 'partition_date', partitions=[date_str])
+    replace_partitions(silver_frame(df_rejected), QUARANTINE_PARTITIONED_PATH, 'partition_date', partitions=[date_str])
+    timings['write silver'] = time.process_time() - start
+
+    start = time.process_time()
+    assign_keys(df_silver, keys, store, upsert=False)
+    dim_time = build_dim_time(df_silver)
+    fact_table, fact_sensor_readings = build_fact(df_silver)
+    summary_hourly = build_summary_hourly(fact_table)
+    cells = hourly_cells(fact_table)
+    timings['build gold'] = time.process_time() - start
+
+    start = time.process_time()
+    replace_partitions(fact_sensor_readings, FACT_PATH, 'partition_date', partitions=[date_str],
+                       write_file=write_fact_file)
+    timings['write fact'] = time.process_time() - start
+
+    return {
+        'counts': {'bronze': len(df_bronze), 'silver': len(df_silver), 'rejected': len(df_rejected)},
+        'dim_time': dim_time,
+        'summary_hourly': summary_hourly,
+        'hourly_cells': cells,
+        'timings': timings,
+    }
+
+def run_parallel(workers, columns=None, date_range=None, rooms=None):
+    """
+    Full rebuild, partition-parallel over the bronze date partitions.
+    Silver/quarantine go to their partitioned paths, gold to the usual tables.
+    """
+    total_start = time.perf_counter()
+    dates = sorted(list_bronze_partitions())
+    if date_range is not None:
+        dates = [d for d in dates if date_range[0] <= d <= date_range[1]]
+
+    print(f"⚡ PARALLEL: {len(dates)} bronze date partition(s) with {workers} worker(s)")
+    print("-" * 60)
+    if not dates:
+        print("\n  ⚠️ No bronze partitions matched - nothing written\n")
+        return
+
+    # Workers must not add keys on their own: every room version and alert
+    # status gets its key up front from a scan of those columns alone
+    start = time.perf_counter()
+    observations = scan_key_observations(dates, rooms)
+    keys = load_key_dictionaries()
+    lookup_keys(observations['alert_status'], keys['alert_status'])
+    save_key_dictionaries(keys)
+    store = DimensionStore()
+    store.upsert_rooms(room_observations(observations))
+    os.makedirs(GOLD_DIR, exist_ok=True)
+    plan_s = time.perf_counter() - start
+
+    # Map: one task per date partition
+    start = time.perf_counter()
+    task = functools.partial(process_partition, keys=keys, store=store, columns=columns, rooms=rooms)
+    results = []
+    if workers == 1:
+        for date_str, result in zip(dates, map(task, dates)):
+            results.append(result)
+            print(f"  ✓ {date_str}: {result['counts']['silver']:,} silver records")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for date_str, result in zip(dates, pool.map(task, dates)):
+                results.append(result)
+                print(f"  ✓ {date_str}: {result['counts']['silver']:,} silver records")
+    # Workers replaced their own partitions; whatever else is live is stale
+    for path in (SILVER_PARTITIONED_PATH, QUARANTINE_PARTITIONED_PATH, FACT_PATH):
+        for value in set(live_partitions(path, 'partition_date')) - set(dates):
+            drop_partition(path, partition_name('partition_date', value))
+        commit(path, 'overwrite')
+    retire_legacy_silver()
+    map_s = time.perf_counter() - start
+
+    # Reduce: merge the small per-partition results (hours never span two dates)
+    start = time.perf_counter()
+    for result in results:
+        store.upsert_time(result['dim_time'])
+    store.save()
+    dim_room, dim_time = store.dim_room(), store.dim_time
+    dim_alert = build_dim_alert(keys)
+    write_parquet(dim_alert, '02_data/gold/dim_alert.parquet')
+    summary_hourly = pd.concat([result['summary_hourly'] for result in results])
+    with TableLock(SUMMARY_PATH):
+        write_summary(summary_hourly)
+        cube_cells = update_rollups(pd.concat([result['hourly_cells'] for result in results]), dim_room, dim_alert)
+    reduce_s = time.perf_counter() - start
+    print()
+    print_dimension_changes(store, dim_room, dim_time)
+    print_rollup_cells(cube_cells)
+
+    # A full rebuild invalidates the incremental bookkeeping
+    if os.path.exists(STATE_PATH):
+        os.remove(STATE_PATH)
+
+    counts = {key: sum(result['counts'][key] for result in results) for key in ('bronze', 'silver', 'rejected')}
+    stage_s = {}
+    for result in results:
+        for stage, seconds in result['timings'].items():
+            stage_s[stage] = stage_s.get(stage, 0.0) + seconds
+
+    print(f"\n⏱️  STAGE TIMING ({workers} worker(s))")
+    print(f"  {'plan (key dictionaries)':24s} {plan_s:8.2f} s")
+    for stage, seconds in stage_s.items():
+        print(f"  {'map: ' + stage:24s} {seconds:8.2f} s CPU (summed over partitions)")
+    print(f"  {'map (wall clock)':24s} {map_s:8.2f} s")
+    print(f"  {'reduce':24s} {reduce_s:8.2f} s")
+    print(f"  {'total':24s} {time.perf_counter() - total_start:8.2f} s")
+    print(f"  {'effective parallelism':24s} {sum(stage_s.values()) / map_s:8.2f} x (map CPU / map wall clock)\n")
+
+    print_summary({
+        'Bronze (Raw)': counts['bronze'],
+        'Silver (Cleaned)': counts['silver'],
+        'Quarantine (Rejected)': counts['rejected'],
+        'dim_room': len(dim_room),
+        'dim_time': len(dim_time),
+        'dim_alert': len(dim_alert),
+        'fact_sensor_readings': counts['silver'],
+        'summary_hourly': len(summary_hourly)
+    })
+
+def drop_bronze_dates(dates):
+    """
+    Remove what was derived from bronze date partitions that no longer exist:
+    their silver, quarantine, fact, summary and hourly rollup partitions are
+    dropped and the daily / weekly cells of those days are recomputed
+    """
+    for path in (SILVER_PARTITIONED_PATH, QUARANTINE_PARTITIONED_PATH, FACT_PATH):
+        if os.path.isdir(path):
+            for value in dates:
+                drop_partition(path, partition_name('partition_date', value))
+            commit(path, 'drop partitions')
+    with TableLock(SUMMARY_PATH):
+        if os.path.isdir(SUMMARY_PATH):
+            for value in dates:
+                drop_partition(SUMMARY_PATH, partition_name('partition_date', value))
+            commit(SUMMARY_PATH, 'drop partitions')
+        if load_snapshot(HOURLY_PATH):
+            # No hourly cells left for these dates: update_rollups clears them and their days / weeks
+            stored = read_table(HOURLY_PATH, filters=[('partition_date', 'in', list(dates))])
+            no_cells = stored[['time_key'] + CELL_KEYS + aggregate_columns(stored)].iloc[:0]
+            update_rollups(no_cells, DimensionStore().dim_room(), build_dim_alert(load_key_dictionaries()),
+                           dates=dates)
+
+def run_incremental():
+    """
+    Process only bronze date partitions that are new or whose part files
+    changed since the last run. Touched fact/silver date partitions are
+    replaced, dim_time and summary_hourly are updated for touched hours only.
+    Partitions deleted from bronze are dropped from silver and gold.
+    Silver is the same partitioned dataset the full modes write, so nothing
+    else is left stale.
+    """
+    state = load_state()
+    partitions = list_bronze_partitions()
+    changed = [d for d, files in partitions.items() if state['partitions'].get(d) != files]
+    removed = sorted(set(state['partitions']) - set(partitions))
+
+    print("📥 STEP 1: EXTRACT (Bronze Layer - incremental)")
+    print("-" * 60)
+    print(f"  High-water mark: {state['high_water_mark'] or '-'}")
+    print(f"  Bronze partitions: {len(partitions)} total, {len(changed)} new/changed, {len(removed)} removed")
+
+    if removed:
+        drop_bronze_dates(removed)
+        for value in removed:
+            del state['partitions'][value]
+        save_state(state)
+        print(f"  🗑️ Dropped {len(removed)} removed partition(s) from silver and gold: {', '.join(removed)}")
+
+    if not changed:
+        print("\n  ✅ Nothing to do - gold layer is up to date\n")
+        return
+
+    df_bronze = read_partitioned_source(BRONZE_PARTITIONED_PATH, dates=changed)
+    df_bronze['timestamp'] = pd.to_datetime(df_bronze['timestamp'], format='ISO8601')
+    print(f"  ✓ Loaded {len(df_bronze)} records from {len(changed)} partition(s)")
+
+    # The partition key is authoritative: rows outside their partition's date
+    # (stale part files from older generator runs) belong to another partition
+    in_partition = df_bronze['timestamp'].dt.normalize() == pd.to_datetime(df_bronze['date_str'].astype(str))
+    if not in_partition.all():
+        print(f"  ⚠️ Ignored {(~in_partition).sum()} records stored outside their date partition")
+        df_bronze = df_bronze[in_partition]
+    df_bronze = normalize_bronze(df_bronze.drop(columns=['date_str']))
+    print(f"\n  ✅ Bronze increment: {len(df_bronze)} records loaded\n")
+
+    bronze_count = len(df_bronze)
+    df_silver, df_rejected = transform_silver(df_bronze)
+    replace_partitions(silver_frame(df_silver), SILVER_PARTITIONED_PATH, 'partition_date', partitions=changed)
+    print(f"  💾 Replaced {len(changed)} partition(s) in: {SILVER_PARTITIONED_PATH}/")
+    replace_partitions(silver_frame(df_rejected), QUARANTINE_PARTITIONED_PATH, 'partition_date',
+                       partitions=changed)
+    print(f"  💾 Quarantine: {len(df_rejected)} records in {QUARANTINE_PARTITIONED_PATH}/")
+    # A single-file silver next to the partitions would miss this increment
+    retire_legacy_silver()
+    print()
+
+    print("🏆 STEP 3: LOAD (Gold Layer - incremental)")
+    print("-" * 60)
+    os.makedirs(GOLD_DIR, exist_ok=True)
+
+    keys = load_key_dictionaries()
+    store = DimensionStore()
+    assign_keys(df_silver, keys, store)
+    save_key_dictionaries(keys)
+
+    # Only the hours present in the increment are touched
+    new_dim_time = build_dim_time(df_silver)
+    store.upsert_time(new_dim_time)
+    store.save()
+    dim_room, dim_time = store.dim_room(), store.dim_time
+    print_dimension_changes(store, dim_room, dim_time)
+
+    dim_alert = build_dim_alert(keys)
+    write_parquet(dim_alert, '02_data/gold/dim_alert.parquet')
+
+    print("\n  Updating fact table...")
+    fact_table, fact_sensor_readings = build_fact(df_silver)
+    replace_partitions(fact_sensor_readings, FACT_PATH, 'partition_date', partitions=changed,
+                       write_file=write_fact_file)
+    print(f"  ✓ fact_sensor_readings: {len(fact_sensor_readings)} readings in "
+          f"{fact_sensor_readings['partition_date'].nunique()} replaced partition(s)")
+
+    print("\n  Updating aggregated summary...")
+    new_summary = build_summary_hourly(fact_table)
+    with TableLock(SUMMARY_PATH):
+        write_summary(new_summary, dates=changed)
+        cube_cells = update_rollups(hourly_cells(fact_table), dim_room, dim_alert, dates=changed)
+    summary_rows = load_snapshot(SUMMARY_PATH)['rows']
+    print(f"  ✓ summary_hourly: {summary_rows} aggregated records ({len(new_summary)} recomputed)")
+
+    print("\n  Updating rollup cube...")
+    print_rollup_cells(cube_cells)
+
+    print(f"\n  ✅ Gold layer: incremental update applied!\n")
+
+    high_water_mark = df_silver['timestamp'].max()
+    if state['high_water_mark'] is None or high_water_mark.isoformat() > state['high_water_mark']:
+        state['high_water_mark'] = high_water_mark.isoformat()
+    state['partitions'].update({d: partitions[d] for d in changed})
+    save_state(state)
+    print(f"  💾 State saved: {STATE_PATH} (high-water mark {state['high_water_mark']})\n")
+
+    print_summary({
+        'Bronze (Increment)': bronze_count,
+        'Silver (Cleaned)': len(df_silver),
+        'Quarantine (Rejected)': len(df_rejected),
+        'dim_room': len(dim_room),
+        'dim_time': len(dim_time),
+        'fact_sensor_readings (new)': len(fact_sensor_readings),
+        'summary_hourly': summary_rows
+    })
 
 # ==================== PIPELINE SUMMARY ====================
-print("=" * 60)
-print("  PIPELINE EXECUTION SUMMARY")
-print("=" * 60)
-print(f"  Bronze (Raw):     {len(df_bronze):,} records")
-print(f"  Silver (Cleaned): {len(df_silver):,} records")
-print(f"  Gold (Warehouse): ")
-print(f"    - dim_room:              {len(dim_room):,} records")
-print(f"    - dim_time:              {len(dim_time):,} records")
-print(f"    - dim_alert:             {len(dim_alert):,} records")
-print(f"    - fact_sensor_readings:  {len(fact_sensor_readings):,} records")
-print(f"    - summary_hourly:        {len(summary_hourly):,} records")
-print()
-print("✅ Batch pipeline completed successfully!")
-print("=" * 60)
-print()
-print("📁 Output files:")
-print("  - 02_data/silver/sensor_data_cleaned.parquet")
-print("  - 02_data/gold/dim_room.parquet")
-print("  - 02_data/gold/dim_time.parquet")
-print("  - 02_data/gold/dim_alert.parquet")
-print("  - 02_data/gold/fact_sensor_readings.parquet/")
-print("  - 02_data/gold/summary_hourly.parquet")
+
+def print_dimension_changes(store, dim_room, dim_time):
+    """Report what this run added to the persistent dimension store"""
+    print(f"  ✓ dim_room: {len(dim_room)} room versions "
+          f"({store.changes['new_rooms']} new rooms, {store.changes['new_versions']} attribute changes)")
+    print(f"  ✓ dim_time: {len(dim_time)} time periods ({store.changes['new_hours']} new)")
+
+def print_rollup_cells(cells):
+    """Report the cell count of every rollup grain"""
+    print(f"  ✓ rollup cube: {cells['hourly']:,} hourly / {cells['daily']:,} daily / {cells['weekly']:,} weekly cells")
+
+def print_summary(counts):
+    """Print record counts per layer/table"""
+    print("=" * 60)
+    print("  PIPELINE EXECUTION SUMMARY")
+    print("=" * 60)
+    for name, count in counts.items():
+        print(f"  {name + ':':27s} {count:,} records")
+    print()
+    print("✅ Batch pipeline completed successfully!")
+    print("=" * 60)
+    print()
+    print("📁 Output files:")
+    print(f"  - {SILVER_PARTITIONED_PATH}/")
+    print(f"  - {QUARANTINE_PARTITIONED_PATH}/")
+    print("  - 02_data/gold/dim_room.parquet")
+    print("  - 02_data/gold/dim_time.parquet")
+    print("  - 02_data/gold/dim_alert.parquet")
+    print(f"  - {FACT_PATH}/")
+    print(f"  - {SUMMARY_PATH}/")
+    print(f"  - {ROLLUP_DIR}/ (hourly, daily, weekly)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch pipeline - Bronze → Silver → Gold")
+    parser.add_argument('--mode', choices=['full', 'incremental', 'streaming'], default='full',
+                        help="full = rebuild everything, incremental = only new/changed bronze partitions, "
+                             "streaming = rebuild everything in record batches (bounded memory)")
+    parser.add_argument('--batch-rows', type=int, default=1_000_000,
+                        help="bronze rows per record batch in streaming mode (default: 1,000,000)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="full mode only: process the bronze date partitions in a pool of N processes")
+    parser.add_argument('--check-parity', action='store_true',
+                        help="compare the vectorized silver features with the original row-wise lambdas and exit")
+    extract_group = parser.add_argument_group('extract (full and streaming mode)')
+    extract_group.add_argument('--source', choices=list(BRONZE_SOURCES), default=None,
+                               help="bronze source to read (default: parquet, partitioned with --workers)")
+    extract_group.add_argument('--columns', default=None,
+                               help="comma-separated columns to read, or 'pipeline' for the columns silver/gold use")
+    extract_group.add_argument('--start-date', default=None, help="first date to read (YYYY-MM-DD)")
+    extract_group.add_argument('--end-date', default=None, help="last date to read (YYYY-MM-DD)")
+    extract_group.add_argument('--rooms', default=None, help="comma-separated room_id values to read")
+    args = parser.parse_args()
+    if args.workers is not None:
+        if args.mode != 'full' or args.source not in (None, 'partitioned'):
+            parser.error("--workers runs a full rebuild over the partitioned bronze source")
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+    args.source = args.source or 'parquet'
+    if args.mode == 'streaming' and args.source == 'json':
+        parser.error("--mode streaming needs a source that can be scanned in batches (parquet, partitioned, csv, jsonl)")
+
+    columns = None
+    if args.columns == 'pipeline':
+        columns = PIPELINE_COLUMNS
+    elif args.columns:
+        columns = args.columns.split(',')
+    date_range = None
+    if args.start_date or args.end_date:
+        date_range = (args.start_date or '1970-01-01', args.end_date or '2999-12-31')
+    rooms = args.rooms.split(',') if args.rooms else None
+
+    print("=" * 60)
+    print("  BATCH PIPELINE - IoT Data Processing")
+    print("=" * 60)
+    print()
+
+    # Finish or roll back partition swaps of an interrupted earlier run
+    for path in (SILVER_PARTITIONED_PATH, QUARANTINE_PARTITIONED_PATH, FACT_PATH, SUMMARY_PATH, HOURLY_PATH):
+        recover(path)
+
+    if args.check_parity:
+        raise SystemExit(0 if check_feature_parity(extract(args.source, columns, date_range, rooms)) else 1)
+    elif args.mode == 'incremental':
+        run_incremental()
+    elif args.mode == 'streaming':
+        run_streaming(args.source, columns, date_range, rooms, args.batch_rows)
+    elif args.workers is not None:
+        run_parallel(args.workers, columns, date_range, rooms)
+    else:
+        run_full(args.source, columns, date_range, rooms)
@@ -0,0 +1,143 @@
+"""
+Dimension Store - persistent gold dimensions
+dim_room as a slowly changing dimension (SCD type 2), dim_time append-only
+
+The store is loaded once per pipeline run and keeps an in-memory index of the
+room versions, so fact rows get their room_key by lookup instead of a
+dimension rebuild or a DataFrame merge. Keys are never renumbered.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+
+from table_manifest import write_parquet
+
+DIM_ROOM_PATH = '02_data/gold/dim_room.parquet'
+DIM_TIME_PATH = '02_data/gold/dim_time.parquet'
+
+ROOM_COLUMNS = ['room_id', 'building', 'floor', 'room_type', 'room_capacity']
+ROOM_ATTRIBUTES = ROOM_COLUMNS[1:]
+
+# The first version of a room is valid "since the beginning", so late
+# arriving older readings still find a version
+LOW_DATE = pd.Timestamp('1970-01-01')
+
+def room_observations(df):
+    """
+    Distinct room attribute sets in `df` with the first timestamp each was seen.
+    Within one call an attribute set counts from its first appearance.
+    """
+    observations = df.groupby(ROOM_COLUMNS, observed=True, sort=False)['timestamp'].min()
+    return observations.rename('valid_from').reset_index().sort_values('valid_from', kind='stable')
+
+class DimensionStore:
+    def __init__(self, room_path=DIM_ROOM_PATH, time_path=DIM_TIME_PATH):
+        self.room_path = room_path
+        self.time_path = time_path
+        self.changes = {'new_rooms': 0, 'new_versions': 0, 'new_hours': 0}
+
+        # dim_room rows (one per version) and the lookup index:
+        #   current[room_id]  -> (room_key, attribute tuple, valid_from)
+        #   versions[room_id] -> (valid_from array, room_key array) for rooms with history
+        self.room_versions = []
+        self.history = {}
+        self.current = {}
+        self.versions = {}
+        self.next_key = 1
+        if os.path.exists(room_path):
+            self._load_rooms(pd.read_parquet(room_path))
+
+        self.dim_time = pd.read_parquet(time_path) if os.path.exists(time_path) else None
+
+    def _load_rooms(self, dim_room):
+        """Adopt a stored dim_room (a plain one from before SCD2 becomes version 1 of every room)"""
+        if 'valid_from' not in dim_room.columns:
+            dim_room = dim_room.assign(valid_from=LOW_DATE, valid_to=pd.NaT, is_current=True)
+        for row in dim_room.sort_values(['valid_from', 'room_key']).to_dict('records'):
+            self._add_version(row)
+
+    def _add_version(self, row):
+        """Register one dim_room row in the rows list and the key index"""
+        row['valid_from'] = pd.Timestamp(row['valid_from'])
+        row['valid_to'] = pd.Timestamp(row['valid_to']) if pd.notna(row['valid_to']) else pd.NaT
+        self.room_versions.append(row)
+        room_id = row['room_id']
+        if row['is_current']:
+            self.current[room_id] = (row['room_key'], tuple(row[col] for col in ROOM_ATTRIBUTES), row['valid_from'])
+        history = self.history.setdefault(room_id, [])
+        history.append(row)
+        if len(history) > 1:
+            history.sort(key=lambda version: version['valid_from'])
+            self.versions[room_id] = (
+                np.array([version['valid_from'] for version in history], dtype='datetime64[ns]'),
+                np.array([version['room_key'] for version in history], dtype=np.int64)
+            )
+        self.next_key = max(self.next_key, int(row['room_key']) + 1)
+
+    def upsert_rooms(self, observations):
+        """
+        Apply room observations (see room_observations): unknown rooms get a
+        new key, changed attributes close the current version and open a new one
+        """
+        for obs in observations.to_dict('records'):
+            room_id = obs['room_id']
+            attributes = tuple(obs[col] for col in ROOM_ATTRIBUTES)
+            current = self.current.get(room_id)
+            valid_from = pd.Timestamp(obs['valid_from'])
+            if current is not None:
+                if current[1] == attributes or valid_from <= current[2]:
+                    # Unchanged, or older than the current version (history is not rewritten)
+                    continue
+                for version in self.history[room_id]:
+                    if version['room_key'] == current[0]:
+                        version['valid_to'] = valid_from
+                        version['is_current'] = False
+                self.changes['new_versions'] += 1
+            else:
+                valid_from = LOW_DATE
+                self.changes['new_rooms'] += 1
+
+            row = dict(zip(ROOM_COLUMNS, (room_id,) + attributes))
+            row.update(room_key=self.next_key, valid_from=valid_from, valid_to=pd.NaT, is_current=True)
+            self._add_version(row)
+
+    def room_keys(self, room_ids, timestamps):
+        """room_key of the version valid at each reading's timestamp (0 for unknown rooms)"""
+        codes, uniques = pd.factorize(room_ids)
+        lookup = np.array([self.current[room_id][0] if room_id in self.current else 0 for room_id in uniques] + [0],
+                          dtype=np.int64)
+        keys = lookup[codes]
+        for code, room_id in enumerate(uniques):
+            if room_id in self.versions:
+                # As-of lookup, only for the rooms that have history
+                valid_from, version_keys = self.versions[room_id]
+                rows = codes == code
+                ts = np.asarray(timestamps[rows], dtype='datetime64[ns]')
+                position = np.searchsorted(valid_from, ts, side='right') - 1
+                keys[rows] = version_keys[np.maximum(position, 0)]
+        return keys
+
+    def upsert_time(self, dim_time):
+        """Add the hours of `dim_time` that the store does not hold yet"""
+        if self.dim_time is None:
+            new_hours = dim_time
+        else:
+            new_hours = dim_time[~dim_time['time_key'].isin(self.dim_time['time_key'])]
+        self.changes['new_hours'] += len(new_hours)
+        if len(new_hours):
+            self.dim_time = pd.concat([self.dim_time, new_hours]).sort_values('time_key').reset_index(drop=True)
+
+    def dim_room(self):
+        """DIM_ROOM - every room version, ordered by key"""
+        columns = ROOM_COLUMNS + ['room_key', 'valid_from', 'valid_to', 'is_current']
+        dim_room = pd.DataFrame(self.room_versions, columns=columns).sort_values('room_key')
+        dim_room['valid_to'] = pd.to_datetime(dim_room['valid_to'])
+        return dim_room.reset_index(drop=True)
+
+    def save(self):
+        """Persist dim_room and dim_time"""
+        os.makedirs(os.path.dirname(self.room_path), exist_ok=True)
+        write_parquet(self.dim_room(), self.room_path)
+        if self.dim_time is not None:
+            write_parquet(self.dim_time, self.time_path)
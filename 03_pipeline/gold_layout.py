@@ -0,0 +1,141 @@
+"""
+Gold Layout - physical layout and compaction of the fact table
+One file per date partition, rows sorted by (room_key, timestamp), row
+groups of a deliberate size with min/max statistics (and optionally a
+Bloom filter on sensor_id), so room and time filters skip row groups.
+
+Usage:
+  python 03_pipeline/gold_layout.py                  compact fact_sensor_readings
+  python 03_pipeline/gold_layout.py --bloom-filter   ... with sensor_id Bloom filters
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import argparse
+import os
+
+from partition_writer import stage_partition, commit_partition
+from table_manifest import commit
+
+FACT_PATH = '02_data/gold/fact_sensor_readings.parquet'
+
+FACT_SORT_KEYS = [('room_key', 'ascending'), ('timestamp', 'ascending')]
+FACT_NATURAL_KEY = ['sensor_id', 'timestamp']
+
+# ~64k rows: a few MB per row group for the fact columns, several row groups
+# per day at fleet scale so a room filter reads only a fraction of them
+ROW_GROUP_ROWS = 65_536
+
+def write_fact_file(df, path, row_group_rows=ROW_GROUP_ROWS, bloom_filter=False):
+    """Write fact rows to one Parquet file in the gold layout"""
+    df = df.sort_values([col for col, _ in FACT_SORT_KEYS], kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    options = {
+        'row_group_size': row_group_rows,
+        'compression': 'snappy',
+        'write_statistics': True,
+        'sorting_columns': pq.SortingColumn.from_ordering(table.schema, FACT_SORT_KEYS),
+    }
+    if bloom_filter:
+        options['bloom_filter_options'] = {'sensor_id': {'ndv': max(len(df), 1), 'fpp': 0.05}}
+    try:
+        pq.write_table(table, path, **options)
+    except TypeError:
+        # pyarrow < 20 cannot write Bloom filters
+        print("  ⚠️ This pyarrow version cannot write Bloom filters - writing without")
+        options.pop('bloom_filter_options')
+        pq.write_table(table, path, **options)
+
+def is_laid_out(files):
+    """True when a partition is a single file written by write_fact_file()"""
+    if len(files) != 1:
+        return False
+    metadata = pq.ParquetFile(files[0]).metadata
+    return metadata.num_row_groups > 0 and bool(metadata.row_group(0).sorting_columns)
+
+def compact_partition(partition_dir, row_group_rows=ROW_GROUP_ROWS, bloom_filter=False, force=False):
+    """
+    Merge the part files of one partition into a single laid-out file.
+    Rows repeated across files (same sensor_id + timestamp, left behind by
+    earlier appending runs) are kept once, from the newest file.
+    Returns (files before, rows before, rows after) or None when untouched.
+    """
+    files = sorted((os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+                    if name.endswith('.parquet')), key=os.path.getmtime)
+    if not files or (not force and is_laid_out(files)):
+        return None
+
+    df = pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+    rows_before = len(df)
+    df = df.drop_duplicates(subset=FACT_NATURAL_KEY, keep='last')
+
+    base_path, name = os.path.split(partition_dir)
+    staged_dir = stage_partition(base_path, name)
+    write_fact_file(df, os.path.join(staged_dir, 'part-0.parquet'), row_group_rows, bloom_filter)
+    commit_partition(base_path, name, staged_dir)
+    return len(files), rows_before, len(df)
+
+def compact_table(base_path=FACT_PATH, row_group_rows=ROW_GROUP_ROWS, bloom_filter=False, force=False,
+                  verbose=True):
+    """Compact every partition of a partitioned fact table; returns the number compacted"""
+    compacted = 0
+    if not os.path.isdir(base_path):
+        return compacted
+    for entry in sorted(os.listdir(base_path)):
+        partition_dir = os.path.join(base_path, entry)
+        if not os.path.isdir(partition_dir) or '=' not in entry or entry.startswith('_'):
+            continue
+        result = compact_partition(partition_dir, row_group_rows, bloom_filter, force)
+        if result is not None:
+            compacted += 1
+            if verbose:
+                files, rows_before, rows_after = result
+                print(f"  ✓ {entry}: {files} file(s) → 1, {rows_before:,} → {rows_after:,} rows")
+    return compacted
+
+def row_groups_read(base_path=FACT_PATH, room_key=None, start=None, end=None):
+    """
+    (row groups that a room / timestamp filter has to read, total row groups),
+    decided from the min/max statistics alone
+    """
+    predicate = None
+    if room_key is not None:
+        predicate = ds.field('room_key') == room_key
+    if start is not None:
+        time_predicate = (ds.field('timestamp') >= pa.scalar(pd.Timestamp(start))) & \
+                         (ds.field('timestamp') < pa.scalar(pd.Timestamp(end)))
+        predicate = time_predicate if predicate is None else predicate & time_predicate
+
+    dataset = ds.dataset(base_path, format='parquet', partitioning='hive')
+    total = read = 0
+    for fragment in dataset.get_fragments():
+        total += fragment.metadata.num_row_groups
+        read += len(fragment.split_by_row_group(predicate)) if predicate is not None \
+            else fragment.metadata.num_row_groups
+    return read, total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact and lay out the gold fact table")
+    parser.add_argument('--path', default=FACT_PATH, help=f"partitioned fact table (default: {FACT_PATH})")
+    parser.add_argument('--row-group-rows', type=int, default=ROW_GROUP_ROWS,
+                        help=f"rows per row group (default: {ROW_GROUP_ROWS:,})")
+    parser.add_argument('--bloom-filter', action='store_true', help="write a Bloom filter on sensor_id")
+    parser.add_argument('--force', action='store_true', help="rewrite partitions that are already laid out")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  GOLD LAYOUT - Fact table compaction")
+    print("=" * 60)
+    print()
+    compacted = compact_table(args.path, args.row_group_rows, args.bloom_filter, args.force)
+    if compacted:
+        commit(args.path, 'compact')
+    print(f"\n✅ {compacted} partition(s) compacted\n")
+
+    rooms = pq.read_table(args.path, columns=['room_key']).column('room_key').unique().to_pylist() \
+        if os.path.isdir(args.path) else []
+    if rooms:
+        read, total = row_groups_read(args.path, room_key=sorted(rooms)[0])
+        print(f"📊 Row groups read for one room (room_key={sorted(rooms)[0]}): {read} of {total}")
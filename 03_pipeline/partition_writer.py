@@ -0,0 +1,129 @@
+"""
+Partition Writer - idempotent, atomic overwrite of hive-style partitions
+Dynamic partition overwrite for the partitioned silver and gold tables
+
+A partition is written completely into a staging directory next to the live
+partitions and then swapped into place with renames, so re-running a write
+replaces the partition instead of adding part files to it. Staging and
+retired directories start with '_', which pyarrow / pandas readers skip.
+Swaps of a live table take a write lease (table_manifest.begin_write) that
+the caller's commit() releases, so manifest readers wait for that commit.
+"""
+
+import os
+import shutil
+
+from table_manifest import begin_write, commit, process_alive
+
+STAGING_PREFIX = '_staging-'
+RETIRED_PREFIX = '_retired-'
+
+def partition_name(partition_col, value):
+    """Directory name of one hive partition"""
+    return f"{partition_col}={value}"
+
+def live_partitions(base_path, partition_col):
+    """Partition values currently visible to readers"""
+    if not os.path.isdir(base_path):
+        return []
+    prefix = partition_col + '='
+    return sorted(entry[len(prefix):] for entry in os.listdir(base_path)
+                  if entry.startswith(prefix) and os.path.isdir(os.path.join(base_path, entry)))
+
+def stage_partition(base_path, name):
+    """Create an empty staging directory for partition `name` and return its path"""
+    staged_dir = os.path.join(base_path, f"{STAGING_PREFIX}{name}-{os.getpid()}")
+    shutil.rmtree(staged_dir, ignore_errors=True)
+    os.makedirs(staged_dir)
+    return staged_dir
+
+def _retire(base_path, name):
+    """Rename a live partition out of the readers' view; returns the new path or None"""
+    live_dir = os.path.join(base_path, name)
+    if not os.path.exists(live_dir):
+        return None
+    if not os.path.basename(os.path.normpath(base_path)).startswith('_'):
+        # Staged tables are not read; live ones are until the caller commits
+        begin_write(base_path)
+    retired_dir = os.path.join(base_path, f"{RETIRED_PREFIX}{name}-{os.getpid()}")
+    shutil.rmtree(retired_dir, ignore_errors=True)
+    os.rename(live_dir, retired_dir)
+    return retired_dir
+
+def commit_partition(base_path, name, staged_dir):
+    """
+    Swap a fully written staging directory in as partition `name`. Readers see
+    the old or the new files, never a mix of both (for the instant between
+    the two renames the partition is absent).
+    """
+    retired_dir = _retire(base_path, name)
+    os.rename(staged_dir, os.path.join(base_path, name))
+    if retired_dir is not None:
+        shutil.rmtree(retired_dir)
+
+def drop_partition(base_path, name):
+    """Remove partition `name` (renamed away first, then deleted)"""
+    retired_dir = _retire(base_path, name)
+    if retired_dir is not None:
+        shutil.rmtree(retired_dir)
+
+def _owner_alive(entry):
+    """True when the pid suffix of a staging / retired entry names another running process"""
+    pid = entry.rsplit('-', 1)[-1]
+    return pid.isdigit() and process_alive(int(pid))
+
+def recover(base_path):
+    """
+    Clean up after an interrupted write: a retired partition without a live
+    replacement is restored, leftover staging and retired directories go.
+    Entries of writers that are still running (pid suffix) are left alone.
+    """
+    if not os.path.isdir(base_path):
+        return
+    for entry in sorted(os.listdir(base_path)):
+        path = os.path.join(base_path, entry)
+        if entry.startswith((STAGING_PREFIX, RETIRED_PREFIX)) and _owner_alive(entry):
+            continue
+        if entry.startswith(RETIRED_PREFIX):
+            name = entry[len(RETIRED_PREFIX):].rsplit('-', 1)[0]
+            if not os.path.exists(os.path.join(base_path, name)):
+                os.rename(path, os.path.join(base_path, name))
+                continue
+        if entry.startswith((STAGING_PREFIX, RETIRED_PREFIX)):
+            shutil.rmtree(path, ignore_errors=True)
+
+def replace_partitions(df, base_path, partition_col, partitions=(), write_file=None):
+    """
+    Replace whole partitions of a partitioned Parquet dataset with `df`.
+    Partitions listed in `partitions` but absent from `df` are cleared.
+    write_file(part, path) writes one partition file (default: plain to_parquet).
+    """
+    os.makedirs(base_path, exist_ok=True)
+    for value in set(map(str, partitions)) - set(map(str, df[partition_col].unique())):
+        drop_partition(base_path, partition_name(partition_col, value))
+    for value, part in df.groupby(partition_col, observed=True):
+        name = partition_name(partition_col, value)
+        staged_dir = stage_partition(base_path, name)
+        path = os.path.join(staged_dir, 'part-0.parquet')
+        if write_file is None:
+            part.drop(columns=[partition_col]).to_parquet(path, compression='snappy', index=False)
+        else:
+            write_file(part.drop(columns=[partition_col]), path)
+        commit_partition(base_path, name, staged_dir)
+    commit(base_path, 'replace partitions')
+
+def commit_table(staged_root, base_path, partition_col):
+    """
+    Publish every partition written under `staged_root` into `base_path` and
+    drop the live partitions the staged table does not have (full overwrite)
+    """
+    staged = live_partitions(staged_root, partition_col)
+    os.makedirs(base_path, exist_ok=True)
+    for value in staged:
+        name = partition_name(partition_col, value)
+        commit_partition(base_path, name, os.path.join(staged_root, name))
+    for value in set(live_partitions(base_path, partition_col)) - set(staged):
+        drop_partition(base_path, partition_name(partition_col, value))
+    shutil.rmtree(staged_root, ignore_errors=True)
+    commit(base_path, 'overwrite')
+    return len(staged)
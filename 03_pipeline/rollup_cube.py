@@ -0,0 +1,164 @@
+"""
+Rollup Cube - pre-aggregated gold layer
+Hourly, daily and weekly cells per room version and alert level
+
+Every cell holds mergeable aggregates (count, sum, sum of squares, min, max)
+per metric, so any coarser grain or grouping (building, room_type, alert
+level, ...) is derived by merging cells instead of rescanning the fact table:
+daily cells come from hourly cells, weekly cells from daily cells.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+
+from partition_writer import replace_partitions, live_partitions
+from table_manifest import load_snapshot, read_table, write_parquet
+
+ROLLUP_DIR = '02_data/gold/rollup'
+HOURLY_PATH = os.path.join(ROLLUP_DIR, 'hourly')
+ROLLUP_PATHS = {
+    'daily': os.path.join(ROLLUP_DIR, 'daily.parquet'),
+    'weekly': os.path.join(ROLLUP_DIR, 'weekly.parquet'),
+}
+
+# ac_on is 1.0 for a reading with the AC on: its _sum counts those readings
+CUBE_METRICS = ['temperature', 'humidity', 'co2_ppm', 'light_lux', 'occupancy_count', 'occupancy_pct',
+                'energy_efficiency', 'ac_on']
+CELL_KEYS = ['room_key', 'alert_key']
+PERIOD_KEYS = {'hourly': 'time_key', 'daily': 'date_key', 'weekly': 'week_key'}
+
+# ==================== MERGEABLE AGGREGATES ====================
+
+def aggregate_columns(cells):
+    """The mergeable aggregate columns of a partials frame"""
+    return [col for col in cells.columns
+            if col == 'count' or col.endswith(('_count', '_sum', '_sumsq', '_min', '_max'))]
+
+def partial_aggregates(df, keys, metrics=CUBE_METRICS):
+    """Row count plus count / sum / sum of squares / min / max of each metric, per `keys` group"""
+    values = df[keys].copy()
+    aggs = {'count': (keys[0], 'size')}
+    for metric in metrics:
+        values[metric] = df[metric].astype('float64')
+        values[metric + '_sq'] = values[metric] ** 2
+        aggs.update({
+            metric + '_count': (metric, 'count'),
+            metric + '_sum': (metric, 'sum'),
+            metric + '_sumsq': (metric + '_sq', 'sum'),
+            metric + '_min': (metric, 'min'),
+            metric + '_max': (metric, 'max'),
+        })
+    return values.groupby(keys, observed=True).agg(**aggs).reset_index()
+
+def merge_partials(partials, keys):
+    """Merge partial aggregates per `keys` group: counts and sums add up, min/max combine"""
+    merged = pd.concat(partials, ignore_index=True) if isinstance(partials, list) else partials
+    how = {col: ('min' if col.endswith('_min') else 'max' if col.endswith('_max') else 'sum')
+           for col in aggregate_columns(merged)}
+    return merged.groupby(keys, observed=True).agg(how).reset_index()
+
+def cube_stats(cells, metrics=CUBE_METRICS):
+    """Add mean and sample std (ddof=1) columns computed from the aggregates"""
+    stats = cells.copy()
+    for metric in metrics:
+        n = stats[metric + '_count']
+        total, total_sq = stats[metric + '_sum'], stats[metric + '_sumsq']
+        stats[metric + '_mean'] = total / n
+        # Clip tiny negative rounding residue before the square root
+        variance = ((total_sq - total ** 2 / n) / (n - 1)).clip(lower=0)
+        stats[metric + '_std'] = np.sqrt(variance.where(n > 1))
+    return stats
+
+# ==================== GRAINS ====================
+
+def week_keys(date_keys):
+    """YYYYMMDD key of the Monday starting each date's week"""
+    codes, uniques = pd.factorize(np.asarray(date_keys))
+    days = pd.to_datetime(uniques.astype(str), format='%Y%m%d')
+    mondays = days - pd.to_timedelta(days.dayofweek, unit='D')
+    return np.asarray(mondays.strftime('%Y%m%d').astype(int), dtype=np.int64)[codes]
+
+def hourly_cells(fact_table):
+    """Hourly cells from keyed fact rows (time_key, room_key, alert_key + metrics)"""
+    ac_on = (fact_table['ac_status'] == 'ON').astype('float64')
+    return partial_aggregates(fact_table.assign(ac_on=ac_on), ['time_key'] + CELL_KEYS)
+
+def roll_up(cells, grain):
+    """Daily cells from hourly cells, weekly cells from daily cells"""
+    if grain == 'daily':
+        finer, period = 'time_key', cells['time_key'] // 100
+    elif grain == 'weekly':
+        finer, period = 'date_key', week_keys(cells['date_key'])
+    else:
+        raise ValueError(f"Cannot roll up to grain: {grain}")
+    key = PERIOD_KEYS[grain]
+    cells = cells[CELL_KEYS + aggregate_columns(cells)].assign(**{key: period})
+    return merge_partials(cells, [key] + CELL_KEYS)
+
+def with_attributes(cells, dim_room, dim_alert):
+    """Attach room and alert attributes (by key) for grouping at query time"""
+    rooms = dim_room[['room_key', 'room_id', 'building', 'room_type']]
+    alerts = dim_alert[['alert_key', 'alert_status']]
+    return cells.merge(rooms, on='room_key', how='left').merge(alerts, on='alert_key', how='left')
+
+# ==================== STORAGE ====================
+
+def _partition_dates(date_keys):
+    """'YYYY-MM-DD' partition values of YYYYMMDD date keys"""
+    return [f"{str(key)[:4]}-{str(key)[4:6]}-{str(key)[6:]}" for key in date_keys]
+
+def _replace_cells(path, new_cells, period_key, touched_periods, rebuild=False):
+    """Stored cells of the untouched periods plus the recomputed cells"""
+    if rebuild or not os.path.exists(path):
+        return new_cells
+    stored = pd.read_parquet(path)
+    stored = stored[~stored[period_key].isin(touched_periods)][[period_key] + CELL_KEYS + aggregate_columns(stored)]
+    return pd.concat([stored, new_cells], ignore_index=True).sort_values([period_key] + CELL_KEYS, ignore_index=True)
+
+def update_rollups(hourly, dim_room, dim_alert, dates=None):
+    """
+    Materialize the cube. `hourly` holds the hourly cells of the date partitions
+    in `dates` ('YYYY-MM-DD'; None = everything, the cube is rebuilt). Only the
+    touched days and weeks are recomputed. Returns {grain: cell count}.
+    """
+    rebuild = dates is None
+    os.makedirs(ROLLUP_DIR, exist_ok=True)
+
+    # Hourly: one directory per day, replaced as a whole (a rebuild also drops the other days)
+    day_of = (hourly['time_key'] // 100).to_numpy()
+    touched_days = np.union1d(day_of, [int(d.replace('-', '')) for d in (dates or [])]).astype(np.int64)
+    cleared = _partition_dates(touched_days) + (live_partitions(HOURLY_PATH, 'partition_date') if rebuild else [])
+    codes, days = pd.factorize(day_of)
+    partition_date = np.asarray(_partition_dates(days), dtype=object)[codes]
+    replace_partitions(with_attributes(hourly, dim_room, dim_alert).assign(partition_date=partition_date),
+                       HOURLY_PATH, 'partition_date', partitions=cleared)
+
+    # Daily: the touched days, derived from their hourly cells
+    daily = _replace_cells(ROLLUP_PATHS['daily'], roll_up(hourly, 'daily'), 'date_key', touched_days, rebuild)
+
+    # Weekly: the touched weeks, derived from all of their daily cells
+    touched_weeks = np.unique(week_keys(touched_days))
+    in_touched_week = np.isin(week_keys(daily['date_key']), touched_weeks)
+    weekly = _replace_cells(ROLLUP_PATHS['weekly'], roll_up(daily[in_touched_week], 'weekly'),
+                            'week_key', touched_weeks, rebuild)
+
+    for grain, cells in (('daily', daily), ('weekly', weekly)):
+        write_parquet(with_attributes(cells, dim_room, dim_alert), ROLLUP_PATHS[grain])
+    return {'hourly': load_snapshot(HOURLY_PATH)['rows'], 'daily': len(daily), 'weekly': len(weekly)}
+
+def load_rollup(grain, by, start_key=None, end_key=None):
+    """
+    Query the cube: merge the cells of one grain up to the `by` columns
+    (e.g. ['building'], ['date_key', 'room_type'], ['week_key', 'alert_status'])
+    and return the aggregates with mean / std per metric
+    """
+    key = PERIOD_KEYS[grain]
+    filters = []
+    if start_key is not None:
+        filters.append((key, '>=', start_key))
+    if end_key is not None:
+        filters.append((key, '<=', end_key))
+    # The manifest skips the hourly partitions outside the key range
+    cells = read_table(HOURLY_PATH if grain == 'hourly' else ROLLUP_PATHS[grain], filters=filters or None)
+    return cube_stats(merge_partials(cells, list(by)))
@@ -0,0 +1,301 @@
+"""
+Stream Gold - continuous ingestion of stream events into the gold star schema
+Stream events are buffered for a few seconds, then one commit:
+
+  1. checks them with the silver data-quality rules (duplicates across commits included)
+     and derives the silver features the batch pipeline adds. The duplicate
+     check keeps its keys per date and drops a date once the event-time
+     watermark (newest event time - max_delay, as in stream_windows.py) has
+     passed its end; events of a dropped date are rejected as late
+  2. maps them onto gold keys: room_key from the SCD2 dimension store (rooms
+     the store does not know are registered), alert_key from the key dictionary,
+     time_key / dim_time for new hours
+  3. appends one file per touched date to fact_sensor_readings (written under a
+     '_' name, renamed into the date partition, committed to the manifest)
+  4. merges the new rows' hourly cells into the rollup cube and replaces the
+     touched date partitions of summary_hourly, recomputed from the merged cells
+
+A batch rebuild of a date partition replaces its stream files: the batch
+layer stays authoritative. gold_layout.py merges the small stream files of a
+partition into the sorted layout.
+
+With --checkpoint (stream_checkpoint.py) a checkpoint commits the buffer and
+records the duplicate-check state and the stream files committed so far.
+Recovery removes the stream files committed after it and recomputes the cube
+and summary_hourly of their dates, so the replay commits those events once.
+Dimension rows are upserts and need no rollback. Do not compact the fact
+table (gold_layout.py) while a checkpointed stream may still recover: merged
+stream files can no longer be told apart.
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import time
+
+from batch_pipeline import (FACT_PATH, FACT_COLUMNS, GOLD_DIR, DQ_REJECT_BITS, evaluate_quality, derive_silver_features,
+                            load_key_dictionaries, save_key_dictionaries, assign_keys, build_dim_time,
+                            build_dim_alert, finalize_summary, write_summary, SUMMARY_PATH,
+                            SILVER_TIME_DTYPE)
+from dimension_store import DimensionStore, DIM_ROOM_PATH
+from partition_writer import live_partitions, partition_name
+from rollup_cube import hourly_cells, merge_partials, update_rollups, with_attributes, aggregate_columns, \
+    CELL_KEYS, HOURLY_PATH
+from table_manifest import TableLock, begin_write, commit, load_snapshot, read_table, write_parquet
+
+DIM_ALERT_PATH = os.path.join(GOLD_DIR, 'dim_alert.parquet')
+STREAM_PREFIX = 'stream-'
+
+# Room attributes the stream does not carry, for rooms the dimension store does not know
+UNKNOWN_FLOOR = 0
+UNKNOWN_ROOM_TYPE = 'Unknown'
+
+EVENT_COLUMNS = ['sensor_id', 'timestamp', 'room_id', 'building', 'temperature', 'humidity', 'co2_ppm',
+                 'occupancy_count', 'occupancy_pct', 'alert_status']
+
+def gold_rooms():
+    """Current dim_room versions as simulator rooms (room_id, building, capacity); [] without a gold layer"""
+    if not os.path.exists(DIM_ROOM_PATH):
+        return []
+    dim_room = read_table(DIM_ROOM_PATH)
+    dim_room = dim_room[dim_room['is_current']] if 'is_current' in dim_room.columns else dim_room
+    return [{'room_id': row['room_id'], 'building': row['building'], 'capacity': int(row['room_capacity'])}
+            for row in dim_room.sort_values('room_key').to_dict('records')]
+
+def stream_files():
+    """Stream files in the fact partitions, relative to FACT_PATH"""
+    files = []
+    for value in live_partitions(FACT_PATH, 'partition_date'):
+        name = partition_name('partition_date', value)
+        files += [os.path.join(name, entry) for entry in sorted(os.listdir(os.path.join(FACT_PATH, name)))
+                  if entry.startswith(STREAM_PREFIX)]
+    return files
+
+def fact_schema():
+    """Arrow schema of the stored fact files (None before the first batch run)"""
+    snapshot = load_snapshot(FACT_PATH)
+    if not snapshot or not snapshot['files']:
+        return None
+    return pq.read_schema(os.path.join(FACT_PATH, snapshot['files'][0]['path'])).remove_metadata()
+
+class GoldBridge:
+    """
+    Sink that commits stream events to gold every `commit_interval` seconds
+    (or at `commit_rows` buffered events).
+
+    to_table        batch → pyarrow Table with EVENT_COLUMNS (for write_batch)
+    max_delay       seconds an event may arrive after newer ones and still be checked
+    """
+
+    def __init__(self, to_table=None, commit_interval=5.0, commit_rows=1_000_000, max_delay=5.0):
+        self.to_table = to_table
+        self.commit_interval = commit_interval
+        self.commit_rows = commit_rows
+        self.max_delay = pd.Timedelta(seconds=max_delay)
+
+        self.tables = []
+        self.rows = []
+        self.buffered_rows = 0
+        self.first_arrival = None
+        self.dq_state = {}
+        self.max_event = None
+        self.watermark = None  # start of the oldest date the duplicate check still holds
+        self.sequence = 0
+        self.schema = fact_schema()
+        self.stats = {'events': 0, 'rejected': 0, 'late': 0, 'commits': 0, 'files': 0, 'max_freshness_s': 0.0,
+                      'last_commit_s': 0.0}
+
+    # ---------- buffering ----------
+
+    def write(self, event):
+        self.write_events([event])
+
+    def write_events(self, events):
+        """Buffer a list of event dicts"""
+        self.rows.extend(events)
+        self._buffered(len(events))
+
+    def write_batch(self, batch):
+        """Buffer a batch (converted to Arrow by `to_table`)"""
+        table = self.to_table(batch) if self.to_table is not None else batch
+        self.tables.append(table.select(EVENT_COLUMNS))
+        self._buffered(table.num_rows)
+
+    def _buffered(self, count):
+        if self.first_arrival is None and count:
+            self.first_arrival = time.monotonic()
+        self.buffered_rows += count
+        self.stats['events'] += count
+        self.poll()
+
+    def poll(self):
+        """Commit when the buffer is old or large enough"""
+        if self.buffered_rows >= self.commit_rows or \
+                (self.buffered_rows and time.monotonic() - self.first_arrival >= self.commit_interval):
+            self.flush()
+
+    def _buffered_frame(self):
+        # Dictionary labels are decoded to plain strings (a dictionary may repeat values, e.g. buildings)
+        frames = [table.cast(pa.schema([pa.field(field.name, field.type.value_type)
+                                        if pa.types.is_dictionary(field.type) else field for field in table.schema]))
+                  .to_pandas() for table in self.tables]
+        if self.rows:
+            frames.append(pd.DataFrame(self.rows, columns=EVENT_COLUMNS))
+        df = pd.concat(frames, ignore_index=True)
+        for column in ('sensor_id', 'room_id', 'building', 'alert_status'):
+            df[column] = df[column].astype(object)
+        # Silver's timestamp unit, so the events cast onto the fact schema without losing precision
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601').astype(SILVER_TIME_DTYPE)
+        return df
+
+    # ---------- commit ----------
+
+    def flush(self):
+        """Commit the buffered events to gold (no-op when empty)"""
+        if not self.buffered_rows:
+            return
+        started = time.monotonic()
+        df = self._buffered_frame()
+        first_arrival = self.first_arrival
+        self.tables, self.rows, self.buffered_rows, self.first_arrival = [], [], 0, None
+
+        # The previous date stays checkable until the watermark passes midnight;
+        # events of a date the duplicate check has dropped can no longer be checked
+        newest = df['timestamp'].max()
+        if pd.notna(newest):
+            self.max_event = newest if self.max_event is None else max(self.max_event, newest)
+            self.watermark = (self.max_event - self.max_delay).normalize()
+            self.dq_state['keep_from_day'] = self.watermark.to_datetime64().astype('datetime64[D]').astype(np.int64)
+            late = (df['timestamp'] < self.watermark).to_numpy()
+            self.stats['late'] += int(late.sum())
+            df = df[~late].reset_index(drop=True)
+
+        # Silver: quality rules (state carries duplicate / ordering checks across commits) + features
+        flags = evaluate_quality(df, state=self.dq_state, verbose=False)
+        rejected = (flags & DQ_REJECT_BITS) != 0
+        self.stats['rejected'] += int(rejected.sum())
+        df = df[~rejected].reset_index(drop=True)
+        if len(df):
+            # The stream carries no AC state or light level
+            df['ac_status'] = None
+            df['light_lux'] = np.nan
+            derive_silver_features(df)
+            df['energy_efficiency'] = np.nan
+            self._load(df)
+
+        freshness = time.monotonic() - first_arrival
+        self.stats['commits'] += 1
+        self.stats['max_freshness_s'] = max(self.stats['max_freshness_s'], freshness)
+        self.stats['last_commit_s'] = time.monotonic() - started
+
+    def _load(self, df):
+        # Keys: unknown rooms become new dim_room rows, new hours new dim_time rows
+        keys = load_key_dictionaries()
+        known_alerts = len(keys['alert_status'])
+        store = DimensionStore()
+        df['floor'] = UNKNOWN_FLOOR
+        df['room_type'] = UNKNOWN_ROOM_TYPE
+        df['room_capacity'] = 0
+        known = df['room_id'].isin(store.current)
+        new_rooms = df.loc[~known, ['room_id', 'building', 'floor', 'room_type', 'room_capacity', 'timestamp']]
+        if len(new_rooms):
+            store.upsert_rooms(new_rooms.groupby('room_id', as_index=False).first()
+                               .rename(columns={'timestamp': 'valid_from'}))
+        assign_keys(df, keys, store, upsert=False)
+        store.upsert_time(build_dim_time(df))
+        if any(store.changes.values()):
+            store.save()
+        dim_room = store.dim_room()
+        dim_alert = build_dim_alert(keys)
+        if len(keys['alert_status']) != known_alerts or not os.path.exists(DIM_ALERT_PATH):
+            save_key_dictionaries(keys)
+            write_parquet(dim_alert, DIM_ALERT_PATH)
+
+        dates = self._append_fact(df)
+        self._update_summaries(hourly_cells(df), dim_room, dim_alert, dates, df.dtypes)
+
+    def _append_fact(self, df):
+        """One new file per touched date partition, then one manifest commit; returns the dates"""
+        day_of = df['time_key'].to_numpy() // 100
+        dates = []
+        for day in np.unique(day_of):
+            value = f"{str(day)[:4]}-{str(day)[4:6]}-{str(day)[6:]}"
+            table = pa.Table.from_pandas(df.loc[day_of == day, FACT_COLUMNS], preserve_index=False)
+            if self.schema is not None:
+                table = table.cast(self.schema)
+            partition_dir = os.path.join(FACT_PATH, partition_name('partition_date', value))
+            os.makedirs(partition_dir, exist_ok=True)
+            name = f"{STREAM_PREFIX}{time.time_ns():020d}-{os.getpid()}-{self.sequence:06d}.parquet"
+            self.sequence += 1
+            tmp_path = os.path.join(partition_dir, f"_{name}.tmp")
+            pq.write_table(table, tmp_path, compression='snappy')
+            os.replace(tmp_path, os.path.join(partition_dir, name))
+            self.schema = self.schema or table.schema
+            self.stats['files'] += 1
+            dates.append(value)
+        commit(FACT_PATH, 'stream append')
+        return dates
+
+    def _update_summaries(self, new_cells, dim_room, dim_alert, dates, dtypes):
+        """
+        Merge new hourly cells into the cube, replace the touched dates of summary_hourly.
+        The read-merge-replace runs under the summary's TableLock, so a batch run
+        writing the same dates cannot be overwritten from a stale read (or vice versa)
+        """
+        with TableLock(SUMMARY_PATH):
+            stored = read_table(HOURLY_PATH, filters=[('partition_date', 'in', dates)]) \
+                if load_snapshot(HOURLY_PATH) else new_cells.iloc[:0]
+            stored = stored[['time_key'] + CELL_KEYS + aggregate_columns(stored)]
+            merged = merge_partials([stored, new_cells], ['time_key'] + CELL_KEYS)
+            update_rollups(merged, dim_room, dim_alert, dates=dates)
+
+            # `merged` holds every cell of the touched dates: their summary partitions are recomputed whole
+            cells = with_attributes(merged, dim_room, dim_alert)
+            write_summary(finalize_summary(merge_partials(cells, ['room_id', 'time_key']), dtypes), dates=dates)
+
+    def _rebuild_summaries(self, dates):
+        """Recompute the cube and summary_hourly cells of `dates` from their fact partitions"""
+        fact = read_table(FACT_PATH, filters=[('partition_date', 'in', dates)])
+        dim_room = DimensionStore().dim_room()
+        dim_alert = build_dim_alert(load_key_dictionaries())
+        cells = hourly_cells(fact)
+        with TableLock(SUMMARY_PATH):
+            update_rollups(cells, dim_room, dim_alert, dates=dates)
+            cells = with_attributes(cells, dim_room, dim_alert)
+            write_summary(finalize_summary(merge_partials(cells, ['room_id', 'time_key']), fact.dtypes), dates=dates)
+
+    # ---------- checkpoint (stream_checkpoint.py) ----------
+
+    def snapshot(self):
+        """Commit what is buffered; the state is the duplicate check and the committed stream files"""
+        self.flush()
+        return {'sequence': self.sequence, 'dq_state': self.dq_state, 'max_event': self.max_event,
+                'watermark': self.watermark, 'files': stream_files()}
+
+    def restore(self, state, position):
+        """
+        Remove the stream files committed after the checkpoint and recompute the
+        cube / summary of their dates; the replay commits those events again
+        (state None = start of stream: gold files of earlier streams are kept)
+        """
+        self.tables, self.rows, self.buffered_rows, self.first_arrival = [], [], 0, None
+        if state is None:
+            return
+        self.sequence, self.dq_state = state['sequence'], state['dq_state']
+        self.max_event, self.watermark = state['max_event'], state['watermark']
+        kept = set(state['files'])
+        removed = [path for path in stream_files() if path not in kept]
+        if not removed:
+            return
+        begin_write(FACT_PATH)
+        for path in removed:
+            os.remove(os.path.join(FACT_PATH, path))
+        commit(FACT_PATH, 'stream rollback')
+        dates = sorted({os.path.dirname(path).split('=', 1)[1] for path in removed})
+        self._rebuild_summaries(dates)
+
+    def close(self):
+        """Commit what is buffered"""
+        self.flush()
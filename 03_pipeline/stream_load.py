@@ -0,0 +1,128 @@
+"""
+Stream Load - load generation for the streaming stages
+Drives a fixed event rate through generate_batch → process_batch → sink in
+vectorized batches (open loop: every event has a scheduled emission time,
+falling behind shows up as latency, not as a lower offered rate).
+
+Reports the sustained throughput, the time per stage and end-to-end latency
+percentiles (scheduled emission → batch accepted by the sink).
+"""
+
+import numpy as np
+from datetime import datetime
+import time
+
+class NullSink:
+    """Sink that drops every event / batch (measures generate + process alone)"""
+    def write(self, event):
+        pass
+
+    def write_events(self, events):
+        pass
+
+    def write_batch(self, batch):
+        pass
+
+    def poll(self):
+        pass
+
+    def close(self):
+        pass
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (1 µs .. 1000 s, ~2.3% resolution):
+    constant memory no matter how many events are recorded
+    """
+    EDGES = np.logspace(-6, 3, 901)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts += np.bincount(np.searchsorted(self.EDGES, seconds), minlength=len(self.counts))
+        self.max = max(self.max, float(seconds.max()))
+
+    def percentile(self, q):
+        """Upper bucket edge of the q-th percentile, in seconds"""
+        total = self.counts.sum()
+        if total == 0:
+            return float('nan')
+        bucket = int(np.searchsorted(np.cumsum(self.counts), total * q / 100))
+        return min(float(self.EDGES[min(bucket, len(self.EDGES) - 1)]), self.max)
+
+def run_load(simulator, rate, duration, batch_size=50_000, sink=None, checkpointer=None):
+    """
+    Offer `rate` events/s for `duration` seconds. Events due since the last
+    batch are generated together (at most `batch_size`, at least ~1 ms worth).
+    `checkpointer` (stream_checkpoint.py) may checkpoint between batches;
+    its time counts as sink time. Returns the load report dict.
+    """
+    sink = sink or NullSink()
+    histogram = LatencyHistogram()
+    stage_s = {'generate': 0.0, 'process': 0.0, 'sink': 0.0}
+    total = int(rate * duration)
+    min_batch = max(1, min(batch_size, rate // 1000))
+    emitted = batches = 0
+
+    wall_start = np.datetime64(datetime.now(), 'ns')
+    start = time.perf_counter()
+    while emitted < total:
+        now = time.perf_counter() - start
+        due = min(int(now * rate), total) - emitted
+        if due < min(min_batch, total - emitted):
+            # Ahead of schedule: wait until a minimum batch is due
+            time.sleep(max(0.0, (emitted + min_batch) / rate - now))
+            continue
+        size = min(due, batch_size)
+        scheduled = (emitted + np.arange(size)) / rate
+
+        t0 = time.perf_counter()
+        batch = simulator.generate_batch(size, wall_start + (scheduled * 1e9).astype('timedelta64[ns]'))
+        t1 = time.perf_counter()
+        batch = simulator.process_batch(batch)
+        t2 = time.perf_counter()
+        sink.write_batch(batch)
+        if checkpointer is not None:
+            checkpointer.maybe_checkpoint(simulator.event_count)
+        t3 = time.perf_counter()
+
+        stage_s['generate'] += t1 - t0
+        stage_s['process'] += t2 - t1
+        stage_s['sink'] += t3 - t2
+        histogram.record((t3 - start) - scheduled)
+        emitted += size
+        batches += 1
+    elapsed = time.perf_counter() - start
+
+    busy_s = sum(stage_s.values())
+    latency = {f"p{q:g}": histogram.percentile(q) for q in (50, 95, 99, 99.9)}
+    latency['max'] = histogram.max
+    return {
+        'target_rate': rate,
+        'duration': duration,
+        'events': emitted,
+        'batches': batches,
+        'elapsed': elapsed,
+        'throughput': emitted / elapsed if elapsed else float('nan'),
+        'capacity': emitted / busy_s if busy_s else float('nan'),
+        'stage_s': stage_s,
+        'latency': latency,
+    }
+
+def print_load_report(report):
+    """Print a load report from run_load()"""
+    sustained = report['throughput'] >= 0.99 * report['target_rate']
+    print("=" * 60)
+    print("  STREAM LOAD TEST")
+    print("=" * 60)
+    print(f"  Target rate:      {report['target_rate']:,} events/s for {report['duration']:g} s")
+    print(f"  Events:           {report['events']:,} in {report['batches']:,} batches")
+    print(f"  Throughput:       {report['throughput']:,.0f} events/s "
+          f"({'sustained' if sustained else 'NOT sustained - latency grows'})")
+    print(f"  Capacity:         {report['capacity']:,.0f} events/s (events / busy time, one core)")
+    print("  Stage time:       " + " | ".join(f"{stage} {seconds:.2f} s" for stage, seconds in report['stage_s'].items()))
+    print("  Latency (scheduled → sink):")
+    print("    " + " | ".join(f"{name} {seconds * 1000:.2f} ms" for name, seconds in report['latency'].items()))
+    print("=" * 60)
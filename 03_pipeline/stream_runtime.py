@@ -0,0 +1,138 @@
+"""
+Stream Runtime - asyncio runtime for many independent sensors
+Every sensor is a lightweight task that emits on its own schedule (fixed
+interval, random phase) into one bounded asyncio.Queue. Consumer tasks take
+events off the queue in small batches, run process_event() and hand them to
+the sinks.
+
+A full queue suspends the sensor tasks in put() (backpressure) instead of
+growing memory; how long they were held up is reported. Everything runs on
+one event loop in one thread, so thousands of sensors cost one task each.
+"""
+
+import numpy as np
+import asyncio
+import time
+
+from stream_load import LatencyHistogram
+
+class AsyncStreamRuntime:
+    """
+    simulator   IoTStreamSimulator (sensors, generate_event, process_event)
+    sinks       objects with write_events(events) and poll()
+    interval    seconds between two events of the same sensor
+    queue_size  capacity of the sensor → consumer queue
+    consumers   consumer tasks draining the queue
+    batch_size  most events a consumer takes off the queue at once
+    """
+
+    def __init__(self, simulator, sinks, interval=5.0, queue_size=10_000, consumers=2, batch_size=256,
+                 poll_interval=0.1):
+        self.simulator = simulator
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.queue_size = queue_size
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.histogram = LatencyHistogram()
+        self.stats = {'produced': 0, 'consumed': 0, 'alerts': 0, 'max_depth': 0,
+                      'blocked_puts': 0, 'blocked_s': 0.0, 'late_s': 0.0}
+
+    # ---------- tasks ----------
+
+    async def sensor(self, queue, sensor, deadline):
+        """One sensor: an event every `interval` seconds until the deadline"""
+        loop = asyncio.get_running_loop()
+        # Phases come from the simulator's seeded generator, so a seeded run is reproducible
+        due = loop.time() + self.simulator.rng.uniform(0, self.interval)
+        while due < deadline:
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            now = loop.time()
+            self.stats['late_s'] = max(self.stats['late_s'], now - due)
+            event = self.simulator.generate_event(sensor)
+            if queue.full():
+                await queue.put((time.perf_counter(), event))
+                self.stats['blocked_puts'] += 1
+                self.stats['blocked_s'] += loop.time() - now
+            else:
+                queue.put_nowait((time.perf_counter(), event))
+            self.stats['produced'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], queue.qsize())
+            # Absolute schedule: a late event does not shift the following ones
+            due += self.interval
+
+    async def consumer(self, queue):
+        """Drain the queue in batches: process the events and hand the batch to every sink"""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            events = [self.simulator.process_event(event) for _, event in batch]
+            for sink in self.sinks:
+                sink.write_events(events)
+            self.stats['alerts'] += sum(event['alert_status'] == 'WARNING' for event in events)
+            done = time.perf_counter()
+            self.histogram.record(done - np.array([enqueued for enqueued, _ in batch]))
+            self.stats['consumed'] += len(batch)
+            for _ in batch:
+                queue.task_done()
+
+    async def poller(self):
+        """Time-based flushes of the sinks while the queue is quiet"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for sink in self.sinks:
+                sink.poll()
+
+    # ---------- run ----------
+
+    async def run(self, duration):
+        """Run every sensor for `duration` seconds, then drain the queue; returns the report dict"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        start = loop.time()
+        deadline = start + duration
+        workers = [asyncio.create_task(self.consumer(queue)) for _ in range(self.consumers)]
+        workers.append(asyncio.create_task(self.poller()))
+        try:
+            await asyncio.gather(*(self.sensor(queue, sensor, deadline) for sensor in self.simulator.sensors))
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        elapsed = loop.time() - start
+
+        latency = {f"p{q:g}": self.histogram.percentile(q) for q in (50, 95, 99, 99.9)}
+        latency['max'] = self.histogram.max
+        return {
+            'sensors': len(self.simulator.sensors),
+            'interval': self.interval,
+            'duration': duration,
+            'elapsed': elapsed,
+            'offered_rate': len(self.simulator.sensors) / self.interval,
+            'throughput': self.stats['consumed'] / elapsed if elapsed else float('nan'),
+            'queue_size': self.queue_size,
+            'consumers': self.consumers,
+            'stats': dict(self.stats),
+            'latency': latency,
+        }
+
+def print_runtime_report(report):
+    """Print a report from AsyncStreamRuntime.run()"""
+    stats = report['stats']
+    print("=" * 60)
+    print("  ASYNC STREAM RUNTIME")
+    print("=" * 60)
+    print(f"  Sensors:          {report['sensors']:,} tasks, one event every {report['interval']:g} s "
+          f"(offered {report['offered_rate']:,.0f} events/s)")
+    print(f"  Events:           {stats['produced']:,} produced, {stats['consumed']:,} consumed, "
+          f"{stats['alerts']:,} alerts in {report['elapsed']:.1f} s")
+    print(f"  Throughput:       {report['throughput']:,.0f} events/s ({report['consumers']} consumer task(s))")
+    print(f"  Queue:            max depth {stats['max_depth']:,} / {report['queue_size']:,}, "
+          f"{stats['blocked_puts']:,} blocked puts, {stats['blocked_s']:,.1f} sensor-s waiting (backpressure)")
+    print(f"  Schedule lag:     max {stats['late_s'] * 1000:.1f} ms behind a sensor's due time")
+    print("  Latency (queued → sinks):")
+    print("    " + " | ".join(f"{name} {seconds * 1000:.2f} ms" for name, seconds in report['latency'].items()))
+    print("=" * 60)
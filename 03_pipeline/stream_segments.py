@@ -0,0 +1,259 @@
+"""
+Stream Segments - columnar sink for stream events
+Buffers processed events as Arrow tables and rolls them into Parquet
+segment files of a hive-partitioned table (date_str=YYYY-MM-DD, the layout
+of bronze/sensor_data_partitioned), so stream data is read with the same
+projection and partition pruning as bronze.
+
+A segment is written under a '_' name (invisible to readers), renamed into
+place and committed to the table manifest. A background thread compacts
+partitions that collected many small segments into one file, swapping the
+partition directory like partition_writer does.
+
+At a checkpoint (stream_checkpoint.py) the buffer is rolled and the published
+files are recorded; restoring drops the rows written after it, found by their
+stream position (compaction may have merged them with older rows).
+"""
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import threading
+import os
+import time
+
+from partition_writer import partition_name, live_partitions, stage_partition, commit_partition, recover
+from table_manifest import commit
+
+PARTITION_COL = 'date_str'
+SEGMENT_PREFIX = 'seg-'
+COMPACTED_PREFIX = 'part-'
+
+def write_options(schema):
+    """
+    Parquet options for stream files: plain string columns (unique ids like
+    event_id) get DELTA_BYTE_ARRAY - shared prefixes, faster and smaller than
+    a dictionary that never repeats - everything else the default dictionary
+    """
+    plain = [field.name for field in schema if pa.types.is_string(field.type)]
+    return {
+        'compression': 'snappy',
+        'use_dictionary': [name for name in schema.names if name not in plain],
+        'column_encoding': {name: 'DELTA_BYTE_ARRAY' for name in plain},
+    }
+
+def _segment_files(partition_dir, prefix=SEGMENT_PREFIX):
+    """Published files of one partition with `prefix`, oldest first"""
+    return sorted(name for name in os.listdir(partition_dir)
+                  if name.startswith(prefix) and name.endswith('.parquet'))
+
+def compact_partition(base_path, value, lock, min_segments=4, target_rows=5_000_000):
+    """
+    Merge the segment files of one partition (and earlier compacted files
+    still below `target_rows`) into a single file. The merge runs outside the
+    lock; the swap (a new partition directory holding the merged file plus
+    links to segments written meanwhile) runs under it.
+    Returns the number of segments merged.
+    """
+    name = partition_name(PARTITION_COL, value)
+    live_dir = os.path.join(base_path, name)
+    segments = _segment_files(live_dir)
+    if len(segments) < min_segments:
+        return 0
+    small = [part for part in _segment_files(live_dir, COMPACTED_PREFIX)
+             if pq.ParquetFile(os.path.join(live_dir, part)).metadata.num_rows < target_rows]
+    inputs = small + segments
+    table = pa.concat_tables([pq.read_table(os.path.join(live_dir, entry)) for entry in inputs])
+    table = table.sort_by('timestamp')
+    merged_name = f"{COMPACTED_PREFIX}{segments[-1][len(SEGMENT_PREFIX):]}"
+
+    with lock:
+        staged_dir = stage_partition(base_path, name)
+        pq.write_table(table, os.path.join(staged_dir, merged_name), **write_options(table.schema))
+        for entry in os.listdir(live_dir):
+            if entry not in inputs and not entry.startswith('_'):
+                os.link(os.path.join(live_dir, entry), os.path.join(staged_dir, entry))
+        commit_partition(base_path, name, staged_dir)
+        commit(base_path, 'stream compact')
+    return len(segments)
+
+class ParquetSegmentSink:
+    """
+    Columnar stream sink.
+
+    to_table        batch → pyarrow Table (for write_batch)
+    schema          schema every segment is cast to (event dicts included)
+    segment_rows    roll the buffer into segment files at this many rows
+    roll_interval   ... or once this many seconds passed since the last roll
+    compact_interval seconds between background compaction passes (None = off)
+    min_segments    compact a partition once it has this many segments
+    target_rows     compacted files below this size are merged again
+    position_of     table → int64 array of stream positions (for restore)
+    """
+
+    def __init__(self, base_path, schema, to_table=None, segment_rows=500_000, roll_interval=10.0,
+                 compact_interval=30.0, min_segments=4, target_rows=2_000_000, position_of=None):
+        self.path = base_path
+        self.schema = schema
+        self.to_table = to_table
+        self.position_of = position_of
+        self.segment_rows = segment_rows
+        self.roll_interval = roll_interval
+        self.min_segments = min_segments
+        self.target_rows = target_rows
+
+        self.tables = []
+        self.rows = []
+        self.buffered_rows = 0
+        self.last_roll = time.monotonic()
+        self.sequence = 0
+        self.stats = {'events': 0, 'segments': 0, 'compactions': 0, 'merged': 0}
+        os.makedirs(base_path, exist_ok=True)
+
+        # Serialises segment publishing, compaction swaps and manifest commits
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.compactor = None
+        if compact_interval is not None:
+            self.compactor = threading.Thread(target=self._compact_loop, args=(compact_interval,), daemon=True)
+            self.compactor.start()
+
+    # ---------- writing ----------
+
+    def write(self, event):
+        """Buffer one event dict"""
+        self.rows.append(event)
+        self.buffered_rows += 1
+        self.stats['events'] += 1
+        self._maybe_roll()
+
+    def write_events(self, events):
+        """Buffer a list of event dicts"""
+        self.rows.extend(events)
+        self.buffered_rows += len(events)
+        self.stats['events'] += len(events)
+        self._maybe_roll()
+
+    def write_batch(self, batch):
+        """Buffer a batch (converted to Arrow by `to_table`)"""
+        table = self.to_table(batch) if self.to_table is not None else batch
+        self.tables.append(table)
+        self.buffered_rows += table.num_rows
+        self.stats['events'] += table.num_rows
+        self._maybe_roll()
+
+    def poll(self):
+        """Apply the time-based roll policy without writing (call from idle loops)"""
+        self._maybe_roll()
+
+    def _maybe_roll(self):
+        if self.buffered_rows >= self.segment_rows or \
+                (self.buffered_rows and time.monotonic() - self.last_roll >= self.roll_interval):
+            self.roll()
+
+    def _buffered_table(self):
+        tables = [table.cast(self.schema) for table in self.tables]
+        if self.rows:
+            # Event dicts carry ISO timestamps and plain strings: cast them to the schema
+            table = pa.Table.from_pylist(self.rows)
+            tables.append(table.select(self.schema.names).cast(self.schema))
+        return pa.concat_tables(tables)
+
+    def roll(self):
+        """Write the buffer as one segment per date partition and commit them"""
+        self.last_roll = time.monotonic()
+        if not self.buffered_rows:
+            return
+        table = self._buffered_table()
+        self.tables, self.rows, self.buffered_rows = [], [], 0
+
+        days = pc.cast(table['timestamp'], pa.date32())
+        with self.lock:
+            day_values = pc.unique(days).to_pylist()
+            for day in day_values:
+                part = table if len(day_values) == 1 else table.filter(pc.equal(days, day))
+                partition_dir = os.path.join(self.path, partition_name(PARTITION_COL, day.isoformat()))
+                os.makedirs(partition_dir, exist_ok=True)
+                name = f"{SEGMENT_PREFIX}{time.time_ns():020d}-{os.getpid()}-{self.sequence:06d}.parquet"
+                self.sequence += 1
+                # '_' names are skipped by readers until the rename publishes the segment
+                tmp_path = os.path.join(partition_dir, '_' + name)
+                pq.write_table(part, tmp_path, **write_options(part.schema))
+                os.replace(tmp_path, os.path.join(partition_dir, name))
+                self.stats['segments'] += 1
+            commit(self.path, 'stream append')
+
+    # ---------- compaction ----------
+
+    def compact(self):
+        """One compaction pass over every partition"""
+        for value in live_partitions(self.path, PARTITION_COL):
+            merged = compact_partition(self.path, value, self.lock, self.min_segments, self.target_rows)
+            if merged:
+                self.stats['compactions'] += 1
+                self.stats['merged'] += merged
+
+    def _compact_loop(self, interval):
+        while not self.stopped.wait(interval):
+            self.compact()
+
+    # ---------- checkpoints ----------
+
+    def _published_files(self):
+        return [os.path.join(partition_name(PARTITION_COL, value), name)
+                for value in live_partitions(self.path, PARTITION_COL)
+                for name in sorted(os.listdir(os.path.join(self.path, partition_name(PARTITION_COL, value))))
+                if name.endswith('.parquet') and not name.startswith('_')]
+
+    def snapshot(self):
+        """Roll the buffer; the state is the list of published files"""
+        self.roll()
+        with self.lock:
+            return {'files': self._published_files()}
+
+    def restore(self, state, position):
+        """
+        Drop every row at or after `position` from files published after the
+        checkpoint (state None = start of stream: every file)
+        """
+        if self.position_of is None:
+            raise ValueError("restoring a ParquetSegmentSink needs position_of")
+        self.tables, self.rows, self.buffered_rows = [], [], 0
+        checkpointed = set(state['files']) if state else set()
+        recover(self.path)
+        with self.lock:
+            for relative_path in self._published_files():
+                if relative_path in checkpointed:
+                    continue
+                path = os.path.join(self.path, relative_path)
+                table = pq.read_table(path)
+                keep = pc.less(self.position_of(table), position)
+                kept = pc.sum(keep).as_py() or 0
+                if kept == 0:
+                    os.remove(path)
+                elif kept < table.num_rows:
+                    part = table.filter(keep)
+                    tmp_path = os.path.join(os.path.dirname(path), '_' + os.path.basename(path))
+                    pq.write_table(part, tmp_path, **write_options(part.schema))
+                    os.replace(tmp_path, path)
+            for value in live_partitions(self.path, PARTITION_COL):
+                partition_dir = os.path.join(self.path, partition_name(PARTITION_COL, value))
+                for name in os.listdir(partition_dir):
+                    if name.startswith('_'):
+                        os.remove(os.path.join(partition_dir, name))  # segment never published
+            commit(self.path, 'stream recover')
+
+    def close(self):
+        """Roll what is buffered, stop the compactor and run a final compaction pass"""
+        self.roll()
+        if self.compactor is not None:
+            self.stopped.set()
+            self.compactor.join()
+            self.compactor = None
+            self.compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,233 @@
+"""
+Stream Sinks - buffered outputs for the streaming simulator
+JsonlSink keeps one long-lived file handle, collects serialised events in
+memory and writes them out by size / time policy, optionally fsyncs on a
+schedule and rolls over to size-bounded segment files.
+
+orjson is used as the encoder when it is installed (pip install orjson),
+the standard json module otherwise.
+"""
+
+import glob
+import json
+import os
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _encode_stdlib(event):
+    return json.dumps(event).encode('utf-8')
+
+def _encode_orjson(event):
+    return orjson.dumps(event)
+
+def event_encoder(prefer_fast=True):
+    """(name, function event dict → bytes) of the JSON encoder to use"""
+    if prefer_fast and orjson is not None:
+        return 'orjson', _encode_orjson
+    return 'json', _encode_stdlib
+
+class JsonlSink:
+    """
+    Buffered JSON Lines sink.
+
+    flush_bytes     write the buffer out once it holds this many bytes
+    flush_interval  ... or once this many seconds passed since the last flush
+                    (checked on every write and on poll())
+    fsync_interval  fsync after a flush at most every N seconds
+                    (None = never, 0 = every flush)
+    segment_bytes   start a new segment file once the current one reaches this
+                    size (None = one file at `path`; a flush is never split
+                    across segments); segments are named
+                    <stem>.000001.jsonl, <stem>.000002.jsonl, ...
+    render          batch → list of event dicts, for write_batch()
+
+    snapshot() / restore() make it a checkpointed sink (see stream_checkpoint.py):
+    the offset is the current segment and its size, restoring truncates.
+    """
+
+    def __init__(self, path, flush_bytes=1 << 20, flush_interval=1.0, fsync_interval=None,
+                 segment_bytes=None, render=None, prefer_fast=True):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.render = render
+        self.encoder_name, self.encode = event_encoder(prefer_fast)
+
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.stats = {'events': 0, 'bytes': 0, 'flushes': 0, 'fsyncs': 0, 'segments': 0}
+        self.last_flush = self.last_fsync = time.monotonic()
+        self.unsynced = False
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.segment = max([self._segment_number(p) for p in self.paths()], default=1)
+        # Opened on the first flush and kept open until close()
+        self.file = None
+        self.segment_size = 0
+
+    # ---------- segments ----------
+
+    def _segment_path(self, segment):
+        if self.segment_bytes is None:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{segment:06d}{ext}"
+
+    def _segment_number(self, path):
+        return int(path.rsplit('.', 2)[-2]) if self.segment_bytes is not None else 1
+
+    def paths(self):
+        """Files written by this sink (all segments, in order)"""
+        if self.segment_bytes is None:
+            return [self.path] if os.path.exists(self.path) else []
+        stem, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{glob.escape(stem)}.[0-9][0-9][0-9][0-9][0-9][0-9]{ext}"))
+
+    def _open(self):
+        self.file = open(self._segment_path(self.segment), 'ab')
+        self.segment_size = self.file.tell()
+        self.stats['segments'] += 1
+
+    def _roll_over(self):
+        if self.fsync_interval is not None:
+            self._sync(force=True)
+        self.file.close()
+        self.file = None
+        self.segment += 1
+
+    # ---------- writing ----------
+
+    def write(self, event):
+        """Buffer one event dict"""
+        line = self.encode(event) + b'\n'
+        self.buffer.append(line)
+        self.buffered_bytes += len(line)
+        self.stats['events'] += 1
+        self._maybe_flush()
+
+    def write_events(self, events):
+        """Buffer a list of event dicts"""
+        chunk = b'\n'.join(map(self.encode, events)) + b'\n' if events else b''
+        self.buffer.append(chunk)
+        self.buffered_bytes += len(chunk)
+        self.stats['events'] += len(events)
+        self._maybe_flush()
+
+    def write_batch(self, batch):
+        """Buffer a batch (rendered to event dicts by `render`)"""
+        self.write_events(self.render(batch) if self.render is not None else batch)
+
+    def poll(self):
+        """Apply the time-based flush policy without writing (call from idle loops)"""
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if self.buffered_bytes >= self.flush_bytes or \
+                (self.buffer and time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the buffer to the current segment (rolling over when it is full)"""
+        if self.buffer:
+            if self.file is None:
+                self._open()
+            data = b''.join(self.buffer)
+            self.buffer, self.buffered_bytes = [], 0
+            self.file.write(data)
+            self.file.flush()
+            self.segment_size += len(data)
+            self.stats['bytes'] += len(data)
+            self.stats['flushes'] += 1
+            self.unsynced = True
+        self.last_flush = time.monotonic()
+        self._sync()
+        if self.segment_bytes is not None and self.file is not None and self.segment_size >= self.segment_bytes:
+            self._roll_over()
+
+    def _sync(self, force=False):
+        if not self.unsynced or (self.fsync_interval is None and not force):
+            return
+        if force or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+            self.unsynced = False
+            self.stats['fsyncs'] += 1
+
+    # ---------- checkpoints ----------
+
+    def snapshot(self):
+        """Flush and fsync; the state is the current segment and its size"""
+        self.flush()
+        if self.file is not None:
+            self._sync(force=True)
+        path = self._segment_path(self.segment)
+        return {'segment': self.segment, 'size': os.path.getsize(path) if os.path.exists(path) else 0}
+
+    def restore(self, state, position):
+        """
+        Cut off everything written after the checkpoint: later segments are
+        removed, the checkpoint's segment truncated (state None = start of stream)
+        """
+        state = state or {'segment': 1, 'size': 0}
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.buffer, self.buffered_bytes = [], 0
+        for path in self.paths():
+            if self._segment_number(path) > state['segment']:
+                os.remove(path)
+        path = self._segment_path(state['segment'])
+        if os.path.exists(path):
+            os.truncate(path, state['size'])
+        self.segment = state['segment']
+
+    def close(self):
+        """Flush, sync and close the current segment"""
+        self.flush()
+        if self.file is not None:
+            if self.fsync_interval is not None:
+                self._sync(force=True)
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TeeSink:
+    """Hands every event / batch to each of `sinks` in turn"""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    @property
+    def path(self):
+        return ', '.join(sink.path for sink in self.sinks if hasattr(sink, 'path'))
+
+    def write(self, event):
+        for sink in self.sinks:
+            sink.write(event)
+
+    def write_events(self, events):
+        for sink in self.sinks:
+            sink.write_events(events)
+
+    def write_batch(self, batch):
+        for sink in self.sinks:
+            sink.write_batch(batch)
+
+    def poll(self):
+        for sink in self.sinks:
+            sink.poll()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
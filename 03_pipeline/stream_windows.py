@@ -0,0 +1,328 @@
+"""
+Stream Windows - incremental event-time window aggregation per room
+Replaces the micro-batch CSVs: every window keeps running count / sum /
+min / max per room and metric in NumPy arrays, and each closed window is
+appended as one row per room to a Parquet table (part files published on
+close and at every checkpoint, see stream_checkpoint.py).
+
+Windows
+  tumbling  fixed, non-overlapping [start, start + size)
+  sliding   size `size`, a new window every `slide` (an event is in size/slide windows)
+  session   per room, closed after `gap` seconds without events
+
+Time is event time. The watermark trails the largest timestamp seen by
+`max_delay` seconds; a window is final and emitted once the watermark passes
+its end plus `allowed_lateness`. Events for windows already emitted are
+late: they are counted and dropped.
+"""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import numpy as np
+import bisect
+import os
+
+from stream_checkpoint import CheckpointedOperator
+from table_manifest import commit
+
+WINDOW_METRICS = ['temperature', 'humidity', 'co2_ppm', 'occupancy_count']
+NS = 1_000_000_000
+
+def reduce_cells(cell, values):
+    """Per distinct cell id: (cells, count, sum, min, max) of the value rows"""
+    order = np.argsort(cell, kind='stable')
+    cell, values = cell[order], values[order]
+    starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+    count = np.diff(np.r_[starts, len(cell)])
+    return (cell[starts], count, np.add.reduceat(values, starts, axis=0),
+            np.minimum.reduceat(values, starts, axis=0), np.maximum.reduceat(values, starts, axis=0))
+
+# ==================== OUTPUT ====================
+
+class WindowOutput:
+    """
+    Closed windows → a Parquet table directory. Rows are buffered as column
+    arrays and written as row groups of `flush_rows` to a part file under a
+    '_' name, published (rename + manifest commit) on close() and snapshot().
+    A fresh output replaces the parts of an earlier run on its first publish;
+    a restored one keeps the parts of its checkpoint.
+    """
+    commit_message = 'stream windows'
+
+    def __init__(self, path, room_ids, metrics=WINDOW_METRICS, flush_rows=10_000):
+        self.path = path
+        self.room_ids = np.array(room_ids, dtype=object)
+        self.metrics = metrics
+        self.flush_rows = flush_rows
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+        self.writer = None
+        self.parts = 0
+        self.resumed = False
+
+    def append(self, kind, start_ns, end_ns, room_idx, count, sums, mins, maxs):
+        """Buffer the rows of closed windows (one per room with events)"""
+        count = np.asarray(count, dtype=np.int64)
+        columns = {
+            'window_kind': np.full(len(room_idx), kind, dtype=object),
+            'window_start': np.asarray(start_ns, dtype=np.int64).astype('datetime64[ns]'),
+            'window_end': np.asarray(end_ns, dtype=np.int64).astype('datetime64[ns]'),
+            'room_id': self.room_ids[room_idx],
+            'event_count': count,
+        }
+        for j, metric in enumerate(self.metrics):
+            columns[f'{metric}_sum'] = sums[:, j]
+            columns[f'{metric}_min'] = mins[:, j]
+            columns[f'{metric}_max'] = maxs[:, j]
+            columns[f'{metric}_mean'] = np.round(sums[:, j] / count, 2)
+        self.pending.append(columns)
+        self.pending_rows += len(room_idx)
+        if self.pending_rows >= self.flush_rows:
+            self.flush()
+
+    def _part_path(self, part):
+        return os.path.join(self.path, f"part-{part:06d}.parquet")
+
+    def _part_numbers(self):
+        return sorted(int(name[len('part-'):-len('.parquet')]) for name in os.listdir(self.path)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    def flush(self):
+        """Write the buffered rows as one row group"""
+        if not self.pending:
+            return
+        table = pa.table({name: np.concatenate([part[name] for part in self.pending])
+                          for name in self.pending[0]})
+        if self.writer is None:
+            if os.path.isfile(self.path):
+                os.remove(self.path)  # single-file layout of earlier versions
+            os.makedirs(self.path, exist_ok=True)
+            # '_' names are skipped by readers until the part is published
+            self.writer = pq.ParquetWriter(os.path.join(self.path, '_pending.parquet'), table.schema,
+                                           compression='snappy')
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+        self.pending, self.pending_rows = [], 0
+
+    def publish(self):
+        """Write what is left and publish it as the next part file"""
+        self.flush()
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        if not self.resumed:
+            for part in self._part_numbers():
+                os.remove(self._part_path(part))
+            self.resumed = True
+        self.parts += 1
+        os.replace(os.path.join(self.path, '_pending.parquet'), self._part_path(self.parts))
+        commit(self.path, self.commit_message)
+
+    def close(self):
+        self.publish()
+
+    # ---------- checkpoints ----------
+
+    def snapshot(self):
+        """Publish the rows so far; the state is the number of parts"""
+        self.publish()
+        return {'parts': self.parts, 'rows': self.rows}
+
+    def restore(self, state, position):
+        """Drop parts (and the pending file) written after the checkpoint (state None = every part)"""
+        state = state or {'parts': 0, 'rows': 0}
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.pending, self.pending_rows = [], 0
+        self.parts, self.rows, self.resumed = state['parts'], state['rows'], True
+        if os.path.isdir(self.path):
+            for part in self._part_numbers():
+                if part > self.parts:
+                    os.remove(self._part_path(part))
+            if os.path.exists(os.path.join(self.path, '_pending.parquet')):
+                os.remove(os.path.join(self.path, '_pending.parquet'))
+            commit(self.path, 'stream recover')
+
+# ==================== AGGREGATORS ====================
+
+class WindowAggregator(CheckpointedOperator):
+    """
+    Watermark, lateness and output shared by the window kinds. Used like a
+    sink: write(event) / write_batch(batch) return the number of windows closed.
+    """
+    kind = None
+
+    def __init__(self, room_ids, output=None, max_delay=5.0, allowed_lateness=0.0, metrics=WINDOW_METRICS):
+        self.room_ids = list(room_ids)
+        self.room_index = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.output = output
+        self.metrics = metrics
+        self.max_delay_ns = int(max_delay * NS)
+        self.lateness_ns = int(allowed_lateness * NS)
+        self.max_event_ns = None
+        self.stats = {'events': 0, 'late': 0, 'windows': 0, 'rows': 0}
+
+    @property
+    def watermark_ns(self):
+        """Event time up to which all events are assumed to have arrived"""
+        if self.max_event_ns is None:
+            return np.iinfo(np.int64).min
+        return self.max_event_ns - self.max_delay_ns
+
+    def closed_before_ns(self):
+        """Windows ending at or before this time are final (emitted)"""
+        return self.watermark_ns - self.lateness_ns if self.max_event_ns is not None else np.iinfo(np.int64).min
+
+    def write(self, event):
+        """Add one event dict (timestamp ISO string, room_id, metric fields)"""
+        return self.write_events([event])
+
+    def write_events(self, events):
+        """Add a list of event dicts"""
+        return self.write_batch({
+            'timestamp': np.array([event['timestamp'] for event in events], dtype='datetime64[ns]'),
+            'room_idx': np.array([self.room_index[event['room_id']] for event in events], dtype=np.int64),
+            **{metric: np.array([event[metric] for event in events], dtype=np.float64) for metric in self.metrics},
+        })
+
+    def write_batch(self, batch):
+        """Add a batch of columns (timestamp, room_idx, metrics) and emit the windows it closes"""
+        timestamps = batch['timestamp'].astype('datetime64[ns]').astype(np.int64)
+        if len(timestamps) == 0:
+            return 0
+        values = np.column_stack([batch[metric] for metric in self.metrics]).astype(np.float64)
+        self.stats['events'] += len(timestamps)
+        self._add(timestamps, np.asarray(batch['room_idx'], dtype=np.int64), values)
+        latest = int(timestamps.max())
+        self.max_event_ns = latest if self.max_event_ns is None else max(self.max_event_ns, latest)
+        return self._emit(self.closed_before_ns())
+
+    def poll(self):
+        pass
+
+    def close(self):
+        """End of stream: emit every open window and close the output"""
+        closed = self._emit(np.iinfo(np.int64).max)
+        if self.output is not None:
+            self.output.close()
+        return closed
+
+    def _append(self, start_ns, end_ns, room_idx, count, sums, mins, maxs):
+        self.stats['rows'] += len(room_idx)
+        if self.output is not None:
+            self.output.append(self.kind, start_ns, end_ns, room_idx, count, sums, mins, maxs)
+
+class SlidingWindows(WindowAggregator):
+    """Tumbling (slide == size) and sliding windows aligned to the epoch"""
+
+    def __init__(self, room_ids, size, slide=None, **kwargs):
+        super().__init__(room_ids, **kwargs)
+        self.size_ns = int(size * NS)
+        self.slide_ns = int((slide or size) * NS)
+        self.kind = 'tumbling' if self.slide_ns == self.size_ns else 'sliding'
+        self.per_event = -(-self.size_ns // self.slide_ns)
+        # window start → [count (rooms,), sum / min / max (rooms, metrics)]
+        self.windows = {}
+
+    def _add(self, timestamps, room_idx, values):
+        # Candidate window starts of every event: the last `per_event` slide boundaries
+        starts = timestamps // self.slide_ns * self.slide_ns - \
+            np.arange(self.per_event, dtype=np.int64)[:, None] * self.slide_ns
+        member = starts > timestamps - self.size_ns
+        is_open = member & (starts + self.size_ns > self.closed_before_ns())
+        self.stats['late'] += int((~is_open.any(axis=0)).sum())
+        k, e = np.nonzero(is_open)
+        if len(e) == 0:
+            return
+        window_starts, window_idx = np.unique(starts[k, e], return_inverse=True)
+        n_rooms = len(self.room_ids)
+        cells, count, sums, mins, maxs = reduce_cells(window_idx * n_rooms + room_idx[e], values[e])
+        for i, start in enumerate(window_starts.tolist()):
+            lo, hi = np.searchsorted(cells, [i * n_rooms, (i + 1) * n_rooms])
+            rooms = cells[lo:hi] - i * n_rooms
+            state = self.windows.get(start)
+            if state is None:
+                m = len(self.metrics)
+                state = self.windows[start] = [np.zeros(n_rooms, dtype=np.int64), np.zeros((n_rooms, m)),
+                                               np.full((n_rooms, m), np.inf), np.full((n_rooms, m), -np.inf)]
+            state[0][rooms] += count[lo:hi]
+            state[1][rooms] += sums[lo:hi]
+            state[2][rooms] = np.minimum(state[2][rooms], mins[lo:hi])
+            state[3][rooms] = np.maximum(state[3][rooms], maxs[lo:hi])
+
+    def _emit(self, threshold_ns):
+        ready = sorted(start for start in self.windows if start + self.size_ns <= threshold_ns)
+        for start in ready:
+            count, sums, mins, maxs = self.windows.pop(start)
+            rooms = np.flatnonzero(count)
+            self._append(np.full(len(rooms), start), np.full(len(rooms), start + self.size_ns),
+                         rooms, count[rooms], sums[rooms], mins[rooms], maxs[rooms])
+        self.stats['windows'] += len(ready)
+        return len(ready)
+
+class SessionWindows(WindowAggregator):
+    """Per-room sessions: events less than `gap` seconds apart belong to one window"""
+    kind = 'session'
+
+    def __init__(self, room_ids, gap, **kwargs):
+        super().__init__(room_ids, **kwargs)
+        self.gap_ns = int(gap * NS)
+        # Per room: open sessions sorted by start, [first_ns, last_ns, count, sum, min, max]
+        self.sessions = [[] for _ in self.room_ids]
+
+    def _add(self, timestamps, room_idx, values):
+        on_time = timestamps + self.gap_ns > self.closed_before_ns()
+        self.stats['late'] += int((~on_time).sum())
+        order = np.lexsort((timestamps, room_idx))
+        order = order[on_time[order]]
+        timestamps, room_idx, values = timestamps[order], room_idx[order], values[order]
+        # Segments: runs of one room without a gap longer than `gap` inside the batch
+        breaks = np.r_[True, (room_idx[1:] != room_idx[:-1]) | (np.diff(timestamps) > self.gap_ns)]
+        segment = np.cumsum(breaks) - 1
+        if len(segment) == 0:
+            return
+        firsts = np.flatnonzero(breaks)
+        lasts = np.r_[firsts[1:], len(timestamps)] - 1
+        _, count, sums, mins, maxs = reduce_cells(segment, values)
+        for i in range(len(firsts)):
+            self._merge(self.sessions[room_idx[firsts[i]]],
+                        [int(timestamps[firsts[i]]), int(timestamps[lasts[i]]), int(count[i]), sums[i], mins[i], maxs[i]])
+
+    def _merge(self, sessions, new):
+        """Insert a segment into a room's sessions, merging every session within `gap` of it"""
+        # Sessions are disjoint and sorted, so the ones to merge are a contiguous run
+        lo = bisect.bisect_left(sessions, new[0] - self.gap_ns, key=lambda session: session[1])
+        hi = bisect.bisect_right(sessions, new[1] + self.gap_ns, key=lambda session: session[0])
+        for session in sessions[lo:hi]:
+            new = [min(session[0], new[0]), max(session[1], new[1]), session[2] + new[2],
+                   session[3] + new[3], np.minimum(session[4], new[4]), np.maximum(session[5], new[5])]
+        sessions[lo:hi] = [new]
+
+    def _emit(self, threshold_ns):
+        closed = 0
+        for room, sessions in enumerate(self.sessions):
+            # Closed sessions are a prefix (sorted by start, so by last event too)
+            n_ready = bisect.bisect_right(sessions, threshold_ns - self.gap_ns, key=lambda session: session[1])
+            if not n_ready:
+                continue
+            ready = sessions[:n_ready]
+            del sessions[:n_ready]
+            self._append([s[0] for s in ready], [s[1] + self.gap_ns for s in ready], np.full(len(ready), room),
+                         [s[2] for s in ready], np.array([s[3] for s in ready]),
+                         np.array([s[4] for s in ready]), np.array([s[5] for s in ready]))
+            closed += len(ready)
+        self.stats['windows'] += closed
+        return closed
+
+def make_windows(kind, room_ids, size=60.0, slide=None, gap=30.0, **kwargs):
+    """Window aggregator by name: 'tumbling', 'sliding' or 'session'"""
+    if kind == 'tumbling':
+        return SlidingWindows(room_ids, size, **kwargs)
+    if kind == 'sliding':
+        return SlidingWindows(room_ids, size, slide or size / 2, **kwargs)
+    if kind == 'session':
+        return SessionWindows(room_ids, gap, **kwargs)
+    raise ValueError(f"unknown window kind: {kind}")
@@ -1,54 +1,170 @@
 """
 Streaming Simulation - Real-time IoT Sensor Events
 Simulates sensor data arriving every 5-10 seconds
+
+Besides the paced demo (one event per interval) the same stages run on
+vectorized batches: generate_batch() → process_batch() → a sink's
+write_batch(). A batch is a dict of NumPy columns; labels (alert status,
+thermal comfort, air quality) are small integer codes until a sink renders
+them. See stream_load.py for the load-generation mode and stream_runtime.py
+for the asyncio runtime (every sensor an independent producer task).
+
+Every event also feeds an event-time window aggregator (stream_windows.py);
+closed windows are appended to one Parquet file. Events themselves go to the
+JSONL sink and/or the columnar sink (stream_segments.py: date-partitioned
+Parquet segments, compacted in the background), which the analysis reads.
+With --gold they are also committed to the gold star schema every few
+seconds (stream_gold.py), using the rooms of dim_room. --anomaly adds the
+per-sensor anomaly operator (stream_anomaly.py: EWMA z-score, rate of change,
+stuck sensor) next to the fixed thresholds. --checkpoint takes periodic
+checkpoints and resumes from the last one after a crash (stream_checkpoint.py),
+also with --gold; not with --runtime async.
+
+Usage:
+  python 03_pipeline/streaming_simulation.py                          paced demo (50 events, 5s)
+  python 03_pipeline/streaming_simulation.py --load --rate 100000     load test
+  python 03_pipeline/streaming_simulation.py --runtime async --sensors-per-room 1000 --interval 1 --duration 10
 """
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
+import argparse
 import time
 import os
-import json
+
+from stream_sinks import JsonlSink, TeeSink
+from stream_segments import ParquetSegmentSink
+from stream_windows import WindowOutput, make_windows
+from stream_anomaly import AnomalyDetector, AlertOutput
+from stream_checkpoint import Checkpointer
+
+EVENTS_PATH = '02_data/stream_output/streaming_events.jsonl'
+EVENTS_TABLE_PATH = '02_data/stream_output/stream_events'
+WINDOWS_PATH = '02_data/stream_output/window_aggregates.parquet'
+ANOMALIES_PATH = '02_data/stream_output/anomaly_alerts.parquet'
+SENSOR_TYPE = 'DHT22'
+
+# Label tables of the coded batch columns (code = list index)
+ALERT_STATUS_LABELS = ['NORMAL', 'WARNING']
+THERMAL_COMFORT_LABELS = ['Comfortable', 'Too Hot', 'Acceptable']
+AIR_QUALITY_LABELS = ['Excellent', 'Good', 'Moderate']
+ALERT_FLAGS = [('HIGH_TEMP', 1), ('HIGH_CO2', 2)]
+
+# Columnar event schema: labels and ids dictionary-encoded
+_LABEL = pa.dictionary(pa.int32(), pa.string())
+STREAM_SCHEMA = pa.schema([
+    ('event_id', pa.string()),
+    ('timestamp', pa.timestamp('ns')),
+    ('sensor_id', _LABEL),
+    ('room_id', _LABEL),
+    ('building', _LABEL),
+    ('temperature', pa.float64()),
+    ('humidity', pa.float64()),
+    ('co2_ppm', pa.int64()),
+    ('occupancy_count', pa.int64()),
+    ('occupancy_pct', pa.float64()),
+    ('alert_status', _LABEL),
+    ('alert_details', _LABEL),
+    ('processed_at', pa.timestamp('ns')),
+    ('thermal_comfort', _LABEL),
+    ('air_quality', _LABEL),
+])
+
+def event_position(table):
+    """Event counter value of every row of an event table, from event_id (EVT_000123 → 123)"""
+    return pc.cast(pc.utf8_slice_codeunits(table['event_id'], len('EVT_')), pa.int64())
 
 class IoTStreamSimulator:
-    def __init__(self, interval_seconds=5, max_events=100):
+    def __init__(self, interval_seconds=5, max_events=100, sensors_per_room=1, seed=None, sink=None, windows=None,
+                 rooms=None, anomalies=None):
         self.interval = interval_seconds
         self.max_events = max_events
         self.event_count = 0
-        self.stream_buffer = []
+        self.rng = np.random.default_rng(seed)
         
         # Setup output directory
         os.makedirs('02_data/stream_output', exist_ok=True)
         
-        # Rooms configuration
-        self.rooms = [
+        # Rooms configuration (demo rooms unless given, e.g. the gold dim_room rooms)
+        self.rooms = rooms or [
             {'room_id': 'LAB_A101', 'building': 'Gedung A', 'capacity': 40},
             {'room_id': 'LAB_A201', 'building': 'Gedung A', 'capacity': 35},
             {'room_id': 'KELAS_B101', 'building': 'Gedung B', 'capacity': 50},
         ]
+        self.set_sensors(sensors_per_room)
+        
+        # Event sink: one long-lived, buffered handle instead of open/append per event
+        self.sink = sink if sink is not None else JsonlSink(EVENTS_PATH, render=self.batch_to_records)
+        
+        # Per-room window aggregates (tumbling 60 s unless given)
+        self.windows = windows if windows is not None else self.make_windows('tumbling')
+        
+        # Per-sensor anomaly operator (off unless given, see make_anomaly_detector)
+        self.anomalies = anomalies
+        
+        # Periodic checkpoints (off unless set, see stream_checkpoint.py)
+        self.checkpointer = None
+    
+    def make_windows(self, kind, **kwargs):
+        """Window aggregator over this simulator's rooms, writing to WINDOWS_PATH"""
+        room_ids = [room['room_id'] for room in self.rooms]
+        return make_windows(kind, room_ids, output=WindowOutput(WINDOWS_PATH, room_ids), **kwargs)
+    
+    def make_anomaly_detector(self, **kwargs):
+        """Anomaly operator over this simulator's sensors, writing alerts to ANOMALIES_PATH"""
+        sensor_ids = [sensor['sensor_id'] for sensor in self.sensors]
+        return AnomalyDetector(sensor_ids, output=AlertOutput(ANOMALIES_PATH, sensor_ids), **kwargs)
+    
+    def set_sensors(self, sensors_per_room=1):
+        """(Re)build the sensor list: `sensors_per_room` sensors in every room"""
+        self.sensors = [
+            {'sensor_id': f"SENS_{room['room_id']}_{SENSOR_TYPE}_{i:02d}", 'room': r}
+            for r, room in enumerate(self.rooms) for i in range(1, sensors_per_room + 1)
+        ]
+        # Column lookups for the batch path (sensor index → room index → attributes)
+        self.sensor_room = np.array([sensor['room'] for sensor in self.sensors], dtype=np.int32)
+        self.room_capacity = np.array([room['capacity'] for room in self.rooms], dtype=np.int64)
+    
+    def snapshot(self):
+        """Source state for a checkpoint: the event counter and the RNG replay from here"""
+        return {'event_count': self.event_count, 'rng': self.rng.bit_generator.state,
+                'sensors': [sensor['sensor_id'] for sensor in self.sensors]}
     
-    def generate_event(self):
-        """Generate a single sensor event"""
+    def restore(self, state, position):
+        if state is not None:
+            if state['sensors'] != [sensor['sensor_id'] for sensor in self.sensors]:
+                raise ValueError(f"checkpoint was taken with {len(state['sensors']):,} other sensors "
+                                 f"(resume with the same rooms / --sensors-per-room, or remove it to start over)")
+            self.event_count = state['event_count']
+            self.rng.bit_generator.state = state['rng']
+    
+    def generate_event(self, sensor=None):
+        """Generate a single sensor event (from `sensor`, or a random one)"""
         timestamp = datetime.now()
         hour = timestamp.hour
         
-        # Select random room
-        room = self.rooms[np.random.randint(0, len(self.rooms))]
+        # Select random sensor (and its room)
+        if sensor is None:
+            sensor = self.sensors[self.rng.integers(0, len(self.sensors))]
+        room = self.rooms[sensor['room']]
         
         # Generate realistic values
         is_class_hour = 8 <= hour <= 16
         
         if is_class_hour:
-            occupancy_pct = np.random.uniform(0.5, 0.9)
+            occupancy_pct = self.rng.uniform(0.5, 0.9)
             base_temp = 27.0
         else:
-            occupancy_pct = np.random.uniform(0, 0.2)
+            occupancy_pct = self.rng.uniform(0, 0.2)
             base_temp = 24.0
         
         occupancy_count = int(room['capacity'] * occupancy_pct)
-        temperature = base_temp + (occupancy_count * 0.1) + np.random.normal(0, 0.5)
-        humidity = 70 - (temperature - 25) * 1.5 + np.random.normal(0, 2)
-        co2 = 420 + (occupancy_count * 30) + np.random.normal(0, 40)
+        temperature = base_temp + (occupancy_count * 0.1) + self.rng.normal(0, 0.5)
+        humidity = 70 - (temperature - 25) * 1.5 + self.rng.normal(0, 2)
+        co2 = 420 + (occupancy_count * 30) + self.rng.normal(0, 40)
         
         # Alerts
         alerts = []
@@ -60,6 +176,7 @@ class IoTStreamSimulator:
         event = {
             'event_id': f"EVT_{self.event_count:06d}",
             'timestamp': timestamp.isoformat(),
+            'sensor_id': sensor['sensor_id'],
             'room_id': room['room_id'],
             'building': room['building'],
             'temperature': round(temperature, 2),
@@ -103,47 +220,131 @@ class IoTStreamSimulator:
         
         return event
     
-    def write_to_sink(self, event):
-        """Write processed event to output (simulates sink)"""
-        # Append to JSON Lines file (common streaming format)
-        output_file = '02_data/stream_output/streaming_events.jsonl'
-        with open(output_file, 'a') as f:
-            f.write(json.dumps(event) + '\n')
-        
-        # Also add to buffer for batch micro-aggregation
-        self.stream_buffer.append(event)
-        
-        # Every 10 events, create a micro-batch
-        if len(self.stream_buffer) >= 10:
-            self.create_microbatch()
-    
-    def create_microbatch(self):
-        """Create micro-batch from buffer (simulates mini aggregation)"""
-        if not self.stream_buffer:
-            return
+    def generate_batch(self, size, timestamps=None):
+        """
+        Vectorized generate_event(): `size` events from random sensors as a
+        dict of columns. `timestamps` (datetime64 array) defaults to now.
+        """
+        if timestamps is None:
+            timestamps = np.full(size, np.datetime64(datetime.now(), 'ns'))
+        hour = (timestamps.astype('datetime64[h]').astype(np.int64) % 24)
+        sensor_idx = self.rng.integers(0, len(self.sensors), size, dtype=np.int32)
+        room_idx = self.sensor_room[sensor_idx]
+        capacity = self.room_capacity[room_idx]
         
-        df = pd.DataFrame(self.stream_buffer)
+        is_class_hour = (hour >= 8) & (hour <= 16)
+        occupancy_pct = np.where(is_class_hour, self.rng.uniform(0.5, 0.9, size), self.rng.uniform(0, 0.2, size))
+        base_temp = np.where(is_class_hour, 27.0, 24.0)
         
-        # Micro-aggregation by room
-        agg = df.groupby('room_id').agg({
-            'temperature': 'mean',
-            'humidity': 'mean',
-            'co2_ppm': 'mean',
-            'occupancy_count': 'mean'
-        }).round(2)
+        occupancy_count = (capacity * occupancy_pct).astype(np.int64)
+        temperature = base_temp + (occupancy_count * 0.1) + self.rng.normal(0, 0.5, size)
+        humidity = 70 - (temperature - 25) * 1.5 + self.rng.normal(0, 2, size)
+        co2 = 420 + (occupancy_count * 30) + self.rng.normal(0, 40, size)
         
-        agg['window_start'] = df['timestamp'].min()
-        agg['window_end'] = df['timestamp'].max()
-        agg['event_count'] = df.groupby('room_id').size()
+        alert_flags = np.where(temperature > 29, 1, 0) | np.where(co2 > 1200, 2, 0)
         
-        # Save micro-batch
-        batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-        agg.to_csv(f'02_data/stream_output/microbatch_{batch_id}.csv')
+        batch = {
+            'event_seq': np.arange(self.event_count, self.event_count + size, dtype=np.int64),
+            'timestamp': timestamps,
+            'sensor_idx': sensor_idx,
+            'room_idx': room_idx,
+            'temperature': np.round(temperature, 2),
+            'humidity': np.round(humidity, 2),
+            'co2_ppm': co2.astype(np.int64),
+            'occupancy_count': occupancy_count,
+            'occupancy_pct': np.round(occupancy_pct * 100, 1),
+            'alert_flags': alert_flags.astype(np.uint8),
+        }
+        self.event_count += size
+        return batch
+    
+    def process_batch(self, batch):
+        """Vectorized process_event(): adds processed_at and the coded comfort / air quality columns"""
+        temp, humid, co2 = batch['temperature'], batch['humidity'], batch['co2_ppm']
+        batch['processed_at'] = np.datetime64(datetime.now(), 'ns')
+        comfortable = (temp >= 22) & (temp <= 26) & (humid >= 40) & (humid <= 60)
+        batch['thermal_comfort'] = np.where(comfortable, 0, np.where(temp > 28, 1, 2)).astype(np.uint8)
+        batch['air_quality'] = np.searchsorted([800, 1200], co2, side='right').astype(np.uint8)
+        return batch
+    
+    def batch_to_records(self, batch):
+        """Render a batch as event dicts, field for field like the per-event path"""
+        size = len(batch['event_seq'])
+        sensor_ids = np.array([sensor['sensor_id'] for sensor in self.sensors], dtype=object)
+        room_ids = np.array([room['room_id'] for room in self.rooms], dtype=object)
+        buildings = np.array([room['building'] for room in self.rooms], dtype=object)
+        details = np.array([','.join(name for name, bit in ALERT_FLAGS if flags & bit) or None
+                            for flags in range(4)], dtype=object)
+        room_idx = batch['room_idx']
+        columns = {
+            'event_id': [f"EVT_{seq:06d}" for seq in batch['event_seq'].tolist()],
+            'timestamp': np.datetime_as_string(batch['timestamp'], unit='us').tolist(),
+            'sensor_id': sensor_ids[batch['sensor_idx']].tolist(),
+            'room_id': room_ids[room_idx].tolist(),
+            'building': buildings[room_idx].tolist(),
+            'temperature': batch['temperature'].tolist(),
+            'humidity': batch['humidity'].tolist(),
+            'co2_ppm': batch['co2_ppm'].tolist(),
+            'occupancy_count': batch['occupancy_count'].tolist(),
+            'occupancy_pct': batch['occupancy_pct'].tolist(),
+            'alert_status': np.array(ALERT_STATUS_LABELS, dtype=object)[(batch['alert_flags'] > 0).astype(int)].tolist(),
+            'alert_details': details[batch['alert_flags']].tolist(),
+        }
+        if 'thermal_comfort' in batch:
+            columns['processed_at'] = [np.datetime_as_string(batch['processed_at'], unit='us')] * size
+            columns['thermal_comfort'] = np.array(THERMAL_COMFORT_LABELS, dtype=object)[batch['thermal_comfort']].tolist()
+            columns['air_quality'] = np.array(AIR_QUALITY_LABELS, dtype=object)[batch['air_quality']].tolist()
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+    
+    def batch_to_table(self, batch):
+        """Arrow table of a processed batch in STREAM_SCHEMA (labels stay integer codes)"""
+        def labels(codes, values, mask=None):
+            return pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32(), mask=mask), pa.array(values, pa.string()))
+        size = len(batch['event_seq'])
+        details = [','.join(name for name, bit in ALERT_FLAGS if flags & bit) for flags in range(4)]
+        sequence = pc.cast(pa.array(batch['event_seq']), pa.string())
+        columns = [
+            pc.binary_join_element_wise('EVT_', pc.utf8_lpad(sequence, width=6, padding='0'), ''),
+            pa.array(batch['timestamp'], pa.timestamp('ns')),
+            labels(batch['sensor_idx'], [sensor['sensor_id'] for sensor in self.sensors]),
+            labels(batch['room_idx'], [room['room_id'] for room in self.rooms]),
+            labels(batch['room_idx'], [room['building'] for room in self.rooms]),
+            pa.array(batch['temperature']),
+            pa.array(batch['humidity']),
+            pa.array(batch['co2_ppm']),
+            pa.array(batch['occupancy_count']),
+            pa.array(batch['occupancy_pct']),
+            labels((batch['alert_flags'] > 0).astype(np.int32), ALERT_STATUS_LABELS),
+            labels(batch['alert_flags'], details, mask=batch['alert_flags'] == 0),
+            pa.array(np.full(size, batch['processed_at']), pa.timestamp('ns')),
+            labels(batch['thermal_comfort'], THERMAL_COMFORT_LABELS),
+            labels(batch['air_quality'], AIR_QUALITY_LABELS),
+        ]
+        return pa.Table.from_arrays(columns, schema=STREAM_SCHEMA)
+    
+    def write_batch(self, batch):
+        """Batch counterpart of write_to_sink()"""
+        self.sink.write_batch(batch)
+        self.windows.write_batch(batch)
+        if self.anomalies is not None:
+            self.anomalies.write_batch(batch)
+    
+    def write_to_sink(self, event):
+        """Write processed event to output (simulates sink)"""
+        # Append to JSON Lines file (common streaming format), buffered by the sink
+        self.sink.write(event)
         
-        print(f"  📦 Micro-batch created: {len(self.stream_buffer)} events aggregated")
+        # Update the running window aggregates; report windows the watermark closed
+        closed = self.windows.write(event)
+        if closed:
+            print(f"  📦 {closed} {self.windows.kind} window(s) closed "
+                  f"({self.windows.stats['rows']} room rows so far)")
         
-        # Clear buffer
-        self.stream_buffer = []
+        # Check the event against its sensor's own history
+        if self.anomalies is not None and self.anomalies.write(event):
+            metrics = [metric for metric, flags in zip(self.anomalies.metrics, self.anomalies.last_flags[0]) if flags]
+            print(f"  🚨 Anomaly on {event['sensor_id']}: {', '.join(metrics)}")
     
     def run(self):
         """Run the streaming simulation"""
@@ -153,6 +354,7 @@ class IoTStreamSimulator:
         print(f"  Interval: {self.interval} seconds")
         print(f"  Max events: {self.max_events}")
         print(f"  Output: 02_data/stream_output/")
+        print(f"  Windows: {self.windows.kind} (event time, watermark {self.windows.max_delay_ns / 1e9:g} s behind)")
         print("=" * 60)
         print()
         print("🔴 STREAMING STARTED... (Press Ctrl+C to stop)")
@@ -168,6 +370,8 @@ class IoTStreamSimulator:
                 
                 # Write to sink
                 self.write_to_sink(processed_event)
+                if self.checkpointer is not None:
+                    self.checkpointer.maybe_checkpoint(self.event_count)
                 
                 # Display event
                 status_icon = "⚠️" if processed_event['alert_status'] == 'WARNING' else "✅"
@@ -180,43 +384,221 @@ class IoTStreamSimulator:
                 # Wait for next event
                 time.sleep(self.interval)
             
-            # Process remaining buffer
-            if self.stream_buffer:
-                self.create_microbatch()
-            
+            if self.checkpointer is not None:
+                self.checkpointer.checkpoint(self.event_count)
             print()
             print("=" * 60)
             print(f"✅ Streaming simulation completed!")
             print(f"  Total events: {self.event_count}")
-            print(f"  Output file: 02_data/stream_output/streaming_events.jsonl")
+            print(f"  Output: {self.sink.path}")
             print("=" * 60)
             
         except KeyboardInterrupt:
             print("\n\n⏸️  Streaming stopped by user")
-            if self.stream_buffer:
-                self.create_microbatch()
             print(f"  Total events processed: {self.event_count}")
+        finally:
+            # Buffered events reach the file and open windows are emitted here at the latest
+            self.sink.close()
+            self.windows.close()
+            if self.anomalies is not None:
+                self.anomalies.close()
+
+def print_sink_stats(windows, sinks, checkpointer=None):
+    """One line per window aggregator / event sink (and the checkpoints) after a load or runtime run"""
+    stats = windows.stats
+    print(f"  Windows ({windows.kind}): {stats['windows']:,} closed, {stats['rows']:,} room rows, "
+          f"{stats['late']:,} late events dropped → {WINDOWS_PATH}")
+    for sink in sinks:
+        if isinstance(sink, JsonlSink):
+            stats = sink.stats
+            print(f"  JSONL sink ({sink.encoder_name}): {stats['events']:,} events, "
+                  f"{stats['bytes'] / (1 << 20):,.1f} MiB in {stats['flushes']:,} flushes, "
+                  f"{stats['fsyncs']:,} fsyncs, {len(sink.paths())} segment file(s)")
+        elif isinstance(sink, ParquetSegmentSink):
+            stats = sink.stats
+            print(f"  Parquet sink: {stats['events']:,} events in {stats['segments']:,} segments, "
+                  f"{stats['compactions']:,} compactions merged {stats['merged']:,} → {sink.path}")
+        elif isinstance(sink, AnomalyDetector):
+            stats = sink.stats
+            print(f"  Anomalies: {stats['alerts']:,} alerts on {stats['events']:,} events ("
+                  + ", ".join(f"{name} {stats[name]:,}" for name in ('ZSCORE', 'RATE', 'STUCK'))
+                  + f"), state {sink.state_bytes / (1 << 20):.1f} MiB → {ANOMALIES_PATH}")
+        elif hasattr(sink, 'stats') and 'max_freshness_s' in sink.stats:
+            stats = sink.stats
+            print(f"  Gold bridge: {stats['events'] - stats['rejected'] - stats['late']:,} events in "
+                  f"{stats['commits']:,} commits ({stats['files']:,} fact files, {stats['rejected']:,} rejected, "
+                  f"{stats['late']:,} late), "
+                  f"freshness ≤ {stats['max_freshness_s']:.1f} s, last commit {stats['last_commit_s'] * 1000:.0f} ms")
+    if checkpointer is not None:
+        stats = checkpointer.stats
+        print(f"  Checkpoints: {stats['checkpoints']:,} ({stats['bytes'] / 1024:,.0f} KiB, last took "
+              f"{stats['last_s'] * 1000:.0f} ms) at event {stats['position']:,} → {checkpointer.path}")
 
 if __name__ == "__main__":
-    # Configuration
-    INTERVAL = 5  # seconds between events
-    MAX_EVENTS = 50  # total events to generate (set rendah untuk demo)
-    
+    parser = argparse.ArgumentParser(description="Streaming simulation - IoT sensor events")
+    parser.add_argument('--interval', type=float, default=5, help="seconds between events in the demo (default: 5)")
+    parser.add_argument('--max-events', type=int, default=50,
+                        help="total events to generate in the demo (default: 50)")
+    parser.add_argument('--sensors-per-room', type=int, default=1, help="sensors in every room (default: 1)")
+    parser.add_argument('--gold', action='store_true',
+                        help="stream the rooms of gold dim_room and commit events to gold (see stream_gold.py)")
+    parser.add_argument('--gold-interval', type=float, default=5,
+                        help="seconds between gold commits (default: 5)")
+    parser.add_argument('--anomaly', action='store_true',
+                        help="per-sensor anomaly detection: EWMA z-score, rate of change, stuck sensor (see stream_anomaly.py)")
+    parser.add_argument('--z-threshold', type=float, default=5.0,
+                        help="anomaly z-score limit in EWMA standard deviations (default: 5)")
+    parser.add_argument('--runtime', choices=['sync', 'async'], default='sync',
+                        help="sync = one producer loop, async = one asyncio task per sensor (see stream_runtime.py)")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="checkpoint the stream periodically and resume from the last checkpoint "
+                             "(see stream_checkpoint.py)")
+    parser.add_argument('--checkpoint-interval', type=float, default=10,
+                        help="seconds between checkpoints (default: 10)")
+    load_group = parser.add_argument_group('load generation (see stream_load.py)')
+    load_group.add_argument('--load', action='store_true', help="drive a fixed event rate in vectorized batches")
+    load_group.add_argument('--rate', type=int, default=100_000, help="target events per second (default: 100,000)")
+    load_group.add_argument('--duration', type=float, default=10, help="seconds to run --load / --runtime async (default: 10)")
+    load_group.add_argument('--batch-size', type=int, default=50_000,
+                            help="largest batch handed through the stages (default: 50,000)")
+    parser.add_argument('--sink', choices=['null', 'jsonl', 'parquet', 'both'], default=None,
+                        help="event sink: JSONL, Parquet segments or both (default: both for the demo, "
+                             "null = generate + process only for --load / --runtime async)")
+    runtime_group = parser.add_argument_group('asyncio runtime (see stream_runtime.py)')
+    runtime_group.add_argument('--queue-size', type=int, default=10_000,
+                               help="bounded queue between sensors and consumers (default: 10,000)")
+    runtime_group.add_argument('--consumers', type=int, default=2, help="consumer tasks (default: 2)")
+    sink_group = parser.add_argument_group('JSONL sink (see stream_sinks.py)')
+    sink_group.add_argument('--flush-bytes', type=int, default=1 << 20,
+                            help="write the buffer out at this many bytes (default: 1 MiB)")
+    sink_group.add_argument('--flush-interval', type=float, default=1.0,
+                            help="... or after this many seconds (default: 1)")
+    sink_group.add_argument('--fsync-interval', type=float, default=None,
+                            help="fsync at most every N seconds (default: never, 0 = every flush)")
+    sink_group.add_argument('--segment-mb', type=float, default=None,
+                            help="roll over to a new segment file at this size (default: one file)")
+    parquet_group = parser.add_argument_group('Parquet segment sink (see stream_segments.py)')
+    parquet_group.add_argument('--segment-rows', type=int, default=500_000,
+                               help="roll buffered events into a segment at this many rows (default: 500,000)")
+    parquet_group.add_argument('--roll-interval', type=float, default=10,
+                               help="... or after this many seconds (default: 10)")
+    parquet_group.add_argument('--compact-interval', type=float, default=30,
+                               help="seconds between background compaction passes (default: 30)")
+    window_group = parser.add_argument_group('window aggregates (see stream_windows.py)')
+    window_group.add_argument('--window', choices=['tumbling', 'sliding', 'session'], default='tumbling',
+                              help="window kind (default: tumbling)")
+    window_group.add_argument('--window-size', type=float, default=60,
+                              help="tumbling / sliding window length in seconds (default: 60)")
+    window_group.add_argument('--window-slide', type=float, default=None,
+                              help="sliding window step in seconds (default: half the size)")
+    window_group.add_argument('--session-gap', type=float, default=30,
+                              help="session ends after this many seconds without events (default: 30)")
+    window_group.add_argument('--max-delay', type=float, default=5,
+                              help="watermark lag behind the latest event time, in seconds; also the --gold "
+                                   "duplicate check's grace for late events (default: 5)")
+    window_group.add_argument('--allowed-lateness', type=float, default=0,
+                              help="keep windows open this many seconds past the watermark (default: 0)")
+    args = parser.parse_args()
+    if args.checkpoint and args.runtime == 'async':
+        parser.error("--checkpoint covers the sync demo and --load (not --runtime async: concurrent sensor "
+                     "tasks have no replayable stream position)")
+
+    rooms = None
+    if args.gold:
+        from stream_gold import GoldBridge, gold_rooms
+        rooms = gold_rooms()
+        if not rooms:
+            print("  ⚠️ No gold dim_room yet (run batch_pipeline.py first) - streaming the demo rooms")
+    simulator = IoTStreamSimulator(interval_seconds=args.interval, max_events=args.max_events,
+                                   sensors_per_room=args.sensors_per_room, rooms=rooms)
+    sink_name = args.sink or ('null' if args.load or args.runtime == 'async' else 'both')
+    sinks = []
+    if sink_name in ('jsonl', 'both'):
+        segment_bytes = int(args.segment_mb * (1 << 20)) if args.segment_mb else None
+        sinks.append(JsonlSink(EVENTS_PATH, flush_bytes=args.flush_bytes, flush_interval=args.flush_interval,
+                               fsync_interval=args.fsync_interval, segment_bytes=segment_bytes,
+                               render=simulator.batch_to_records))
+    if sink_name in ('parquet', 'both'):
+        sinks.append(ParquetSegmentSink(EVENTS_TABLE_PATH, STREAM_SCHEMA, to_table=simulator.batch_to_table,
+                                        segment_rows=args.segment_rows, roll_interval=args.roll_interval,
+                                        compact_interval=args.compact_interval, position_of=event_position))
+    if not sinks:
+        from stream_load import NullSink
+        sinks.append(NullSink())
+    if args.gold:
+        sinks.append(GoldBridge(to_table=simulator.batch_to_table, commit_interval=args.gold_interval,
+                                max_delay=args.max_delay))
+    simulator.sink = sinks[0] if len(sinks) == 1 else TeeSink(*sinks)
+    simulator.windows = simulator.make_windows(args.window, size=args.window_size, slide=args.window_slide,
+                                               gap=args.session_gap, max_delay=args.max_delay,
+                                               allowed_lateness=args.allowed_lateness)
+    if args.anomaly:
+        simulator.anomalies = simulator.make_anomaly_detector(z_threshold=args.z_threshold)
+        sinks.append(simulator.anomalies)
+    sink = TeeSink(simulator.sink, simulator.windows, *([simulator.anomalies] if args.anomaly else []))
+    if args.checkpoint:
+        components = {'source': simulator, 'windows': simulator.windows,
+                      **{type(sink).__name__: sink for sink in sinks if hasattr(sink, 'snapshot')}}
+        simulator.checkpointer = Checkpointer(components, interval=args.checkpoint_interval)
+        checkpoint = simulator.checkpointer.recover()
+        if checkpoint is None:
+            print("  💾 No checkpoint - new stream from event 0 (earlier stream outputs are cleared)")
+            # A crash before the first periodic checkpoint resumes here (gold: files of this stream are removed)
+            simulator.checkpointer.checkpoint(simulator.event_count)
+        else:
+            print(f"  ♻️ Recovered checkpoint of {checkpoint['created_at']}: replaying from event "
+                  f"{checkpoint['position']:,}, outputs written after it removed")
+    if args.load:
+        from stream_load import run_load, print_load_report
+        print_load_report(run_load(simulator, args.rate, args.duration, args.batch_size, sink,
+                                   checkpointer=simulator.checkpointer))
+        if simulator.checkpointer is not None:
+            simulator.checkpointer.checkpoint(simulator.event_count)
+        sink.close()
+        print_sink_stats(simulator.windows, sinks, simulator.checkpointer)
+        raise SystemExit(0)
+    if args.runtime == 'async':
+        import asyncio
+        from stream_runtime import AsyncStreamRuntime, print_runtime_report
+        runtime = AsyncStreamRuntime(simulator, [sink], interval=args.interval,
+                                     queue_size=args.queue_size, consumers=args.consumers)
+        print_runtime_report(asyncio.run(runtime.run(args.duration)))
+        sink.close()
+        print_sink_stats(simulator.windows, sinks)
+        raise SystemExit(0)
+
     # Run simulation
-    simulator = IoTStreamSimulator(interval_seconds=INTERVAL, max_events=MAX_EVENTS)
     simulator.run()
     
     print()
     print("📊 STREAM ANALYSIS:")
     
-    # Load and analyze all events
-    df_stream = pd.read_json('02_data/stream_output/streaming_events.jsonl', lines=True)
+    # Load and analyze all events: the columnar table when it was written, else every JSONL segment
+    from table_manifest import read_table
+    if sink_name in ('parquet', 'both'):
+        df_stream = read_table(EVENTS_TABLE_PATH, columns=['room_id', 'alert_status', 'temperature', 'humidity', 'co2_ppm'])
+    elif sink_name == 'jsonl':
+        df_stream = pd.concat([pd.read_json(path, lines=True) for path in simulator.sink.paths()], ignore_index=True)
+    else:
+        df_stream = pd.DataFrame(columns=['room_id', 'alert_status', 'temperature', 'humidity', 'co2_ppm'])
     
     print(f"  Total events: {len(df_stream)}")
     print(f"  Rooms monitored: {df_stream['room_id'].nunique()}")
     print(f"  Alerts triggered: {(df_stream['alert_status'] == 'WARNING').sum()}")
     print()
     print("  Average metrics per room:")
-    print(df_stream.groupby('room_id')[['temperature', 'humidity', 'co2_ppm']].mean().round(2))
+    print(df_stream.groupby('room_id', observed=True)[['temperature', 'humidity', 'co2_ppm']].mean().round(2))
+    if os.path.exists(WINDOWS_PATH):
+        df_windows = read_table(WINDOWS_PATH, columns=['window_start', 'window_end', 'room_id', 'event_count',
+                                                       'temperature_mean', 'co2_ppm_max'])
+        print()
+        print(f"  Window aggregates ({simulator.windows.kind}, {len(df_windows)} rows, "
+              f"{simulator.windows.stats['late']} late events dropped):")
+        print(df_windows.tail(6).to_string(index=False))
+    if args.gold or args.anomaly or args.checkpoint:
+        print()
+        print_sink_stats(simulator.windows, [sink for sink in sinks
+                                             if not isinstance(sink, (JsonlSink, ParquetSegmentSink))],
+                         simulator.checkpointer)
     print()
     print("🎯 Streaming simulation results saved!")
@@ -0,0 +1,393 @@
+"""
+Table Manifest - snapshot log per Parquet table (bronze, silver, gold)
+
+Every write commits a new version: the live data files with their row
+count, size, modification time, per-column min/max and partition values.
+Versions are JSON files under <table dir>/_manifest/<table name>/ and are
+published with an exclusive link, so a version is either complete or absent
+and two writers never publish the same version.
+
+Readers plan scans from the latest version (no directory listing, no footer
+reads) and check each file they open against it. A file replaced or removed
+after the snapshot was taken means a writer got in between: the read starts
+over on the newer snapshot, so a reader never mixes two versions of a table.
+
+Writers that replace or remove live files announce it first with
+begin_write() - a lease file <log dir>/_writer-<pid>-<thread> that their next
+commit() removes. A reader that hits a replaced file keeps waiting while the
+table's version advances or a live writer holds a lease, up to READ_TIMEOUT
+seconds; without either (a writer that crashed, or one that did not announce
+itself) it gives up after `retries` attempts, about 4.5 s. Writers that
+merge existing rows with their own serialize on TableLock as well.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import date, datetime
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: TableLock does not serialize writers there
+    fcntl = None
+
+MANIFEST_DIR = '_manifest'
+KEEP_VERSIONS = 20
+WRITER_PREFIX = '_writer-'
+LOCK_FILE = '_lock'
+READ_TIMEOUT = 600  # seconds a reader waits for a writer that holds its lease
+
+# ==================== LOG LAYOUT ====================
+
+def manifest_path(table_path):
+    """Directory holding the snapshot log of a table (a file or a partitioned directory)"""
+    head, name = os.path.split(os.path.normpath(table_path))
+    return os.path.join(head, MANIFEST_DIR, name)
+
+def _version_path(log_dir, version):
+    return os.path.join(log_dir, f"v{version:08d}.json")
+
+def _versions(log_dir):
+    if not os.path.isdir(log_dir):
+        return []
+    return sorted(int(name[1:-5]) for name in os.listdir(log_dir)
+                  if name.startswith('v') and name.endswith('.json'))
+
+def load_snapshot(table_path, version=None):
+    """The latest (or a given) snapshot of a table, None when it has no manifest"""
+    log_dir = manifest_path(table_path)
+    if version is None:
+        versions = _versions(log_dir)
+        if not versions:
+            return None
+        version = versions[-1]
+    with open(_version_path(log_dir, version)) as f:
+        return json.load(f)
+
+# ==================== FILE ENTRIES ====================
+
+def _data_files(table_path):
+    """Data files of a table, relative to the table path (readers skip '_' and '.' names)"""
+    if os.path.isfile(table_path):
+        return [os.path.basename(table_path)]
+    files = []
+    for root, dirs, names in os.walk(table_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(('_', '.')))
+        for name in sorted(names):
+            if not name.startswith(('_', '.')) and not name.endswith('.tmp'):
+                files.append(os.path.relpath(os.path.join(root, name), table_path))
+    return files
+
+def _table_root(table_path):
+    return os.path.dirname(table_path) if os.path.isfile(table_path) else table_path
+
+def _json_value(value):
+    """Statistics value as a JSON scalar; timestamps as ISO strings, which sort like the timestamps"""
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def column_stats(metadata):
+    """{column: [min, max]} over all row groups; columns without full statistics are left out"""
+    stats = {}
+    incomplete = set()
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            name = column.path_in_schema
+            statistics = column.statistics
+            if statistics is None or not statistics.has_min_max:
+                if row_group.num_rows > (statistics.null_count if statistics is not None else 0):
+                    incomplete.add(name)
+                continue
+            low, high = _json_value(statistics.min), _json_value(statistics.max)
+            if low is None or high is None:
+                incomplete.add(name)
+                continue
+            if name in stats:
+                low, high = min(low, stats[name][0]), max(high, stats[name][1])
+            stats[name] = [low, high]
+    return {name: value for name, value in stats.items() if name not in incomplete}
+
+def file_entry(table_path, relative_path):
+    """Manifest entry of one data file (reads its footer once)"""
+    path = os.path.join(_table_root(table_path), relative_path)
+    stat = os.stat(path)
+    metadata = pq.ParquetFile(path).metadata
+    partition = dict(part.split('=', 1) for part in os.path.dirname(relative_path).split(os.sep) if '=' in part)
+    return {
+        'path': relative_path,
+        'partition': partition,
+        'rows': metadata.num_rows,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'stats': column_stats(metadata),
+    }
+
+# ==================== WRITERS ====================
+
+def _lease_path(table_path):
+    return os.path.join(manifest_path(table_path), f"{WRITER_PREFIX}{os.getpid()}-{threading.get_ident()}")
+
+def begin_write(table_path):
+    """Announce that this process is about to replace live files of a table (until its next commit)"""
+    os.makedirs(manifest_path(table_path), exist_ok=True)
+    open(_lease_path(table_path), 'w').close()
+
+def _end_write(table_path):
+    try:
+        os.remove(_lease_path(table_path))
+    except FileNotFoundError:
+        pass
+
+def process_alive(pid):
+    """True when `pid` is a running process other than this one"""
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, owned by another user
+    return True
+
+def writer_active(table_path):
+    """True while a live process holds a write lease on the table (leases of dead processes are removed)"""
+    log_dir = manifest_path(table_path)
+    if not os.path.isdir(log_dir):
+        return False
+    active = False
+    for name in os.listdir(log_dir):
+        if not name.startswith(WRITER_PREFIX):
+            continue
+        pid = int(name[len(WRITER_PREFIX):].split('-')[0])
+        if pid == os.getpid() or process_alive(pid):
+            active = True
+            continue
+        try:
+            os.remove(os.path.join(log_dir, name))
+        except FileNotFoundError:
+            pass
+    return active
+
+class TableLock:
+    """
+    Exclusive lock on a table for a read-modify-write (with TableLock(path): ...).
+    Leases only tell readers to wait; writers that merge what they read with
+    their own rows take this lock so two of them cannot both replace the same
+    data from a stale read. Not reentrant - do not nest it for one table.
+    """
+
+    def __init__(self, table_path):
+        self.path = os.path.join(manifest_path(table_path), LOCK_FILE)
+        self.file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
+
+# ==================== COMMIT ====================
+
+def commit(table_path, operation):
+    """
+    Record the table's current files as a new version. Entries of files that
+    are unchanged since the previous version are reused. A concurrent commit
+    of the same version makes this one rescan and take the next version.
+    """
+    log_dir = manifest_path(table_path)
+    os.makedirs(log_dir, exist_ok=True)
+    while True:
+        previous = load_snapshot(table_path)
+        known = {entry['path']: entry for entry in previous['files']} if previous else {}
+        root = _table_root(table_path)
+        files = []
+        try:
+            for relative_path in (_data_files(table_path) if os.path.exists(table_path) else []):
+                stat = os.stat(os.path.join(root, relative_path))
+                entry = known.get(relative_path)
+                if entry is None or (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                    entry = file_entry(table_path, relative_path)
+                files.append(entry)
+        except FileNotFoundError:
+            # Another writer swapped a partition during the scan
+            continue
+
+        version = previous['version'] + 1 if previous else 1
+        snapshot = {
+            'version': version,
+            'committed_at': datetime.now().isoformat(timespec='seconds'),
+            'operation': operation,
+            'rows': sum(entry['rows'] for entry in files),
+            'files': files,
+        }
+        tmp_path = os.path.join(log_dir, f"_v{version:08d}-{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # link() fails if the version exists: exactly one writer publishes it
+            os.link(tmp_path, _version_path(log_dir, version))
+        except FileExistsError:
+            continue
+        finally:
+            os.remove(tmp_path)
+        break
+
+    _end_write(table_path)
+    for old in _versions(log_dir)[:-KEEP_VERSIONS]:
+        try:
+            os.remove(_version_path(log_dir, old))
+        except FileNotFoundError:
+            pass
+    return snapshot
+
+def write_parquet(df, path, operation='overwrite', **kwargs):
+    """Write a single-file table (temp file + rename) and commit it"""
+    tmp_path = path + '.tmp'
+    df.to_parquet(tmp_path, index=False, **kwargs)
+    begin_write(path)
+    os.replace(tmp_path, path)
+    return commit(path, operation)
+
+# ==================== READ ====================
+
+def _may_match(entry, column, op, value):
+    """False only when the entry's partition value / min-max range rules the filter out"""
+    if column in entry['partition']:
+        low = high = entry['partition'][column]
+        value = [str(v) for v in value] if op in ('in', 'not in') else str(value)
+    elif column in entry['stats']:
+        low, high = entry['stats'][column]
+        value = [_json_value(v) for v in value] if op in ('in', 'not in') else _json_value(value)
+    else:
+        return True
+    try:
+        if op in ('==', '='):
+            return low <= value <= high
+        if op == 'in':
+            return any(low <= v <= high for v in value)
+        if op == '<':
+            return low < value
+        if op == '<=':
+            return low <= value
+        if op == '>':
+            return high > value
+        if op == '>=':
+            return high >= value
+    except TypeError:
+        # Values that do not compare with the statistics: keep the file
+        return True
+    return True
+
+def plan_scan(snapshot, filters=None):
+    """Entries of the snapshot that may hold rows matching all `filters` [(column, op, value), ...]"""
+    return [entry for entry in snapshot['files']
+            if all(_may_match(entry, column, op, value) for column, op, value in (filters or []))]
+
+def _read_entry(table_path, entry, columns):
+    """Read one planned file; None when it no longer is the file the snapshot describes"""
+    try:
+        with open(os.path.join(_table_root(table_path), entry['path']), 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+                return None
+            parquet_file = pq.ParquetFile(f)
+            available = parquet_file.schema_arrow.names
+            table = parquet_file.read(columns=[c for c in columns if c in available] if columns else None)
+    except FileNotFoundError:
+        return None
+    for column, value in entry['partition'].items():
+        if columns is None or column in columns:
+            table = table.append_column(column, pa.array([value] * table.num_rows, pa.string()).dictionary_encode())
+    return table
+
+def read_table(table_path, columns=None, filters=None, retries=8, timeout=READ_TIMEOUT):
+    """
+    Read a consistent snapshot of a table into a DataFrame.
+    Files are chosen from the manifest (pruned by partition values and min/max);
+    `filters` are then applied to the rows. Tables without a manifest fall
+    back to pd.read_parquet.
+    A replaced file restarts the read on a newer snapshot. Waiting on a writer
+    (new versions appear or a lease is held) is bounded by `timeout` seconds,
+    other restarts by `retries`; then RuntimeError is raised.
+    """
+    deadline = time.monotonic() + timeout
+    failed_attempts, waits, version = 0, 0, None
+    while True:
+        snapshot = load_snapshot(table_path)
+        if snapshot is None:
+            return pd.read_parquet(table_path, columns=columns, filters=filters)
+        # With nothing planned, one file still supplies the schema (the filter empties it)
+        planned = plan_scan(snapshot, filters) or snapshot['files'][:1]
+        if not planned:
+            return pd.DataFrame(columns=columns)
+        tables = []
+        for entry in planned:
+            table = _read_entry(table_path, entry, columns)
+            if table is None:
+                break
+            tables.append(table)
+        else:
+            table = pa.concat_tables(tables, promote_options='permissive')
+            if filters:
+                table = table.filter(pq.filters_to_expression(filters))
+            df = table.to_pandas()
+            return df[columns] if columns else df
+        # A writer replaced files after this snapshot: wait for its commit. Only a
+        # restart without a newer version and without a live writer counts as failed
+        if snapshot['version'] == version and not writer_active(table_path):
+            failed_attempts += 1
+        version = snapshot['version']
+        if failed_attempts > retries:
+            raise RuntimeError(f"{table_path}: files changed without a new version or a live writer "
+                               f"({retries} retries) - was a write interrupted?")
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"{table_path} kept changing while being read for {timeout:.0f} s "
+                               f"(a long write is in progress; pass a larger timeout)")
+        time.sleep(min(0.05 * 2 ** waits, 1.0))
+        waits += 1
+
+def describe_scan(table_path, filters=None):
+    """(files planned, files in snapshot, rows in snapshot) for a filter, from the manifest alone"""
+    snapshot = load_snapshot(table_path)
+    if snapshot is None:
+        return None
+    return len(plan_scan(snapshot, filters)), len(snapshot['files']), snapshot['rows']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Commit or show table manifests")
+    parser.add_argument('tables', nargs='+', help="table paths (Parquet file or partitioned directory)")
+    parser.add_argument('--commit', action='store_true', help="record the current files as a new version")
+    args = parser.parse_args()
+
+    for table_path in args.tables:
+        snapshot = commit(table_path, 'manual') if args.commit else load_snapshot(table_path)
+        if snapshot is None:
+            print(f"  ⚠️ {table_path}: no manifest (run with --commit)")
+            continue
+        partitions = {tuple(entry['partition'].items()) for entry in snapshot['files']} - {()}
+        print(f"  ✓ {table_path}: version {snapshot['version']} ({snapshot['operation']}, "
+              f"{snapshot['committed_at']}) - {len(snapshot['files'])} file(s), "
+              f"{len(partitions)} partition(s), {snapshot['rows']:,} rows")
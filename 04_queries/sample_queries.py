@@ -1,10 +1,21 @@
 """
 Sample Queries - Analytical Examples
 Demonstrates filtering, aggregation, and joins
+Aggregates per building / room type / hour / day come from the rollup cube;
+only the row-level filter (Q2) scans the fact table.
 """
 
 import pandas as pd
 import time
+import os
+import sys
+
+# Tables are read through their manifests (planned scans, consistent snapshots)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '03_pipeline'))
+from table_manifest import read_table, describe_scan, load_snapshot
+from rollup_cube import load_rollup, HOURLY_PATH
+
+FACT_PATH = '02_data/gold/fact_sensor_readings.parquet'
 
 print("=" * 60)
 print("  SAMPLE ANALYTICAL QUERIES")
@@ -13,11 +24,9 @@ print()
 
 # Load data from Gold layer
 print("📥 Loading data from Gold layer...")
-dim_room = pd.read_parquet('02_data/gold/dim_room.parquet')
-fact_readings = pd.read_parquet('02_data/gold/fact_sensor_readings.parquet')
-summary_hourly = pd.read_parquet('02_data/gold/summary_hourly.parquet')
+dim_room = read_table('02_data/gold/dim_room.parquet')
 
-print(f"  ✓ Loaded {len(fact_readings):,} fact records")
+print(f"  ✓ Fact table: {load_snapshot(FACT_PATH)['rows']:,} records (queried through the rollup cube)")
 print(f"  ✓ Loaded {len(dim_room)} rooms")
 print()
 
@@ -27,19 +36,17 @@ print("-" * 60)
 
 start_time = time.time()
 
-# Merge fact with dimension
-df = fact_readings.merge(dim_room[['room_key', 'building']], on='room_key', how='left')
-
-# Aggregate
-result_q1 = df.groupby('building').agg({
-    'temperature': ['mean', 'min', 'max'],
-    'humidity': 'mean',
-    'co2_ppm': 'mean'
+# Daily cells merged up to the building (cells carry the building of their room version)
+cells = load_rollup('daily', ['building'])
+result_q1 = pd.DataFrame({
+    'building': cells['building'],
+    'avg_temp': cells['temperature_mean'],
+    'min_temp': cells['temperature_min'],
+    'max_temp': cells['temperature_max'],
+    'avg_humidity': cells['humidity_mean'],
+    'avg_co2': cells['co2_ppm_mean']
 }).round(2)
 
-result_q1.columns = ['avg_temp', 'min_temp', 'max_temp', 'avg_humidity', 'avg_co2']
-result_q1 = result_q1.reset_index()
-
 execution_time_q1 = time.time() - start_time
 
 print(result_q1.to_string(index=False))
@@ -55,8 +62,9 @@ print("-" * 60)
 
 start_time = time.time()
 
-# Filter high temperature
-high_temp = fact_readings[fact_readings['temperature'] > 28].copy()
+# Filter high temperature (files whose max temperature is <= 28 are skipped)
+high_temp_filter = [('temperature', '>', 28)]
+high_temp = read_table(FACT_PATH, filters=high_temp_filter)
 
 # Join with room details
 high_temp = high_temp.merge(
@@ -78,6 +86,9 @@ result_q2 = result_q2.sort_values('high_temp_count', ascending=False)
 execution_time_q2 = time.time() - start_time
 
 print(result_q2.head(10).to_string(index=False))
+scan = describe_scan(FACT_PATH, high_temp_filter)
+if scan is not None:
+    print(f"\n📂 Files scanned: {scan[0]} of {scan[1]} (planned from the manifest)")
 print(f"\n⏱️  Execution time: {execution_time_q2*1000:.2f} ms")
 print()
 
@@ -90,31 +101,20 @@ print("-" * 60)
 
 start_time = time.time()
 
-# Convert timestamp
-fact_readings['timestamp'] = pd.to_datetime(fact_readings['timestamp'])
-
-# Get latest 24 hours
-max_time = fact_readings['timestamp'].max()
-min_time = max_time - pd.Timedelta(hours=24)
-
-recent_data = fact_readings[
-    (fact_readings['timestamp'] >= min_time) & 
-    (fact_readings['timestamp'] <= max_time)
-].copy()
-
-# Create hourly bins
-recent_data['hour'] = recent_data['timestamp'].dt.floor('H')
-
-# Aggregate by hour
-result_q3 = recent_data.groupby('hour').agg({
-    'temperature': ['mean', 'min', 'max'],
-    'humidity': 'mean',
-    'co2_ppm': 'mean',
-    'sensor_id': 'count'
+# Latest 24 hourly cells (time_key = YYYYMMDDHH); the manifest skips older day partitions
+max_hour = pd.to_datetime(str(read_table(HOURLY_PATH, columns=['time_key'])['time_key'].max()), format='%Y%m%d%H')
+min_key = int((max_hour - pd.Timedelta(hours=23)).strftime('%Y%m%d%H'))
+cells = load_rollup('hourly', ['time_key'], start_key=min_key)
+
+result_q3 = pd.DataFrame({
+    'avg_temp': cells['temperature_mean'],
+    'min_temp': cells['temperature_min'],
+    'max_temp': cells['temperature_max'],
+    'avg_humidity': cells['humidity_mean'],
+    'avg_co2': cells['co2_ppm_mean'],
+    'reading_count': cells['count']
 }).round(2)
-
-result_q3.columns = ['avg_temp', 'min_temp', 'max_temp', 'avg_humidity', 'avg_co2', 'reading_count']
-result_q3 = result_q3.reset_index()
+result_q3.insert(0, 'hour', pd.to_datetime(cells['time_key'].astype(str), format='%Y%m%d%H'))
 
 execution_time_q3 = time.time() - start_time
 
@@ -131,23 +131,15 @@ print("-" * 60)
 
 start_time = time.time()
 
-# Merge with room details
-df_efficiency = fact_readings.merge(
-    dim_room[['room_key', 'room_type', 'building']], 
-    on='room_key', 
-    how='left'
-)
-
-# Calculate metrics
-result_q4 = df_efficiency.groupby('room_type').agg({
-    'energy_efficiency': 'mean',
-    'ac_status': lambda x: (x == 'ON').sum(),
-    'occupancy_pct': 'mean',
-    'sensor_id': 'count'
+# Daily cells merged up to the room type (ac_on_sum counts the readings with the AC on)
+cells = load_rollup('daily', ['room_type'])
+result_q4 = pd.DataFrame({
+    'room_type': cells['room_type'],
+    'avg_efficiency_score': cells['energy_efficiency_mean'],
+    'ac_on_count': cells['ac_on_sum'].astype('int64'),
+    'avg_occupancy_pct': cells['occupancy_pct_mean'],
+    'total_readings': cells['count']
 }).round(2)
-
-result_q4.columns = ['avg_efficiency_score', 'ac_on_count', 'avg_occupancy_pct', 'total_readings']
-result_q4 = result_q4.reset_index()
 result_q4 = result_q4.sort_values('avg_efficiency_score', ascending=False)
 
 execution_time_q4 = time.time() - start_time
@@ -156,6 +148,29 @@ print(result_q4.to_string(index=False))
 print(f"\n⏱️  Execution time: {execution_time_q4*1000:.2f} ms")
 print()
 
+# ==================== BONUS QUERY 5: Daily Trend ====================
+print("🔍 BONUS QUERY 5: Daily Averages")
+print("-" * 60)
+
+start_time = time.time()
+
+cells = load_rollup('daily', ['date_key'])
+result_q5 = pd.DataFrame({
+    'avg_temp': cells['temperature_mean'],
+    'std_temp': cells['temperature_std'],
+    'avg_humidity': cells['humidity_mean'],
+    'avg_co2': cells['co2_ppm_mean'],
+    'max_co2': cells['co2_ppm_max'],
+    'reading_count': cells['count']
+}).round(2)
+result_q5.insert(0, 'date', pd.to_datetime(cells['date_key'].astype(str), format='%Y%m%d'))
+
+execution_time_q5 = time.time() - start_time
+
+print(result_q5.to_string(index=False))
+print(f"\n⏱️  Execution time: {execution_time_q5*1000:.2f} ms")
+print()
+
 # ==================== SUMMARY ====================
 print("=" * 60)
 print("  QUERY PERFORMANCE SUMMARY")
@@ -166,19 +181,22 @@ summary = pd.DataFrame({
         'Q1: Avg Temp per Building',
         'Q2: High Temp Rooms',
         'Q3: Hourly Trend (24h)',
-        'Q4: Energy Efficiency'
+        'Q4: Energy Efficiency',
+        'Q5: Daily Averages'
     ],
     'Execution Time (ms)': [
         f"{execution_time_q1*1000:.2f}",
         f"{execution_time_q2*1000:.2f}",
         f"{execution_time_q3*1000:.2f}",
-        f"{execution_time_q4*1000:.2f}"
+        f"{execution_time_q4*1000:.2f}",
+        f"{execution_time_q5*1000:.2f}"
     ],
     'Result Rows': [
         len(result_q1),
         len(result_q2),
         len(result_q3),
-        len(result_q4)
+        len(result_q4),
+        len(result_q5)
     ]
 })
 
@@ -9,6 +9,11 @@ import time
 import os
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+
+# Tables are read through their manifests (planned scans, consistent snapshots)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '03_pipeline'))
+from table_manifest import read_table
 
 print("=" * 60)
 print("  FILE FORMAT BENCHMARK")
@@ -17,7 +22,7 @@ print()
 
 # Load original data
 print("📥 Loading test dataset...")
-df = pd.read_parquet('02_data/bronze/sensor_data.parquet')
+df = read_table('02_data/bronze/sensor_data.parquet')
 print(f"  Dataset: {len(df):,} records, {len(df.columns)} columns")
 print()
 
@@ -4,6 +4,20 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import os
+import sys
+
+# Tables are read through their manifests (planned scans, consistent snapshots)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '03_pipeline'))
+from table_manifest import read_table, load_snapshot
+from rollup_cube import load_rollup, partial_aggregates, merge_partials, cube_stats, HOURLY_PATH
+
+# Aggregates are merged from hourly cells (room, alert level) instead of the raw readings
+METRICS = ['temperature', 'humidity', 'co2_ppm']
+CELL_KEYS = ['time_key', 'building', 'room_id', 'alert_status']
+
+def cell_stats(cells, by):
+    """Mean / std / min / max of METRICS per `by` group of hourly cells"""
+    return cube_stats(merge_partials(cells, by), METRICS)
 
 st.set_page_config(page_title="IoT Monitoring Dashboard", layout="wide")
 
@@ -18,7 +32,7 @@ st.sidebar.header("📊 Filters")
 try:
     # Try loading from multiple sources (most robust approach)
     if os.path.exists('02_data/bronze/sensor_data.parquet'):
-        df = pd.read_parquet('02_data/bronze/sensor_data.parquet')
+        df = read_table('02_data/bronze/sensor_data.parquet')
         st.sidebar.success("📦 Loaded from Parquet (optimized)")
     elif os.path.exists('02_data/raw/csv/sensor_data.csv'):
         df = pd.read_csv('02_data/raw/csv/sensor_data.csv')
@@ -32,6 +46,14 @@ try:
         st.stop()
     
     df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    # Hourly cells of the rollup cube (batch_pipeline.py), or built from the raw readings before the first run
+    if load_snapshot(HOURLY_PATH) is not None:
+        cells = load_rollup('hourly', CELL_KEYS)
+        st.sidebar.success("🧊 Aggregates from the rollup cube")
+    else:
+        time_key = df['timestamp'].dt.strftime('%Y%m%d%H').astype('int64')
+        cells = partial_aggregates(df.assign(time_key=time_key), CELL_KEYS, METRICS)
     
     # Filters
     buildings = st.sidebar.multiselect(
@@ -42,6 +64,8 @@ try:
     
     # Filter data
     filtered_df = df[df['building'].isin(buildings)]
+    filtered_cells = cells[cells['building'].isin(buildings)]
+    totals = cell_stats(filtered_cells.assign(scope='all'), ['scope']).iloc[0]
     
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -49,26 +73,26 @@ try:
     with col1:
         st.metric(
             "🌡️ Avg Temperature", 
-            f"{filtered_df['temperature'].mean():.1f}°C",
-            f"{filtered_df['temperature'].std():.1f}°C std"
+            f"{totals['temperature_mean']:.1f}°C",
+            f"{totals['temperature_std']:.1f}°C std"
         )
     
     with col2:
         st.metric(
             "💧 Avg Humidity", 
-            f"{filtered_df['humidity'].mean():.1f}%",
-            f"{filtered_df['humidity'].std():.1f}% std"
+            f"{totals['humidity_mean']:.1f}%",
+            f"{totals['humidity_std']:.1f}% std"
         )
     
     with col3:
         st.metric(
             "🫁 Avg CO2", 
-            f"{filtered_df['co2_ppm'].mean():.0f} ppm",
-            "Good" if filtered_df['co2_ppm'].mean() < 1000 else "High"
+            f"{totals['co2_ppm_mean']:.0f} ppm",
+            "Good" if totals['co2_ppm_mean'] < 1000 else "High"
         )
     
     with col4:
-        alerts = (filtered_df['alert_status'] == 'WARNING').sum()
+        alerts = filtered_cells.loc[filtered_cells['alert_status'] == 'WARNING', 'count'].sum()
         st.metric(
             "⚠️ Alerts", 
             f"{alerts}",
@@ -79,12 +103,14 @@ try:
     
     # Temperature trend
     st.subheader("📈 Temperature Trend Over Time")
+    trend = cell_stats(filtered_cells, ['time_key', 'building'])
+    trend['hour'] = pd.to_datetime(trend['time_key'].astype(str), format='%Y%m%d%H')
     fig_temp = px.line(
-        filtered_df, 
-        x='timestamp', 
-        y='temperature',
+        trend, 
+        x='hour', 
+        y='temperature_mean',
         color='building',
-        title='Temperature by Building'
+        title='Hourly Average Temperature by Building'
     )
     fig_temp.update_layout(
         height=500,
@@ -99,11 +125,8 @@ try:
     
     with col1:
         st.subheader("🏢 Average Metrics by Room")
-        room_avg = filtered_df.groupby('room_id').agg({
-            'temperature': 'mean',
-            'humidity': 'mean',
-            'co2_ppm': 'mean'
-        }).round(2)
+        room_avg = cell_stats(filtered_cells, ['room_id']).set_index('room_id')
+        room_avg = room_avg[[metric + '_mean' for metric in METRICS]].set_axis(METRICS, axis=1).round(2)
         
         fig_room = go.Figure()
         fig_room.add_trace(go.Bar(
@@ -134,11 +157,11 @@ try:
     
     # Heatmap
     st.subheader("🔥 Temperature Heatmap by Room and Hour")
-    heatmap_data = filtered_df.pivot_table(
-        values='temperature',
+    hour_cells = filtered_cells.assign(hour=filtered_cells['time_key'] % 100)
+    heatmap_data = cell_stats(hour_cells, ['room_id', 'hour']).pivot(
         index='room_id',
         columns='hour',
-        aggfunc='mean'
+        values='temperature_mean'
     )
     fig_heatmap = px.imshow(
         heatmap_data,
@@ -0,0 +1,75 @@
+"""
+Silver feature parity - derive_silver_features() (np.select rules) against
+the original row-wise lambdas in legacy_silver_features()
+Run: python -m pytest tests/
+"""
+
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '03_pipeline'))
+
+from batch_pipeline import derive_silver_features, legacy_silver_features
+
+# Values on, just below and just above every rule boundary, plus missing values
+TEMPERATURES = [21.99, 22.0, 22.01, 25.99, 26.0, 26.01, np.nan]
+HUMIDITIES = [39.99, 40.0, 40.01, 59.99, 60.0, 60.01, np.nan]
+AC_STATUSES = ['ON', 'OFF', None]
+OCCUPANCY_PCTS = [0.0, 29.99, 30.0, 30.01, np.nan]
+
+def boundary_frame():
+    """Every combination of the boundary values, one row each"""
+    rows = list(itertools.product(TEMPERATURES, HUMIDITIES, AC_STATUSES, OCCUPANCY_PCTS))
+    df = pd.DataFrame(rows, columns=['temperature', 'humidity', 'ac_status', 'occupancy_pct'])
+    df['co2_ppm'] = 500
+    return df
+
+@pytest.fixture(scope='module')
+def features():
+    df = boundary_frame()
+    return derive_silver_features(df.copy()), legacy_silver_features(df)
+
+@pytest.mark.parametrize('column', ['thermal_comfort', 'energy_efficiency'])
+def test_vectorized_matches_legacy(features, column):
+    actual, expected = features
+    pd.testing.assert_series_equal(actual[column].astype(object), expected[column].astype(object))
+
+def test_every_branch_is_covered(features):
+    _, expected = features
+    assert set(expected['thermal_comfort']) == {'Comfortable', 'Too Hot', 'Too Cold', 'Too Humid', 'Too Dry'}
+    assert set(expected['energy_efficiency']) == {70, 100}
+
+@pytest.mark.parametrize('temperature, humidity, comfort', [
+    (22.0, 40.0, 'Comfortable'),
+    (26.0, 60.0, 'Comfortable'),
+    (26.01, 50.0, 'Too Hot'),
+    (21.99, 50.0, 'Too Cold'),
+    (24.0, 60.01, 'Too Humid'),
+    (24.0, 39.99, 'Too Dry'),
+    (np.nan, 50.0, 'Too Dry'),
+    (24.0, np.nan, 'Too Dry'),
+    (np.nan, 70.0, 'Too Humid'),
+])
+def test_thermal_comfort_branches(temperature, humidity, comfort):
+    df = pd.DataFrame({'temperature': [temperature], 'humidity': [humidity], 'ac_status': ['ON'],
+                       'occupancy_pct': [50.0], 'co2_ppm': [500]})
+    assert derive_silver_features(df.copy())['thermal_comfort'].iloc[0] == comfort
+    assert legacy_silver_features(df)['thermal_comfort'].iloc[0] == comfort
+
+@pytest.mark.parametrize('ac_status, occupancy_pct, efficiency', [
+    ('OFF', 10.0, 100),
+    ('ON', 29.99, 70),
+    ('ON', 30.0, 100),
+    ('ON', np.nan, 100),
+    (None, 10.0, 70),
+])
+def test_energy_efficiency_branches(ac_status, occupancy_pct, efficiency):
+    df = pd.DataFrame({'temperature': [24.0], 'humidity': [50.0], 'ac_status': [ac_status],
+                       'occupancy_pct': [occupancy_pct], 'co2_ppm': [500]})
+    assert derive_silver_features(df.copy())['energy_efficiency'].iloc[0] == efficiency
+    assert legacy_silver_features(df)['energy_efficiency'].iloc[0] == efficiency